@@ -0,0 +1,85 @@
+"""
+bench_bond_labels
+
+Description:
+Compare matching peak positions with bond length ranges one range at a time (as extract_peak_labels did) with one lookup in an
+interval index of (overlapping) ranges (Bond_Labels.BondRangeIndex).
+Run from the home directory of this repository:
+    python benchmarks/bench_bond_labels.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.Bond_Labels import BondRangeIndex  # noqa: E402
+
+N_RANGES = 100
+N_PEAKS = 1_000_000
+
+
+def best_time(function, repeats):
+    """
+    Return the best wall-clock time (seconds) of function().
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def match_range_by_range(bond_ranges, bond_lengths):
+    """
+    Match bond lengths with each range in turn; returns (length index, bond index) pairs ordered by length, then bond.
+    """
+    length_indices = []
+    bond_indices = []
+    for bond_index, (lower, upper) in enumerate(bond_ranges.values()):
+        matches = np.flatnonzero((lower <= bond_lengths) & (bond_lengths <= upper))
+        length_indices.append(matches)
+        bond_indices.append(np.full(len(matches), bond_index))
+    length_indices = np.concatenate(length_indices)
+    bond_indices = np.concatenate(bond_indices)
+    match_order = np.lexsort((bond_indices, length_indices))
+
+    return length_indices[match_order], bond_indices[match_order]
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    # Coordination shells between 1 and 8 Angstroms, 0.1 - 0.5 Angstroms wide, many of them overlapping.
+    lowers = rng.uniform(1, 8, size=N_RANGES)
+    bond_ranges = {
+        f"shell {i}": (lower, lower + width)
+        for i, (lower, width) in enumerate(
+            zip(lowers, rng.uniform(0.1, 0.5, size=N_RANGES))
+        )
+    }
+    bond_lengths = rng.uniform(0.8, 10, size=N_PEAKS)
+
+    index = BondRangeIndex(bond_ranges)
+    expected = match_range_by_range(bond_ranges, bond_lengths)
+    indexed = index.lookup(bond_lengths)
+    assert all(map(np.array_equal, expected, indexed))
+
+    loop_time = best_time(
+        lambda: match_range_by_range(bond_ranges, bond_lengths), repeats=3
+    )
+    build_time = best_time(lambda: BondRangeIndex(bond_ranges), repeats=3)
+    index_time = best_time(lambda: index.lookup(bond_lengths), repeats=3)
+
+    print(
+        f"{N_PEAKS} peaks, {N_RANGES} ranges, {len(indexed[0])} labels"
+        f" ({len(index.edges) - 1} segments)"
+    )
+    print(f"range by range:  {loop_time:8.3f} s")
+    print(f"index build:     {build_time:8.4f} s")
+    print(f"index lookup:    {index_time:8.3f} s")
+    print(f"speed-up:        {loop_time / index_time:8.1f}x")
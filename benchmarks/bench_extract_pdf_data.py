@@ -0,0 +1,77 @@
+"""
+bench_extract_pdf_data
+
+Description:
+Compare the line-by-line .gr parser that extract_pdf_data used originally with the bulk reader (read_gr_file).
+Run from the home directory of this repository:
+    python benchmarks/bench_extract_pdf_data.py
+"""
+
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.Extract_Data import read_gr_file  # noqa: E402
+
+GR_DIRECTORY = "data/gr_files"
+
+
+def legacy_read_gr_file(gr_file_path):
+    """
+    Original parser: readlines(), regex search for the start of data, split every line in Python.
+    """
+    with open(gr_file_path) as open_gr_file:
+        individual_lines = open_gr_file.readlines()
+
+    start_data = next(
+        (
+            i
+            for i, line in enumerate(individual_lines)
+            if re.search(r"#### start data", line)
+        ),
+        None,
+    )
+    data = [line.split() for line in individual_lines[start_data + 3 :]]
+    data = np.array(data, dtype=float).T
+
+    return data[0], data[1]
+
+
+def time_parser(parser, gr_file_paths, repeats):
+    """
+    Return the best wall-clock time (seconds) needed to parse every file once.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for gr_file_path in gr_file_paths:
+            parser(gr_file_path)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+if __name__ == "__main__":
+    gr_file_paths = sorted(
+        os.path.join(GR_DIRECTORY, filename)
+        for filename in os.listdir(GR_DIRECTORY)
+        if filename.endswith(".gr")
+    )
+
+    for gr_file_path in gr_file_paths:
+        legacy_r, legacy_g_r = legacy_read_gr_file(gr_file_path)
+        r, g_r = read_gr_file(gr_file_path)
+        assert np.array_equal(legacy_r, r) and np.array_equal(legacy_g_r, g_r)
+
+    legacy_time = time_parser(legacy_read_gr_file, gr_file_paths, repeats=3)
+    bulk_time = time_parser(read_gr_file, gr_file_paths, repeats=3)
+
+    print(f"{len(gr_file_paths)} .gr files")
+    print(f"line-by-line parser: {legacy_time:8.3f} s")
+    print(f"bulk reader:         {bulk_time:8.3f} s")
+    print(f"speed-up:            {legacy_time / bulk_time:8.1f}x")
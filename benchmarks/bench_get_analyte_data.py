@@ -0,0 +1,64 @@
+"""
+bench_get_analyte_data
+
+Description:
+Compare get_analyte_data with get_analyte_data_linear on synthetic logs of long in-situ campaigns.
+Synthetic logs repeat the measurements in data/log.txt, shifting the times of each repetition.
+Run from the home directory of this repository:
+    python benchmarks/bench_get_analyte_data.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.Determine_Analytes import (  # noqa: E402
+    get_analyte_data,
+    get_analyte_data_linear,
+)
+from src.Read_Log_File import extract_time_temp_data  # noqa: E402
+
+# get_analyte_data is quadratic, so it is only timed up to this many entries.
+QUADRATIC_LIMIT = 20_000
+
+
+def synthetic_log(entries):
+    """
+    Build times, temperatures, and rounded temperatures for a campaign with the given number of entries.
+    """
+    times, temperatures, rounded_temperatures = (
+        np.array(data) for data in extract_time_temp_data("data", "log.txt")
+    )
+    repetitions = -(-entries // len(times))
+    period = times[-1] - times[0] + 600
+    offsets = np.repeat(np.arange(repetitions) * period, len(times))
+
+    return (
+        (np.tile(times, repetitions) + offsets)[:entries].tolist(),
+        np.tile(temperatures, repetitions)[:entries].tolist(),
+        np.tile(rounded_temperatures, repetitions)[:entries].tolist(),
+    )
+
+
+def time_function(function, data):
+    start = time.perf_counter()
+    result = function(*data)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    print(f"{'entries':>9} {'get_analyte_data (s)':>21} {'linear (s)':>11}")
+    for entries in [1_000, 10_000, 20_000, 100_000, 1_000_000]:
+        data = synthetic_log(entries)
+        linear_time, linear_result = time_function(get_analyte_data_linear, data)
+        if entries <= QUADRATIC_LIMIT:
+            quadratic_time, quadratic_result = time_function(get_analyte_data, data)
+            assert quadratic_result == linear_result
+            quadratic_column = f"{quadratic_time:>21.3f}"
+        else:
+            quadratic_column = f"{'(skipped)':>21}"
+        print(f"{entries:>9} {quadratic_column} {linear_time:>11.3f}")
@@ -0,0 +1,48 @@
+"""
+bench_get_gr_files
+
+Description:
+Measure how get_gr_files scales with the number of worker processes and threads.
+Run from the home directory of this repository:
+    python benchmarks/bench_get_gr_files.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.Extract_Data import get_gr_files  # noqa: E402
+from src.Read_Log_File import extract_time_temp_data  # noqa: E402
+
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def time_get_gr_files(rounded_temperatures, workers, executor_type, repeats=3):
+    """
+    Return the best wall-clock time (seconds) of get_gr_files for a given worker configuration.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        get_gr_files(
+            rounded_temperatures,
+            workers=workers,
+            executor_type=executor_type,
+            file_directory="data/gr_files",
+        )
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+if __name__ == "__main__":
+    _, _, rounded_temperatures = extract_time_temp_data("data", "log.txt")
+
+    print(f"{os.cpu_count()} CPUs available")
+    print(f"{'workers':>8} {'processes (s)':>14} {'threads (s)':>12}")
+    for workers in WORKER_COUNTS:
+        process_time = time_get_gr_files(rounded_temperatures, workers, "process")
+        thread_time = time_get_gr_files(rounded_temperatures, workers, "thread")
+        print(f"{workers:>8} {process_time:>14.3f} {thread_time:>12.3f}")
@@ -0,0 +1,62 @@
+"""
+bench_locate_peaks
+
+Description:
+Compare one locate_peaks (scipy.signal.find_peaks) call per curve with batched peak finding over a matrix of curves (locate_peaks_batch).
+Run from the home directory of this repository:
+    python benchmarks/bench_locate_peaks.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.Extract_Data import (  # noqa: E402
+    locate_peaks,
+    locate_peaks_batch,
+    read_gr_file,
+)
+
+GR_DIRECTORY = "data/gr_files"
+TILES = 10
+
+
+def best_time(function, repeats):
+    """
+    Return the best wall-clock time (seconds) of function().
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+if __name__ == "__main__":
+    gr_files = sorted(
+        filename for filename in os.listdir(GR_DIRECTORY) if filename.endswith(".gr")
+    )
+    g_r_matrix = np.tile(
+        [read_gr_file(os.path.join(GR_DIRECTORY, gr_file))[1] for gr_file in gr_files],
+        (TILES, 1),
+    )
+
+    peak_indices, offsets = locate_peaks_batch(g_r_matrix)
+    for i, g_r in enumerate(g_r_matrix):
+        assert np.array_equal(
+            peak_indices[offsets[i] : offsets[i + 1]], locate_peaks(g_r)
+        )
+
+    loop_time = best_time(lambda: [locate_peaks(g_r) for g_r in g_r_matrix], repeats=5)
+    batch_time = best_time(lambda: locate_peaks_batch(g_r_matrix), repeats=5)
+
+    print(f"{len(g_r_matrix)} curves of {g_r_matrix.shape[1]} points")
+    print(f"find_peaks per curve: {loop_time:8.3f} s")
+    print(f"batched:              {batch_time:8.3f} s")
+    print(f"speed-up:             {loop_time / batch_time:8.1f}x")
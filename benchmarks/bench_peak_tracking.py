@@ -0,0 +1,90 @@
+"""
+bench_peak_tracking
+
+Description:
+Compare the original tracker (track_next_experiment, which inserts a matrix column for every new peak),
+the array-backed PeakTracker, and the gated assignment tracker (AssignmentPeakTracker) on the ramp peaks.
+Run from the home directory of this repository:
+    python benchmarks/bench_peak_tracking.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.Peak_Store import open_peaks  # noqa: E402
+from src.Peak_Tracking import (  # noqa: E402
+    AssignmentPeakTracker,
+    PeakTracker,
+    track_next_experiment,
+)
+
+RAMP_PEAKS = "data/pdf_ramp_peaks"
+THRESHOLD_DISTANCE = 20
+
+
+def track_with_matrix(peaks):
+    """
+    Track peaks with track_next_experiment, as track_peaks originally did.
+    """
+    tracked_matrix = np.full((len(peaks), len(peaks[0])), np.nan)
+    tracked_matrix[0] = peaks[0]
+    for i in range(1, len(peaks)):
+        tracked_matrix = track_next_experiment(
+            tracked_matrix, i, peaks[i], THRESHOLD_DISTANCE
+        )
+
+    return tracked_matrix
+
+
+def track_with(tracker, peaks):
+    """
+    Track peaks with a PeakTracker (or subclass) and build the tracked matrix.
+    """
+    for peak_positions in peaks:
+        tracker.add_experiment(peak_positions)
+
+    return tracker.tracked_matrix()
+
+
+def best_time(function, repeats):
+    """
+    Return the best wall-clock time (seconds) of function().
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+if __name__ == "__main__":
+    ramp_peaks = open_peaks(RAMP_PEAKS)
+    ramp_peaks = [np.asarray(ramp_peaks[key]) for key in ramp_peaks]
+
+    for repeats in (1, 5):
+        peaks = ramp_peaks * repeats
+        trackers = {
+            "track_next_experiment": lambda peaks=peaks: track_with_matrix(peaks),
+            "PeakTracker": lambda peaks=peaks: track_with(
+                PeakTracker(THRESHOLD_DISTANCE), peaks
+            ),
+            "AssignmentPeakTracker": lambda peaks=peaks: track_with(
+                AssignmentPeakTracker(THRESHOLD_DISTANCE, max_gap=1), peaks
+            ),
+        }
+        assert np.array_equal(
+            trackers["track_next_experiment"](),
+            trackers["PeakTracker"](),
+            equal_nan=True,
+        )
+
+        print(f"{len(peaks)} scans, {sum(len(p) for p in peaks)} peaks")
+        for name, tracker in trackers.items():
+            print(f"    {name:22s} {best_time(tracker, repeats=3):8.3f} s")
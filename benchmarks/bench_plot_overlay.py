@@ -0,0 +1,82 @@
+"""
+bench_plot_overlay
+
+Description:
+Compare plotting one full-resolution line per PDF with plotting every PDF as one decimated LineCollection (Plot_PDFs.plot_pdf_collection)
+as the number of curves grows.
+Run from the home directory of this repository:
+    python benchmarks/bench_plot_overlay.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from matplotlib.figure import Figure
+
+repository_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, repository_directory)
+# Plot_PDFs is a script module that imports its neighbours from src/ directly.
+sys.path.insert(1, os.path.join(repository_directory, "src"))
+
+from Plot_PDFs import plot_pdf_collection  # noqa: E402
+
+from src.Extract_Data import read_gr_file  # noqa: E402
+
+GR_DIRECTORY = "data/gr_files"
+CURVE_COUNTS = (100, 400, 1600)
+
+
+def plot_lines(r, g_r_matrix, filename):
+    """
+    Plot one full-resolution line per curve, as plot_peaks does.
+    """
+    fig = Figure(figsize=(12, 8))
+    ax = fig.add_subplot()
+    for g_r in g_r_matrix:
+        ax.plot(r, g_r, linewidth=0.8)
+    fig.savefig(filename, format="png")
+
+
+def timed(function):
+    """
+    Return the wall-clock time (seconds) of function().
+    """
+    start = time.perf_counter()
+    function()
+
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    gr_files = sorted(
+        filename for filename in os.listdir(GR_DIRECTORY) if filename.endswith(".gr")
+    )
+    r = read_gr_file(os.path.join(GR_DIRECTORY, gr_files[0]))[0]
+    g_r_data = np.array(
+        [read_gr_file(os.path.join(GR_DIRECTORY, gr_file))[1] for gr_file in gr_files]
+    )
+
+    with tempfile.TemporaryDirectory() as output_directory:
+        line_png = os.path.join(output_directory, "lines.png")
+        collection_png = os.path.join(output_directory, "collection.png")
+        print(
+            f"{'curves':>6} {'lines (s)':>10} {'collection (s)':>15} {'PNG (kB)':>18}"
+        )
+        for n_curves in CURVE_COUNTS:
+            g_r_matrix = np.resize(g_r_data, (n_curves, g_r_data.shape[1]))
+            temperatures = np.linspace(30, 1000, n_curves)
+            line_time = timed(
+                lambda g_r_matrix=g_r_matrix: plot_lines(r, g_r_matrix, line_png)
+            )
+            collection_time = timed(
+                lambda g_r_matrix=g_r_matrix, temperatures=temperatures: plot_pdf_collection(
+                    r, g_r_matrix, temperatures, collection_png
+                )
+            )
+            print(
+                f"{n_curves:6d} {line_time:10.2f} {collection_time:15.2f}"
+                f" {os.path.getsize(line_png) / 1e3:8.0f} -> {os.path.getsize(collection_png) / 1e3:5.0f}"
+            )
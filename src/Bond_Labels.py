@@ -13,7 +13,127 @@ Returns:
                 with keys as (bond, bond_length) and values as corresponding G(r) values.
 """
 
-from Extract_Data import locate_peaks
+import os
+
+import numpy as np
+
+from src.Extract_Data import locate_peaks_batch
+
+# Known peak length ranges (Angstroms)
+KNOWN_PEAK_RANGES = {
+    "Si-O": (1.5, 1.7),
+    "Ca-O": (2.3, 2.5),
+    "O-O": (2.6, 2.7),
+    "Si-Si": (3, 3.2),
+}
+
+
+def load_bond_ranges(file_directory, file_to_read):
+    """
+    Read a library of bond length ranges from a text file with one "bond,lower,upper" line per range (e.g., data/bond_ranges.txt).
+    Blank lines and lines starting with # are skipped.
+
+    Args:
+    - file_directory (str): Directory in which the file_to_read is stored.
+    - file_to_read (str): Bond range file to be read.
+
+    Returns:
+    - bond_ranges (dict): Dictionary with bonds as keys and (lower, upper) bond lengths as values, in the order of the file.
+    """
+    bond_ranges = {}
+    with open(os.path.join(file_directory, file_to_read)) as open_file:
+        for line_number, line in enumerate(open_file, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = [field.strip() for field in line.split(",")]
+            if len(fields) != 3:
+                raise ValueError(
+                    f"{file_to_read}, line {line_number}: expected bond,lower,upper."
+                )
+            bond, lower, upper = fields[0], float(fields[1]), float(fields[2])
+            if bond in bond_ranges:
+                raise ValueError(
+                    f"{file_to_read}, line {line_number}: {bond} is listed twice."
+                )
+            if lower > upper:
+                raise ValueError(
+                    f"{file_to_read}, line {line_number}: lower bound exceeds upper bound."
+                )
+            bond_ranges[bond] = (lower, upper)
+
+    return bond_ranges
+
+
+class BondRangeIndex:
+    """
+    Static interval index over (possibly overlapping) bond length ranges.
+
+    The edges of every range split the r-axis into elementary segments, and the ranges covering each segment are stored
+    in one flat array located by segment offsets. Looking up many bond lengths at once is one np.searchsorted over the
+    sorted edges followed by gathering the ranges of each segment, whatever the number of ranges.
+    """
+
+    def __init__(self, bond_ranges):
+        """
+        Args:
+        - bond_ranges (dict): Dictionary with bonds as keys and (lower, upper) bond lengths as values. Ranges include both ends.
+        """
+        self.bonds = list(bond_ranges)
+        bounds = np.array([bond_ranges[bond] for bond in self.bonds], dtype=float)
+        bounds = bounds.reshape(-1, 2)
+        # Segments are half-open, so each upper bound is moved to the next float to include it.
+        lower_edges = bounds[:, 0]
+        upper_edges = np.nextafter(bounds[:, 1], np.inf)
+        self.edges = np.unique(np.concatenate((lower_edges, upper_edges)))
+
+        first_segments = np.searchsorted(self.edges, lower_edges)
+        segment_counts = np.searchsorted(self.edges, upper_edges) - first_segments
+        range_of_pair = np.repeat(np.arange(len(self.bonds)), segment_counts)
+        segment_of_pair = np.repeat(first_segments, segment_counts) + (
+            np.arange(segment_counts.sum())
+            - np.repeat(np.cumsum(segment_counts) - segment_counts, segment_counts)
+        )
+        # Ranges of each segment are kept in library order.
+        pair_order = np.lexsort((range_of_pair, segment_of_pair))
+        self.segment_ranges = range_of_pair[pair_order]
+        self.segment_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(segment_of_pair, minlength=len(self.edges))))
+        )
+
+    def __len__(self):
+        return len(self.bonds)
+
+    def lookup(self, bond_lengths):
+        """
+        Find every range containing each bond length.
+
+        Args:
+        - bond_lengths (numpy.ndarray): Array containing bond lengths (Angstroms).
+
+        Returns:
+        - length_indices (numpy.ndarray): Index into bond_lengths of each match, in increasing order.
+        - bond_indices (numpy.ndarray): Index into self.bonds of the range of each match (in library order for each length).
+        """
+        bond_lengths = np.asarray(bond_lengths, dtype=float)
+        if len(self.edges) == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        segments = np.searchsorted(self.edges, bond_lengths, side="right") - 1
+        segments = np.where(np.isnan(bond_lengths), -1, segments)
+        first_matches = self.segment_offsets[np.maximum(segments, 0)]
+        match_counts = np.where(
+            segments >= 0,
+            self.segment_offsets[np.maximum(segments, 0) + 1] - first_matches,
+            0,
+        )
+
+        length_indices = np.repeat(np.arange(len(bond_lengths)), match_counts)
+        match_positions = np.repeat(first_matches, match_counts) + (
+            np.arange(match_counts.sum())
+            - np.repeat(np.cumsum(match_counts) - match_counts, match_counts)
+        )
+
+        return length_indices, self.segment_ranges[match_positions]
 
 
 def extract_peak_labels(r1, g_r1):
@@ -29,31 +149,81 @@ def extract_peak_labels(r1, g_r1):
     - labels (dict): Dictionary containing labels for peaks within the first five Angstroms,
                      with keys as (bond, bond_length) and values as corresponding G(r) values.
     """
+    return BondLabeller(r1).label_curves([g_r1])[0]
+
+
+class BondLabeller:
+    """
+    Labels the peaks of PDFs that share one r-axis with the bonds whose length ranges contain them.
+
+    Peaks of every new curve are located together (see Extract_Data.locate_peaks_batch) and matched to bonds with one
+    lookup in a BondRangeIndex, so overlapping ranges are supported and a peak may receive several labels.
+    Labels are cached per curve (keyed by its G(r) values), so labelling the same curve again costs a dictionary lookup.
+    """
+
+    def __init__(self, r, bond_ranges=None, max_r=5):
+        """
+        Args:
+        - r (numpy.ndarray): Array containing r values (Angstroms) shared by every curve.
+        - bond_ranges (dict or BondRangeIndex): Dictionary with bonds as keys and (lower, upper) bond lengths as values
+                                                (e.g., from load_bond_ranges), or an index built from one (default: KNOWN_PEAK_RANGES).
+        - max_r (float): Only peaks at or below max_r (Angstroms) are labelled.
+        """
+        self.r = np.asarray(r)
+        if not isinstance(bond_ranges, BondRangeIndex):
+            bond_ranges = BondRangeIndex(bond_ranges or KNOWN_PEAK_RANGES)
+        self.bond_range_index = bond_ranges
+        self.bonds = bond_ranges.bonds
+        self.max_r = max_r
+        self.cache = {}
+
+    def label_curves(self, g_r_list):
+        """
+        Label the peaks of many curves, locating peaks only for curves that are not cached yet.
+
+        Args:
+        - g_r_list (list): List of arrays containing G(r) values corresponding to self.r.
+
+        Returns:
+        - labels_list (list): Dictionary of labels for each curve, with keys as (bond, bond_length) and values as
+                              corresponding G(r) values, ordered by bond and then by bond length.
+        """
+        # The raw bytes of a curve are its cache key, so a cached curve is only reused for identical G(r) values.
+        curve_keys = [np.asarray(g_r, dtype=float).tobytes() for g_r in g_r_list]
+        new_curves = {}
+        for curve_key, g_r in zip(curve_keys, g_r_list):
+            if curve_key not in self.cache:
+                new_curves[curve_key] = g_r
+
+        if new_curves:
+            g_r_matrix = np.array(list(new_curves.values()), dtype=float)
+            peak_indices, offsets = locate_peaks_batch(g_r_matrix)
+            peak_curves = np.repeat(np.arange(len(g_r_matrix)), np.diff(offsets))
+            # Only peaks within max_r are looked up.
+            peak_indices_within = np.flatnonzero(self.r[peak_indices] <= self.max_r)
+            matched_peaks, bond_indices = self.bond_range_index.lookup(
+                self.r[peak_indices[peak_indices_within]]
+            )
+            matched_peaks = peak_indices_within[matched_peaks]
+            # Order matches by curve, then bond, then position.
+            match_order = np.lexsort(
+                (matched_peaks, bond_indices, peak_curves[matched_peaks])
+            )
+            matched_peaks = matched_peaks[match_order]
+            bond_indices = bond_indices[match_order]
+            match_offsets = np.searchsorted(
+                peak_curves[matched_peaks], np.arange(len(g_r_matrix) + 1)
+            )
+            for i, curve_key in enumerate(new_curves):
+                curve_matches = slice(match_offsets[i], match_offsets[i + 1])
+                curve_peaks = peak_indices[matched_peaks[curve_matches]]
+                self.cache[curve_key] = {
+                    (self.bonds[bond], bond_length): g_r_value
+                    for bond, bond_length, g_r_value in zip(
+                        bond_indices[curve_matches],
+                        self.r[curve_peaks],
+                        g_r_matrix[i, curve_peaks],
+                    )
+                }
 
-    peaks = locate_peaks(g_r1)  # You can adjust the 'height' parameter as needed
-
-    # Known peak length ranges
-    known_peak_ranges = {
-        "Si-O": (1.5, 1.7),
-        "Ca-O": (2.3, 2.5),
-        "O-O": (2.6, 2.7),
-        "Si-Si": (3, 3.2),
-    }
-    # Match identified peaks with known bond length ranges
-    matched_peaks = {}
-    for bond, (lower, upper) in known_peak_ranges.items():
-        matched_indices = [
-            i for i, val in enumerate(r1[peaks]) if lower <= val <= upper
-        ]
-        matched_peaks[bond] = matched_indices
-
-    labels = {}
-    for bond, indices in matched_peaks.items():
-        for idx in indices:
-            if r1[peaks][idx] <= 5:  # Consider peaks within the first five Angstroms
-                bond_length = r1[peaks][idx]  # Retrieve the bond length
-                labels[(bond, bond_length)] = g_r1[peaks][
-                    idx
-                ]  # Save bond and length in the dictionary
-
-    return labels
+        return [self.cache[curve_key] for curve_key in curve_keys]
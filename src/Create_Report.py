@@ -9,14 +9,20 @@ This script retrieves PDF data, saves peak positions, and generates a portable d
 """
 
 # from Peak_Tracking import track_peaks
+import argparse
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+import matplotlib as mpl
 import numpy as np
-from Determine_Analytes import get_analyte_data
+from Determine_Analytes import get_analyte_data_linear
 from Extract_Data import get_gr_files
-from Integrate_Peaks import peak_integration
-from Peak_Tracking import track_peaks
-from Plot_PDFs import Plot_multiple_PDFs
+from Gr_Cube import build_gr_cube, load_gr_cube, scan_index, scan_metadata_from_log
+from Integrate_Peaks import campaign_peak_integration, peak_integration
+from Peak_Store import save_refined_peak_store
+from Peak_Tracking import track_peaks, tracking_schedule
+from Plot_PDFs import Plot_multiple_PDFs, plot_gr_heatmap
 from Plot_Total_Peaks import plot_total_peaks
 from Read_Log_File import extract_time_temp_data
 from reportlab.lib.enums import TA_CENTER
@@ -31,14 +37,15 @@ from reportlab.platypus import (
 )
 
 
-def preliminary_analysis():
+def preliminary_analysis(dtype=np.float64):
     """
     Analyze time- and temperature-dependent pair distribution function (PDF) data.
     Details about the experiment are read from a log.txt file, and pair distribution function data are stored as .gr files.
     Args:
-        None.
+        dtype: Data type of the stacked G(r) data and of the G(r) data used to locate peaks (np.float32 halves their memory).
     Returns:
-        Prints two NPZ files containing dictionaries of peaks from ramp and dwell data.
+        Saves two peak stores (see Peak_Store.save_refined_peak_store) containing dictionaries of peaks from ramp and dwell data,
+        and the matrix of peak integrals of every scan (see Integrate_Peaks.campaign_peak_integration).
     """
     (
         recorded_times_from_experiment,
@@ -46,19 +53,174 @@ def preliminary_analysis():
         rounded_temperatures,
     ) = extract_time_temp_data("../data", "log.txt")
 
-    analyte_times, analyte_temperatures = get_analyte_data(
+    analyte_times, analyte_temperatures = get_analyte_data_linear(
         recorded_times_from_experiment,
         recorded_temperatures_from_experiment,
         rounded_temperatures,
     )
 
-    pdf_ramp_peaks_dict, pdf_dwell_peaks_dict = get_gr_files(rounded_temperatures)
+    # Stack the G(r) data of every scan, then save peaks with refined positions, heights, and widths.
+    gr_cube = build_gr_cube(
+        "../data/gr_files",
+        scan_metadata_from_log("../data", "log.txt"),
+        "../data/gr_cube",
+        dtype=dtype,
+    )
+    save_peak_stores(rounded_temperatures, gr_cube)
+
+    # Integrate the peaks of every ramp and dwell scan from the stacked G(r) data.
+    campaign_peak_integration(
+        "../data/gr_cube",
+        "../data/pdf_ramp_peaks",
+        "../data/pdf_dwell_peaks",
+        "../data/peak_integrals",
+    )
+
+
+def save_peak_stores(rounded_temperatures, gr_cube):
+    """
+    Locate the peaks of every ramp and dwell PDF and save them as peak stores with refined positions, heights, and widths.
+    Args:
+        rounded_temperatures: List of rounded temperatures at which PDF data was recorded.
+        gr_cube: GrCube (see Gr_Cube.build_gr_cube) holding the G(r) data of every scan; peaks are located in G(r) data of its data type.
+    Returns:
+        None (saves ../data/pdf_ramp_peaks and ../data/pdf_dwell_peaks).
+    """
+    pdf_ramp_peaks_dict, pdf_dwell_peaks_dict = get_gr_files(
+        rounded_temperatures, dtype=gr_cube.g_r.dtype
+    )
+
+    cube_rows = {
+        (scan["kind"], scan["key"]): row for row, scan in enumerate(gr_cube.scans)
+    }
+    for kind, peaks_dict in (
+        ("ramp", pdf_ramp_peaks_dict),
+        ("dwell", pdf_dwell_peaks_dict),
+    ):
+        save_refined_peak_store(
+            os.path.join("../data", f"pdf_{kind}_peaks"),
+            peaks_dict,
+            gr_cube.g_r,
+            [cube_rows[(kind, key)] for key in peaks_dict],
+        )
+
+
+def render_pdf_plots():
+    """
+    Section 1: plot selected PDFs over the full r-range and within the first five Angstroms.
+    """
+    Plot_multiple_PDFs()
+
+
+def render_peak_histogram():
+    """
+    Section 2: plot the number of peaks of every ramp PDF.
+    """
+    plot_total_peaks(
+        "../data/pdf_ramp_peaks", save_path="../data/images/total_peaks_histogram.png"
+    )
+
 
-    np.savez(os.path.join("../data", "pdf_ramp_peaks.npz"), **pdf_ramp_peaks_dict)
-    np.savez(os.path.join("../data", "pdf_dwell_peaks.npz"), **pdf_dwell_peaks_dict)
+def render_tracked_peaks():
+    """
+    Section 3: track the peaks of the PDFs listed in user_input.txt and tabulate them.
+    """
+    track_peaks(20)
+
+
+def render_peak_integrals():
+    """
+    Section 4: tabulate changes to dwell peak integrals.
+    """
+    peak_integration(
+        "../data/pdf_dwell_peaks",
+        save_path="../data/images/peak_integral_differences.png",
+    )
+
+
+def render_gr_heatmap():
+    """
+    Section 5: track peaks across every scan in log.txt and draw the tracks over the G(r) data of every scan.
+    """
+    track_peaks(20, schedule="log")
+    experiment_type, temperature_point = tracking_schedule("log")
+    scans = load_gr_cube("../data/gr_cube").scans
+    plot_gr_heatmap(
+        "../data/gr_cube",
+        "../data/images/gr_heatmap.png",
+        trajectories=np.load("../data/tracked_peak_trajectories.npy"),
+        trajectory_rows=[
+            scan_index(scans, kind, key)
+            for kind, key in zip(experiment_type, temperature_point)
+        ],
+    )
+
+
+# Report sections are independent of one another; each saves its images to ../data/images.
+REPORT_SECTIONS = {
+    "pdf_plots": render_pdf_plots,
+    "peak_histogram": render_peak_histogram,
+    "tracked_peaks": render_tracked_peaks,
+    "peak_integrals": render_peak_integrals,
+    "gr_heatmap": render_gr_heatmap,
+}
+
+
+def render_section(section):
+    """
+    Render the images of one report section and time it.
+    Args:
+        section: Key of REPORT_SECTIONS.
+    Returns:
+        Tuple of the section and the time taken to render it (in seconds).
+    """
+    start_time = time.perf_counter()
+    REPORT_SECTIONS[section]()
 
+    return section, time.perf_counter() - start_time
+
+
+def use_agg_backend():
+    """
+    Select the non-interactive Agg backend in a worker process.
+    """
+    mpl.use("Agg")
+
+
+def render_sections(sections=tuple(REPORT_SECTIONS), parallel=False, max_workers=None):
+    """
+    Render the images of report sections, one after another or each in its own worker process.
+    Figures are built with the object-oriented Figure API rather than pyplot, so sections share no plotting state.
+    Args:
+        sections: Keys of REPORT_SECTIONS to render.
+        parallel: Whether to render sections in parallel worker processes.
+        max_workers: Maximum number of worker processes (None uses the number of processors).
+    Returns:
+        Dictionary within which keys are sections and values are the times taken to render them (in seconds).
+    """
+    if not parallel:
+        return dict(map(render_section, sections))
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=use_agg_backend
+    ) as executor:
+        return dict(executor.map(render_section, sections))
+
+
+def create_report(file_path, build_images=True, parallel=False):
+    """
+    Compile the plots and tables of every analysis section into a portable document file.
+    The images of all sections are rendered first (see render_sections), then the document is assembled once.
+    Args:
+        file_path: Path of the report.
+        build_images: Whether to run the analysis of each section; if False, images already saved in ../data/images are used.
+        parallel: Whether to render the images of the sections in parallel worker processes.
+    Returns:
+        Dictionary of the time taken to render each section, and to assemble the document (key "document"), in seconds.
+    """
+    section_timings = render_sections(parallel=parallel) if build_images else {}
+    start_time = time.perf_counter()
 
-def create_report(file_path):
     doc = SimpleDocTemplate(file_path, pagesize=letter)
     story = []
     styles = getSampleStyleSheet()
@@ -85,6 +247,7 @@ def create_report(file_path):
         ("Visualizing Total Number of Peaks Over Time", 2),
         ("Quantifying Peak Positions", 3),
         ("Peak Integration", 4),
+        ("Visualizing G(r) of Every Scan", 5),
     ]
 
     toc = []
@@ -107,7 +270,10 @@ def create_report(file_path):
     story.append(Paragraph("This section visualizes the PDF data.", styles["Normal"]))
     # add plot of PDFs on same figure
 
-    total_img, zoom_img = Plot_multiple_PDFs()
+    total_img, zoom_img = (
+        "../data/images/total_peaks_and_PDFs.png",
+        "../data/images/zoomed_peaks_and_PDFs.png",
+    )
     # Assuming 'story' is your report object in ReportLab
     # Add total_image to the report
     total_img_obj = Image(total_img)
@@ -136,11 +302,7 @@ def create_report(file_path):
         )
     )
 
-    ramp_npz = "../data/pdf_ramp_peaks.npz"
-    dwell_npz = "../data/pdf_dwell_peaks.npz"
-    image_filename2 = plot_total_peaks(
-        ramp_npz, save_path="../data/images/total_peaks_histogram.png"
-    )
+    image_filename2 = "../data/images/total_peaks_histogram.png"
     img = Image(image_filename2)
 
     img.drawWidth = 600
@@ -160,7 +322,6 @@ def create_report(file_path):
             styles["Normal"],
         )
     )
-    track_peaks(20)
     img = Image("../data/images/selected_tracked_peak_matrix.png")
 
     img.drawWidth = 600
@@ -178,9 +339,7 @@ def create_report(file_path):
             styles["Normal"],
         )
     )
-    image_filename4 = peak_integration(
-        dwell_npz, save_path="../data/images/peak_integral_differences.png"
-    )
+    image_filename4 = "../data/images/peak_integral_differences.png"
     img = Image(image_filename4)
 
     img.drawWidth = 600
@@ -188,13 +347,49 @@ def create_report(file_path):
     story.append(img)
     story.append(PageBreak())
 
+    # SECTION 5: G(r) HEATMAP
+    story.append(
+        Paragraph(
+            '<a name="page5"/>Section 5: Visualizing G(r) of Every Scan',
+            styles["Heading1"],
+        )
+    )
+    story.append(
+        Paragraph(
+            "This image shows the G(r) data of every ramp and dwell PDF in the order they were recorded, with peak positions tracked across all of them drawn on top. Full results of tracked peak positions are shown in tracked_peak_trajectories.txt.",
+            styles["Normal"],
+        )
+    )
+    img = Image("../data/images/gr_heatmap.png")
+
+    img.drawWidth = 600
+    img.drawHeight = 400
+    story.append(img)
+    story.append(PageBreak())
+
     doc.build(story)
+    section_timings["document"] = time.perf_counter() - start_time
+
+    return section_timings
+
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Analyze the PDF data in ../data and compile the final report."
+    )
+    parser.add_argument(
+        "--dtype",
+        choices=("float64", "float32"),
+        default="float64",
+        help="Precision in which G(r) data are stored (default: float64; float32 halves their memory).",
+    )
+    args = parser.parse_args()
 
-# usage:
-preliminary_analysis()
+    preliminary_analysis(dtype=np.dtype(args.dtype))
 
-output_file_path = "../data/final_output_report.pdf"
-create_report(output_file_path)
+    output_file_path = "../data/final_output_report.pdf"
+    section_timings = create_report(output_file_path, parallel=True)
 
-print(f"Report generated: {output_file_path}")
+    print(f"Report generated: {output_file_path}")
+    for section, seconds in section_timings.items():
+        print(f"  {section}: {seconds:.2f} s")
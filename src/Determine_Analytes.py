@@ -10,6 +10,7 @@ This script identifies extraneous data from the log.txt file and creates lists t
 
 
 import numpy as np
+import pandas as pd
 
 
 def get_analyte_data(
@@ -62,6 +63,84 @@ def get_analyte_data(
     return analyte_times, analyte_temperatures
 
 
+def get_analyte_data_linear(
+    recorded_times_from_experiment,
+    recorded_temperatures_from_experiment,
+    rounded_temperatures,
+):
+    """
+    Linear-time equivalent of get_analyte_data for long in-situ campaigns.
+    Measurements are grouped by rounded temperature with one hash pass, and extraneous measurements are removed with a boolean mask.
+    Unlike get_analyte_data, a skipped measurement is identified by its position rather than its time, so scans that share a
+    timestamp are kept or skipped individually and keep their own temperatures.
+    Args:
+        recorded_times_from_experiment: List (or NumPy array) of times at which PDF data was recorded.
+        recorded_temperatures_from_experiment: List (or NumPy array) of temperatures at which PDF data was recorded.
+        rounded_temperatures: List (or NumPy array) of temperatures, each rounded to the nearest 10s place.
+    Returns:
+        List of analyte times, list of analyte temperatures.
+    """
+    recorded_times_from_experiment = np.asarray(recorded_times_from_experiment)
+    recorded_temperatures_from_experiment = np.asarray(
+        recorded_temperatures_from_experiment
+    )
+    keep_mask = analyte_mask(recorded_times_from_experiment, rounded_temperatures)
+
+    return (
+        recorded_times_from_experiment[keep_mask].tolist(),
+        recorded_temperatures_from_experiment[keep_mask].tolist(),
+    )
+
+
+def analyte_mask(recorded_times_from_experiment, rounded_temperatures):
+    """
+    Identify the measurements kept by get_analyte_data.
+    The dwell temperatures that get_analyte_data visits are found by following its search (jumping past the last occurrence of each
+    visited temperature), but every jump is a binary search over the positions of multiples of 100 instead of a linear scan.
+    At each visited dwell temperature, the first measurement recorded 120 seconds after the first occurrence is skipped.
+    Args:
+        recorded_times_from_experiment: NumPy array of times at which PDF data was recorded.
+        rounded_temperatures: List (or NumPy array) of temperatures, each rounded to the nearest 10s place.
+    Returns:
+        NumPy array of booleans, True for analyte measurements.
+    """
+    recorded_times_from_experiment = np.asarray(recorded_times_from_experiment)
+    rounded_temperatures = np.asarray(rounded_temperatures, dtype=float)
+
+    # Group measurements by rounded temperature: positions of each group are contiguous in group_order, in recorded order.
+    group_codes, _ = pd.factorize(rounded_temperatures)
+    group_order = np.argsort(group_codes, kind="stable")
+    group_offsets = np.concatenate(([0], np.cumsum(np.bincount(group_codes))))
+
+    divided_temperatures = divide_by_100(rounded_temperatures)
+    dwell_positions = np.flatnonzero(
+        np.isfinite(divided_temperatures)
+        & (divided_temperatures == np.floor(divided_temperatures))
+    )
+
+    keep_mask = np.ones(len(rounded_temperatures), dtype=bool)
+    search_index = 0
+    next_dwell = np.searchsorted(dwell_positions, search_index)
+    while next_dwell < len(dwell_positions):
+        group = group_codes[dwell_positions[next_dwell]]
+        group_positions = group_order[group_offsets[group] : group_offsets[group + 1]]
+        time_differences = (
+            recorded_times_from_experiment[group_positions]
+            - recorded_times_from_experiment[group_positions[0]]
+        )
+        two_minute_positions = np.flatnonzero(time_differences == 120)
+        if len(two_minute_positions) == 0:
+            raise ValueError(
+                f"No measurement 120 s after the first at {rounded_temperatures[group_positions[0]]}."
+            )
+        keep_mask[group_positions[two_minute_positions[0]]] = False
+
+        search_index = group_positions[-1] + 1
+        next_dwell = np.searchsorted(dwell_positions, search_index)
+
+    return keep_mask
+
+
 def divide_by_100(dividend):
     """
     Divide a given value by 100.
@@ -9,136 +9,274 @@ This script searches .gr files and saves PDF data for further analysis, such as
 """
 
 
+import mmap
 import os
-import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import NamedTuple
 
 import numpy as np
 from ordered_set import OrderedSet
 from scipy.signal import find_peaks
 
 from src.Determine_Analytes import divide_by_100
+from src.Gr_Cache import load_gr_data
 
+EXECUTOR_TYPES = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
 
-def get_gr_files(rounded_temperatures):
+# One read-only array per distinct r-axis (see shared_r_axis).
+SHARED_R_AXES = {}
+
+
+class GrJob(NamedTuple):
+    """
+    A .gr file to be processed.
+    key: Identifying temperature (with interval for ramp data) under which its peaks are stored.
+    filepath: Path to the .gr file.
+    kind: "ramp" or "dwell".
+    """
+
+    key: str
+    filepath: str
+    kind: str
+
+
+def get_gr_files(
+    rounded_temperatures,
+    workers=1,
+    executor_type="process",
+    file_directory="../data/gr_files",
+    dtype=np.float64,
+):
     """
     Iterate over and extract data from each .gr file of interest.
-    Convert the list of rounded temperatures to an ordered set to avoid double-counting.
+    The .gr files are first planned from the rounded temperatures (see plan_gr_jobs), then processed serially or in parallel.
     Args:
         rounded_temperatures: List of rounded temperature values.
+        workers: Number of workers used to process .gr files; 1 processes them serially.
+        executor_type: "process" or "thread", the kind of pool used when workers > 1.
+        file_directory: Name of or path to directory containing the .gr files.
+        dtype: Data type in which G(r) data are held while locating peaks (e.g., np.float32; see extract_pdf_data).
     Returns:
         Dictionary of ramp data, dictionary of dwell data.
         Keys are identifying temperatures (with intervals for ramp data) and values are NumPy arrays of peak positions.
     """
-    pdf_ramp_peaks_dict = {}
-    pdf_dwell_peaks_dict = {}
+    gr_jobs = plan_gr_jobs(rounded_temperatures, file_directory)
 
-    # Extract data for the first PDF.
-    pdf_initial_data_r, pdf_initial_data_g_r = extract_pdf_data(
-        "../data/gr_files",
-        f"Synthetic_CSH_0{rounded_temperatures[0]:n}degC_normalized.gr",
-    )
-    pdf_dwell_peaks_dict[f"{rounded_temperatures[0]:n}"] = locate_peaks(
-        pdf_initial_data_g_r
-    )
+    if workers > 1:
+        if executor_type not in EXECUTOR_TYPES:
+            raise ValueError(
+                f"executor_type must be one of {list(EXECUTOR_TYPES)}, not {executor_type!r}."
+            )
+        with EXECUTOR_TYPES[executor_type](max_workers=workers) as executor:
+            return run_gr_jobs(gr_jobs, executor, dtype=dtype)
+
+    return run_gr_jobs(gr_jobs, dtype=dtype)
 
-    # Extract data for every PDF after the first.
+
+def plan_gr_jobs(rounded_temperatures, file_directory="../data/gr_files"):
+    """
+    List every .gr file of interest, in the order its peaks are stored, without reading any data.
+    Convert the list of rounded temperatures to an ordered set to avoid double-counting.
+    Args:
+        rounded_temperatures: List of rounded temperature values.
+        file_directory: Name of or path to directory containing the .gr files.
+    Returns:
+        List of GrJob.
+    """
+    # The first PDF.
+    gr_jobs = [
+        GrJob(
+            f"{rounded_temperatures[0]:n}",
+            os.path.join(
+                file_directory,
+                f"Synthetic_CSH_0{rounded_temperatures[0]:n}degC_normalized.gr",
+            ),
+            "dwell",
+        )
+    ]
+
+    # Every PDF after the first.
     two_minute_interval_count = 0
     next_dwell_temperature = 100
     for temperature in OrderedSet(rounded_temperatures):
         if temperature == rounded_temperatures[0]:
-            pass
-        elif divide_by_100(temperature).is_integer() is False:
-            pdf_ramp_data_r, pdf_ramp_data_g_r = extract_pdf_data(
-                "../data/gr_files",
+            continue
+
+        ramp_job = GrJob(
+            f"{next_dwell_temperature:n}_0{two_minute_interval_count:n}",
+            os.path.join(
+                file_directory,
                 "Synthetic_CSH_CSH_pdf_ramp_{:n}_0{:n}_normalized.gr".format(
                     next_dwell_temperature, two_minute_interval_count
                 ),
-            )
-            pdf_ramp_peaks_dict[
-                f"{next_dwell_temperature:n}_0{two_minute_interval_count:n}"
-            ] = locate_peaks(pdf_ramp_data_g_r)
+            ),
+            "ramp",
+        )
+        if divide_by_100(temperature).is_integer() is False:
+            gr_jobs.append(ramp_job)
             two_minute_interval_count += 1
-        elif (
-            divide_by_100(temperature).is_integer() is True
-            and next_dwell_temperature == rounded_temperatures[-1]
-        ):
-            pdf_ramp_data_r, pdf_ramp_data_g_r = extract_pdf_data(
-                "../data/gr_files",
-                "Synthetic_CSH_CSH_pdf_ramp_{:n}_0{:n}_normalized.gr".format(
-                    next_dwell_temperature, two_minute_interval_count
-                ),
-            )
-            pdf_ramp_peaks_dict[
-                f"{next_dwell_temperature:n}_0{two_minute_interval_count:n}"
-            ] = locate_peaks(pdf_ramp_data_g_r)
+        elif next_dwell_temperature == rounded_temperatures[-1]:
+            gr_jobs.append(ramp_job)
         else:
-            pdf_ramp_data_r, pdf_ramp_data_g_r = extract_pdf_data(
-                "../data/gr_files",
-                "Synthetic_CSH_CSH_pdf_ramp_{:n}_0{:n}_normalized.gr".format(
-                    next_dwell_temperature, two_minute_interval_count
-                ),
-            )
-            pdf_dwell_data_r, pdf_dwell_data_g_r = extract_pdf_data(
-                "../data/gr_files",
-                f"Synthetic_CSH_{next_dwell_temperature:n}degC_normalized.gr",
-            )
-            pdf_ramp_peaks_dict[
-                f"{next_dwell_temperature:n}_0{two_minute_interval_count:n}"
-            ] = locate_peaks(pdf_ramp_data_g_r)
-            pdf_dwell_peaks_dict[f"{next_dwell_temperature:n}"] = locate_peaks(
-                pdf_dwell_data_g_r
+            gr_jobs.append(ramp_job)
+            gr_jobs.append(
+                GrJob(
+                    f"{next_dwell_temperature:n}",
+                    os.path.join(
+                        file_directory,
+                        f"Synthetic_CSH_{next_dwell_temperature:n}degC_normalized.gr",
+                    ),
+                    "dwell",
+                )
             )
             two_minute_interval_count = 0
             next_dwell_temperature += 100
 
+    return gr_jobs
+
+
+def run_gr_jobs(gr_jobs, executor=None, dtype=np.float64):
+    """
+    Locate the peaks of every planned .gr file.
+    Args:
+        gr_jobs: List of GrJob (see plan_gr_jobs).
+        executor: Any concurrent.futures.Executor used to process the files; None processes them serially.
+        dtype: Data type in which G(r) data are held while locating peaks.
+    Returns:
+        Dictionary of ramp data, dictionary of dwell data, with keys in the order of gr_jobs.
+    """
+    gr_file_paths = [gr_job.filepath for gr_job in gr_jobs]
+    find_gr_file_peaks = partial(gr_file_peaks, dtype=dtype)
+    if executor is None:
+        peaks = list(map(find_gr_file_peaks, gr_file_paths))
+    else:
+        peaks = list(executor.map(find_gr_file_peaks, gr_file_paths))
+
+    pdf_ramp_peaks_dict = {}
+    pdf_dwell_peaks_dict = {}
+    for gr_job, gr_file_peak_positions in zip(gr_jobs, peaks):
+        if gr_job.kind == "ramp":
+            pdf_ramp_peaks_dict[gr_job.key] = gr_file_peak_positions
+        else:
+            pdf_dwell_peaks_dict[gr_job.key] = gr_file_peak_positions
+
     return pdf_ramp_peaks_dict, pdf_dwell_peaks_dict
 
 
-def extract_pdf_data(file_directory, gr_file_to_read):
+def gr_file_peaks(gr_file_path, dtype=np.float64):
+    """
+    Extract data from a .gr file and locate its peaks.
+    Defined at module level so that it can be sent to worker processes.
+    Args:
+        gr_file_path: Path to the .gr file to be parsed/read.
+        dtype: Data type in which G(r) data are held.
+    Returns:
+        NumPy array of indices at which selected maxima in G(r) are present.
+    """
+    _, g_r = extract_pdf_data(*os.path.split(gr_file_path), dtype=dtype)
+
+    return locate_peaks(g_r)
+
+
+def extract_pdf_data(file_directory, gr_file_to_read, use_cache=True, dtype=np.float64):
     """
     Read a .gr file and extract r and G(r) data from each line.
+    Parsed data are reused from the binary cache (see Gr_Cache) when the file is unchanged.
     Rescale the data if the temperature is less than 100 degrees Celcius.
     Args:
         file_directory: Name of or path to directory containing the .gr file.
         file: .gr file to be parsed/read.
+        use_cache: Whether to read from and write to the binary cache.
+        dtype: Data type of the returned G(r) data (e.g., np.float32 to halve its memory).
     Returns:
-        NumPy array of r data, NumPy array of G(r) data (raw or scaled).
-    """
-    with open(os.path.join(file_directory, gr_file_to_read)) as open_gr_file:
-        individual_lines = open_gr_file.readlines()
-
-    # Search for the line that signals the start of data to be extracted.
-    start_data = next(
-        (
-            i
-            for i, line in enumerate(individual_lines)
-            if re.search(r"#### start data", line)
-        ),
-        None,
-    )
-    if start_data is not None:
-        data = [line.split() for line in individual_lines[start_data + 3 :]]
-        data = np.array(data, dtype=float).T
-        r, g_r = data[0], data[1]
+        NumPy array of r data (read-only and shared by every file on the same r-axis, see shared_r_axis),
+        NumPy array of G(r) data (raw or scaled).
+    """
+    gr_file_path = os.path.join(file_directory, gr_file_to_read)
+    if use_cache:
+        r, g_r = load_gr_data(gr_file_path, read_gr_file)
+    else:
+        r, g_r = read_gr_file(gr_file_path)
 
+    # G(r) is copied only if it is a strided view of the parsed data or of another data type; it is then rescaled in place.
+    r = shared_r_axis(r)
+    g_r = np.ascontiguousarray(g_r, dtype=dtype)
     if "100_" in gr_file_to_read:
-        g_r = rescale_g_r(g_r)
+        g_r = rescale_g_r(g_r, in_place=True)
 
     return r, g_r
 
 
-def rescale_g_r(extracted_g_r_data):
+def shared_r_axis(r):
+    """
+    Return a single read-only copy of each distinct r-axis, so that PDFs recorded on the same r values share one array.
+    The r-axis is kept in double precision whatever the data type of G(r), so that r values compare exactly.
+    Args:
+        r: NumPy array of r data.
+    Returns:
+        Read-only NumPy array equal to r.
+    """
+    r_key = (r.dtype.str, r.tobytes())
+    if r_key not in SHARED_R_AXES:
+        shared_r = np.array(r)
+        shared_r.flags.writeable = False
+        SHARED_R_AXES[r_key] = shared_r
+
+    return SHARED_R_AXES[r_key]
+
+
+def read_gr_file(gr_file_path):
+    """
+    Parse the data block of a .gr file in a single pass.
+    The "#### start data" marker is located once in a memory-mapped buffer and every line after the two column headers is parsed directly into one float64 array.
+    Args:
+        gr_file_path: Path to the .gr file to be parsed/read.
+    Returns:
+        NumPy array of r data, NumPy array of raw G(r) data.
+    """
+    with open(gr_file_path, "rb") as open_gr_file, mmap.mmap(
+        open_gr_file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as gr_buffer:
+        start_data = gr_buffer.find(b"#### start data")
+        if start_data == -1:
+            raise ValueError(f"No '#### start data' line found in {gr_file_path}.")
+
+        # Skip the start data line and the "#S" and "#L" lines that follow it.
+        data_offset = start_data
+        for _ in range(3):
+            data_offset = gr_buffer.find(b"\n", data_offset) + 1
+            if data_offset == 0:
+                data_offset = len(gr_buffer)
+                break
+
+        data = np.fromstring(gr_buffer[data_offset:], dtype=np.float64, sep=" ")
+
+    if data.size % 2 != 0:
+        raise ValueError(f"Unpaired r and G(r) values found in {gr_file_path}.")
+    data = data.reshape(-1, 2).T
+
+    return data[0], data[1]
+
+
+def rescale_g_r(extracted_g_r_data, in_place=False):
     """
     Account for the presence of water in samples measured at temperatures under 100 degrees Celcius.
     The dividend used to compute the scale factor is the maximum Si-O peak intensity at 100 degrees Celcius.
     Multiply G(r) data by a computed constant to rescale it with respect to a local maximum peak intensity.
+    The data type of the G(r) data is kept.
     Args:
         extracted_g_r_data = NumPy array containing raw G(r) values.
+        in_place = Whether to overwrite extracted_g_r_data instead of allocating a new array.
     Returns:
-        NumPy array of adjusted G(r) values.
+        NumPy array of adjusted G(r) values (extracted_g_r_data itself if in_place).
     """
     H2O_scale_factor = 0.278468 / max(extracted_g_r_data[160:170])
 
+    if in_place:
+        extracted_g_r_data *= H2O_scale_factor
+        return extracted_g_r_data
+
     return extracted_g_r_data * H2O_scale_factor
 
 
@@ -157,3 +295,201 @@ def locate_peaks(g_r):
     peaks = np.delete(peaks, np.where((peaks < 81) | (peaks > 3001)))
 
     return peaks
+
+
+def locate_peaks_batch(g_r_matrix, chunk_rows=256):
+    """
+    Locate the peaks of every G(r) curve in a (scans x r) matrix with array operations instead of one find_peaks call per curve.
+    Single-sample maxima are found with comparison masks over the whole matrix. Flat tops (runs of equal values) are found from the
+    few zero slopes and placed at their middle, as in scipy.signal.find_peaks.
+    The same height (>= 0) and range (0.81 - 30.00 Angstroms) conditions as locate_peaks apply.
+    Rows are processed in chunks so that memory-mapped matrices are never loaded whole.
+    Args:
+        g_r_matrix: 2-D NumPy array (or memory map) of G(r) data, one curve per row.
+        chunk_rows: Number of rows processed at once.
+    Returns:
+        NumPy array of peak indices of all curves concatenated, NumPy array of offsets.
+        Peaks of curve i are peak_indices[offsets[i]:offsets[i + 1]], identical to locate_peaks(g_r_matrix[i]).
+    """
+    peak_indices_chunks = []
+    peak_counts = np.zeros(len(g_r_matrix), dtype=np.int64)
+    for first_row in range(0, len(g_r_matrix), chunk_rows):
+        g_r_chunk = np.asarray(g_r_matrix[first_row : first_row + chunk_rows])
+
+        # Slopes between indices 80 and 3002 decide every single-sample maximum between indices 81 and 3001.
+        window_slopes = np.diff(g_r_chunk[:, 80:3003], axis=1)
+        peak_rows, peak_indices = np.nonzero(
+            (window_slopes[:, :-1] > 0) & (window_slopes[:, 1:] < 0)
+        )
+        peak_indices += 81
+
+        # A flat top whose middle lies between indices 81 and 3001 always has a zero slope in the window,
+        # so only those curves are searched (over their full length) for flat tops.
+        flat_rows = np.flatnonzero((window_slopes == 0).any(axis=1))
+        flat_slopes = np.diff(g_r_chunk[flat_rows], axis=1)
+        zero_rows, zero_positions = np.nonzero(flat_slopes == 0)
+        run_starts = np.flatnonzero(
+            (np.diff(zero_positions, prepend=-2) != 1)
+            | (np.diff(zero_rows, prepend=-1) != 0)
+        )
+        run_ends = np.flatnonzero(
+            (np.diff(zero_positions, append=-2) != 1)
+            | (np.diff(zero_rows, append=-1) != 0)
+        )
+        run_rows = zero_rows[run_starts]
+        first_flat, last_flat = zero_positions[run_starts], zero_positions[run_ends]
+
+        # A flat top rises before its first zero slope and falls after its last.
+        bounded = (first_flat >= 1) & (last_flat + 1 < flat_slopes.shape[1])
+        run_rows, first_flat, last_flat = (
+            run_rows[bounded],
+            first_flat[bounded],
+            last_flat[bounded],
+        )
+        flat_tops = (flat_slopes[run_rows, first_flat - 1] > 0) & (
+            flat_slopes[run_rows, last_flat + 1] < 0
+        )
+        flat_top_indices = (first_flat[flat_tops] + last_flat[flat_tops] + 1) // 2
+        in_range = (flat_top_indices >= 81) & (flat_top_indices <= 3001)
+
+        peak_rows = np.concatenate(
+            (peak_rows, flat_rows[run_rows[flat_tops][in_range]])
+        )
+        peak_indices = np.concatenate((peak_indices, flat_top_indices[in_range]))
+        peak_order = np.lexsort((peak_indices, peak_rows))
+        peak_rows, peak_indices = peak_rows[peak_order], peak_indices[peak_order]
+
+        # Only record peaks with a positive maximum intensity.
+        positive_peaks = g_r_chunk[peak_rows, peak_indices] >= 0
+        peak_indices_chunks.append(peak_indices[positive_peaks])
+        peak_counts[first_row : first_row + len(g_r_chunk)] = np.bincount(
+            peak_rows[positive_peaks], minlength=len(g_r_chunk)
+        )
+
+    peak_indices = np.concatenate([np.zeros(0, dtype=np.int64), *peak_indices_chunks])
+    offsets = np.concatenate(([0], np.cumsum(peak_counts)))
+
+    return peak_indices, offsets
+
+
+def refine_peaks(
+    g_r_matrix, peak_indices, offsets, gaussian_fit=False, fit_half_width=5
+):
+    """
+    Refine integer peak positions (e.g., from locate_peaks_batch) to sub-sample positions, and estimate peak heights and widths.
+    A parabola through each maximum and its two neighbours gives the position, height, and (from its curvature) the full width
+    at half maximum (FWHM) of a Gaussian with the same curvature. All peaks are refined at once with array operations.
+    Optionally, a Gaussian is then fitted to the samples around every peak by batched Gauss-Newton iterations; peaks whose fit
+    fails keep their parabolic estimates.
+    Args:
+        g_r_matrix: 2-D NumPy array (or memory map) of G(r) data, one curve per row.
+        peak_indices: NumPy array of the peak positions (indices) of all curves concatenated.
+        offsets: NumPy array of offsets; the peaks of curve i are peak_indices[offsets[i]:offsets[i + 1]].
+        gaussian_fit: Whether to fit a Gaussian to each peak.
+        fit_half_width: Number of samples on either side of a peak used in the Gaussian fit.
+    Returns:
+        Dictionary of NumPy arrays with one value per peak: "position" (fractional index), "height" (G(r)), and "width" (FWHM in indices).
+        Positions in Angstroms are position / 100.
+    """
+    g_r_matrix = np.asarray(g_r_matrix)
+    peak_indices = np.asarray(peak_indices, dtype=np.int64)
+    peak_rows = np.repeat(np.arange(len(g_r_matrix)), np.diff(offsets))
+    peak_indices = np.clip(peak_indices, 1, g_r_matrix.shape[1] - 2)
+
+    g_r_left = g_r_matrix[peak_rows, peak_indices - 1]
+    g_r_peak = g_r_matrix[peak_rows, peak_indices]
+    g_r_right = g_r_matrix[peak_rows, peak_indices + 1]
+
+    # Vertex of the parabola through the three samples; flat tops keep their integer position.
+    curvature = g_r_left - 2 * g_r_peak + g_r_right
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = np.where(curvature < 0, 0.5 * (g_r_left - g_r_right) / curvature, 0.0)
+        shift = np.clip(shift, -0.5, 0.5)
+        height = g_r_peak - 0.25 * (g_r_left - g_r_right) * shift
+        # A Gaussian of height h and standard deviation s has a curvature of -h / s^2 at its maximum.
+        sigma = np.sqrt(-height / curvature)
+    sigma = np.where(np.isfinite(sigma) & (sigma > 0), sigma, np.nan)
+    refined_peaks = {
+        "position": peak_indices + shift,
+        "height": height,
+        "width": 2 * np.sqrt(2 * np.log(2)) * sigma,
+    }
+
+    if gaussian_fit and len(peak_indices) > 0:
+        fitted_peaks = fit_gaussian_peaks(
+            g_r_matrix, peak_rows, peak_indices, refined_peaks, fit_half_width
+        )
+        for name, values in fitted_peaks.items():
+            refined_peaks[name] = np.where(
+                np.isnan(values), refined_peaks[name], values
+            )
+
+    return refined_peaks
+
+
+def fit_gaussian_peaks(
+    g_r_matrix, peak_rows, peak_indices, initial_peaks, fit_half_width, iterations=20
+):
+    """
+    Fit a Gaussian (height * exp(-(x - position)^2 / (2 sigma^2))) to the samples around every peak at once.
+    Each Gauss-Newton step solves one 3 x 3 linear system per peak, batched with np.linalg.solve.
+    Args:
+        g_r_matrix: 2-D NumPy array of G(r) data, one curve per row.
+        peak_rows: NumPy array of the row of each peak.
+        peak_indices: NumPy array of the position (index) of each peak.
+        initial_peaks: Dictionary of initial "position", "height", and "width" arrays (see refine_peaks).
+        fit_half_width: Number of samples on either side of a peak used in the fit.
+        iterations: Number of Gauss-Newton steps.
+    Returns:
+        Dictionary of fitted "position", "height", and "width" arrays; NaN where a fit did not converge.
+    """
+    sample_indices = np.clip(
+        peak_indices[:, None] + np.arange(-fit_half_width, fit_half_width + 1),
+        0,
+        g_r_matrix.shape[1] - 1,
+    )
+    x = sample_indices.astype(float)
+    y = g_r_matrix[peak_rows[:, None], sample_indices]
+
+    height = initial_peaks["height"].copy()
+    position = initial_peaks["position"].copy()
+    sigma = initial_peaks["width"] / (2 * np.sqrt(2 * np.log(2)))
+    sigma = np.where(np.isnan(sigma), fit_half_width / 2, sigma)
+
+    with np.errstate(all="ignore"):
+        for _ in range(iterations):
+            distance = x - position[:, None]
+            gaussian = np.exp(-(distance**2) / (2 * sigma[:, None] ** 2))
+            residuals = y - height[:, None] * gaussian
+            jacobian = np.stack(
+                (
+                    gaussian,
+                    height[:, None] * gaussian * distance / sigma[:, None] ** 2,
+                    height[:, None] * gaussian * distance**2 / sigma[:, None] ** 3,
+                ),
+                axis=-1,
+            )
+            normal_matrix = np.einsum("nki,nkj->nij", jacobian, jacobian)
+            normal_matrix += 1e-12 * np.eye(3)
+            step = np.linalg.solve(
+                normal_matrix, np.einsum("nki,nk->ni", jacobian, residuals)[..., None]
+            )[..., 0]
+            height, position, sigma = (
+                height + step[:, 0],
+                position + step[:, 1],
+                np.abs(sigma + step[:, 2]),
+            )
+
+    # Reject fits that left the fitted samples or did not converge.
+    converged = (
+        np.isfinite(height)
+        & np.isfinite(position)
+        & np.isfinite(sigma)
+        & (np.abs(position - peak_indices) <= fit_half_width)
+        & (sigma > 0)
+    )
+    return {
+        "position": np.where(converged, position, np.nan),
+        "height": np.where(converged, height, np.nan),
+        "width": np.where(converged, 2 * np.sqrt(2 * np.log(2)) * sigma, np.nan),
+    }
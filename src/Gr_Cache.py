@@ -0,0 +1,119 @@
+"""
+Gr_Cache
+
+Author: Debra Keiser
+Date Modified: 17OCT2026
+
+Description:
+This script stores parsed .gr data in binary .npz sidecar files so that repeated analyses of an unchanged dataset skip text parsing.
+"""
+
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+CACHE_DIRECTORY_NAME = ".gr_cache"
+
+
+def load_gr_data(gr_file_path, parse_gr_file):
+    """
+    Return r and G(r) data for a .gr file, parsing the text only when no valid cached copy exists.
+    A cached copy is valid when the file path, modification time, and size match those recorded with it.
+    If only the modification time or size changed, the content hash decides whether the cached copy can be reused.
+    Args:
+        gr_file_path: Path to the .gr file to be read.
+        parse_gr_file: Function that parses a .gr file path into NumPy arrays of r and raw G(r) data.
+    Returns:
+        NumPy array of r data, NumPy array of raw G(r) data.
+    """
+    file_status = os.stat(gr_file_path)
+    cache_path = cache_file_path(gr_file_path)
+
+    content_hash = None
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached_data:
+            if (
+                int(cached_data["mtime_ns"]) == file_status.st_mtime_ns
+                and int(cached_data["size"]) == file_status.st_size
+            ):
+                return cached_data["r"], cached_data["g_r"]
+
+            content_hash = hash_file_content(gr_file_path)
+            if str(cached_data["content_hash"]) == content_hash:
+                r, g_r = cached_data["r"], cached_data["g_r"]
+                save_cache_file(cache_path, r, g_r, file_status, content_hash)
+                return r, g_r
+
+    if content_hash is None:
+        content_hash = hash_file_content(gr_file_path)
+    r, g_r = parse_gr_file(gr_file_path)
+    save_cache_file(cache_path, r, g_r, file_status, content_hash)
+
+    return r, g_r
+
+
+def cache_file_path(gr_file_path):
+    """
+    Determine where the cached copy of a .gr file is stored.
+    Cached copies are kept in a hidden directory next to the .gr files, one .npz file per .gr file.
+    Args:
+        gr_file_path: Path to the .gr file.
+    Returns:
+        Path to the corresponding .npz cache file.
+    """
+    file_directory, gr_file_name = os.path.split(os.path.abspath(gr_file_path))
+
+    return os.path.join(file_directory, CACHE_DIRECTORY_NAME, gr_file_name + ".npz")
+
+
+def hash_file_content(file_path):
+    """
+    Compute the SHA-256 digest of a file's content.
+    Args:
+        file_path: Path to the file to be hashed.
+    Returns:
+        Hexadecimal digest string.
+    """
+    with open(file_path, "rb") as open_file:
+        return hashlib.sha256(open_file.read()).hexdigest()
+
+
+def save_cache_file(cache_path, r, g_r, file_status, content_hash):
+    """
+    Write r and G(r) data and the key that validates them to a cache file.
+    The file is written under a temporary name and then renamed so that concurrent readers never see a partial file.
+    A cache directory that cannot be written to is ignored; the data are simply parsed again next time.
+    Args:
+        cache_path: Path to the .npz cache file.
+        r: NumPy array of r data.
+        g_r: NumPy array of raw G(r) data.
+        file_status: os.stat result of the .gr file when it was read.
+        content_hash: SHA-256 digest of the .gr file's content.
+    Returns:
+        None (saves an .npz file).
+    """
+    cache_directory = os.path.dirname(cache_path)
+    try:
+        os.makedirs(cache_directory, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=cache_directory, suffix=".npz"
+        )
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(file_descriptor, "wb") as temporary_file:
+            np.savez(
+                temporary_file,
+                r=r,
+                g_r=g_r,
+                mtime_ns=file_status.st_mtime_ns,
+                size=file_status.st_size,
+                content_hash=content_hash,
+            )
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        os.remove(temporary_path)
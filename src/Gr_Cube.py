@@ -0,0 +1,263 @@
+"""
+Gr_Cube
+
+Author: Debra Keiser
+Date Modified: 17OCT2026
+
+Description:
+This script stacks the G(r) data of every PDF recorded during an experiment into one (scans x r) matrix on a shared r-axis.
+The matrix, r-axis, and per-scan metadata are saved as .npy files that can be memory-mapped instead of re-reading .gr files.
+"""
+
+
+import os
+import re
+from typing import NamedTuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from src.Extract_Data import extract_pdf_data
+from src.Read_Log_File import parse_log_entries
+
+SCAN_METADATA_DTYPE = np.dtype(
+    [
+        ("key", "U16"),
+        ("kind", "U5"),
+        ("setpoint", np.int32),
+        ("interval", np.int32),
+        ("seconds", np.int64),
+        ("temperature", np.float64),
+        ("gr_file", "U64"),
+    ]
+)
+
+PDF_SCAN_PATTERN = re.compile(r"Synthetic_CSH_pdf_(?:ramp_\d+_(\d+)|(\d+)degC)")
+
+
+class GrCube(NamedTuple):
+    """
+    G(r) data of an experiment.
+    r: NumPy array of r values shared by every scan.
+    g_r: (scans x r) NumPy array (or memory map) of G(r) values, one row per scan.
+    scans: NumPy structured array of scan metadata (see SCAN_METADATA_DTYPE), one entry per row of g_r.
+    """
+
+    r: np.ndarray
+    g_r: np.ndarray
+    scans: np.ndarray
+
+
+def scan_metadata_from_log(file_directory, file_to_read):
+    """
+    Read a log file and describe every PDF scan it records, in chronological order.
+    Ramp scans are keyed by target temperature and interval (e.g., "100_00"), dwell scans by temperature (e.g., "30").
+    Args:
+        file_directory: Directory in which the file_to_read is stored.
+        file_to_read: Log file to be parsed/read.
+    Returns:
+        NumPy structured array of scan metadata (see SCAN_METADATA_DTYPE).
+    """
+    with open(os.path.join(file_directory, file_to_read)) as open_file:
+        log_entries = parse_log_entries(open_file.read())
+
+    scan_metadata = [scan_metadata_from_entry(log_entry) for log_entry in log_entries]
+
+    return np.array(
+        [metadata for metadata in scan_metadata if metadata is not None],
+        dtype=SCAN_METADATA_DTYPE,
+    )
+
+
+def scan_metadata_from_entry(log_entry):
+    """
+    Describe a PDF scan parsed from a log file and name the .gr file that holds its data.
+    Args:
+        log_entry: LogEntry (see Read_Log_File.parse_log_entries).
+    Returns:
+        Tuple of scan metadata ordered as SCAN_METADATA_DTYPE, or None if the scan name is not that of a ramp or dwell PDF scan.
+    """
+    pdf_scan = PDF_SCAN_PATTERN.fullmatch(log_entry.scan_name)
+    if pdf_scan is None:
+        return None
+
+    ramp_setpoint, dwell_setpoint = pdf_scan.groups()
+    if ramp_setpoint is not None:
+        interval = log_entry.index - 1
+        return (
+            f"{int(ramp_setpoint):n}_{interval:02d}",
+            "ramp",
+            int(ramp_setpoint),
+            interval,
+            log_entry.seconds,
+            log_entry.temperature,
+            f"Synthetic_CSH_CSH_pdf_ramp_{int(ramp_setpoint):n}_{interval:02d}_normalized.gr",
+        )
+
+    return (
+        f"{int(dwell_setpoint):n}",
+        "dwell",
+        int(dwell_setpoint),
+        log_entry.index - 1,
+        log_entry.seconds,
+        log_entry.temperature,
+        f"Synthetic_CSH_{dwell_setpoint}degC_normalized.gr",
+    )
+
+
+def build_gr_cube(file_directory, scan_metadata, cube_directory, dtype=np.float64):
+    """
+    Stack the G(r) data of the given scans into one matrix and save it with its r-axis and metadata.
+    Rows are written straight into a memory-mapped .npy file, so the full matrix is never held in memory.
+    Args:
+        file_directory: Name of or path to directory containing the .gr files.
+        scan_metadata: NumPy structured array of scan metadata (see scan_metadata_from_log).
+        cube_directory: Directory in which r.npy, g_r.npy, and scans.npy are saved.
+        dtype: Data type used to store G(r) values (e.g., np.float32 to halve the file size).
+    Returns:
+        GrCube whose G(r) matrix is memory-mapped from cube_directory.
+    """
+    os.makedirs(cube_directory, exist_ok=True)
+
+    r, g_r = extract_pdf_data(file_directory, scan_metadata["gr_file"][0])
+    g_r_matrix = open_memmap(
+        os.path.join(cube_directory, "g_r.npy"),
+        mode="w+",
+        dtype=dtype,
+        shape=(len(scan_metadata), len(r)),
+    )
+    g_r_matrix[0] = g_r
+    for row, gr_file in enumerate(scan_metadata["gr_file"][1:], start=1):
+        scan_r, g_r = extract_pdf_data(file_directory, gr_file)
+        if not np.array_equal(scan_r, r):
+            raise ValueError(f"{gr_file} does not share the r-axis of the first scan.")
+        g_r_matrix[row] = g_r
+    g_r_matrix.flush()
+    del g_r_matrix
+
+    np.save(os.path.join(cube_directory, "r.npy"), r)
+    np.save(os.path.join(cube_directory, "scans.npy"), scan_metadata)
+
+    return load_gr_cube(cube_directory)
+
+
+def load_gr_cube(cube_directory, mmap_mode="r"):
+    """
+    Load a G(r) matrix saved by build_gr_cube.
+    Args:
+        cube_directory: Directory containing r.npy, g_r.npy, and scans.npy.
+        mmap_mode: Memory-map mode passed to np.load (None reads the matrix into memory).
+    Returns:
+        GrCube.
+    """
+    return GrCube(
+        r=np.load(os.path.join(cube_directory, "r.npy")),
+        g_r=np.load(os.path.join(cube_directory, "g_r.npy"), mmap_mode=mmap_mode),
+        scans=np.load(os.path.join(cube_directory, "scans.npy")),
+    )
+
+
+def scan_index(scans, kind, key):
+    """
+    Find the row of the G(r) matrix that holds a given scan.
+    Args:
+        scans: NumPy structured array of scan metadata.
+        kind: "ramp" or "dwell".
+        key: Identifying key of the scan (e.g., "300_09" or "30").
+    Returns:
+        Row index of the scan.
+    """
+    matches = np.flatnonzero((scans["kind"] == kind) & (scans["key"] == key))
+    if len(matches) == 0:
+        raise KeyError(f"No {kind} scan with key {key}.")
+
+    return int(matches[0])
+
+
+def read_rows(g_r_matrix, rows):
+    """
+    Select rows of a G(r) matrix, as a view when the rows are consecutive.
+    A run of consecutive rows of a memory-mapped matrix is returned as a slice of the memory map, so no data are copied;
+    other selections are gathered into a new array.
+    Args:
+        g_r_matrix: 2-D NumPy array (or memory map) of G(r) data, one curve per row.
+        rows: Sequence of row indices.
+    Returns:
+        2-D NumPy array (or memory map) of the selected rows, in order.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) and np.all(np.diff(rows) == 1):
+        return g_r_matrix[rows[0] : rows[-1] + 1]
+
+    return g_r_matrix[rows]
+
+
+def decimate_min_max(g_r_rows, n_bins):
+    """
+    Reduce curves to the minimum and maximum G(r) of each of n_bins runs of consecutive points, kept in the order they occur.
+    With one bin per pixel column of a plot, the decimated curves draw the same envelope as the full curves.
+    Args:
+        g_r_rows: 2-D NumPy array (or memory-mapped rows) of G(r) data, one curve per row.
+        n_bins: Number of bins per curve (e.g., width of the plot in pixels).
+    Returns:
+        Tuple of NumPy arrays of the kept point indices (into the r-axis) and G(r) values, both of shape (curves x 2 * bins).
+        Curves with no more than 2 * n_bins points are returned whole.
+    """
+    g_r_rows = np.asarray(g_r_rows)
+    n_curves, n_points = g_r_rows.shape
+    if n_points <= 2 * n_bins:
+        return np.broadcast_to(np.arange(n_points), g_r_rows.shape), g_r_rows
+
+    bin_size = -(-n_points // n_bins)
+    n_bins = -(-n_points // bin_size)
+    # Padding repeats the last point, so argmin/argmax (first occurrence) never select a padded point.
+    binned_rows = np.pad(
+        g_r_rows, ((0, 0), (0, n_bins * bin_size - n_points)), mode="edge"
+    ).reshape(n_curves, n_bins, bin_size)
+    bin_starts = np.arange(n_bins) * bin_size
+    minimum_indices = binned_rows.argmin(axis=2) + bin_starts
+    maximum_indices = binned_rows.argmax(axis=2) + bin_starts
+    point_indices = np.stack(
+        (
+            np.minimum(minimum_indices, maximum_indices),
+            np.maximum(minimum_indices, maximum_indices),
+        ),
+        axis=2,
+    ).reshape(n_curves, 2 * n_bins)
+
+    return point_indices, np.take_along_axis(g_r_rows, point_indices, axis=1)
+
+
+def downsample_gr_cube(g_r_matrix, max_rows=1000, max_columns=1500, chunk_rows=256):
+    """
+    Average blocks of a G(r) matrix so that it has at most max_rows x max_columns values (e.g., to display it as an image).
+    The matrix is read a chunk of rows at a time, so a memory-mapped matrix of any number of scans is never loaded whole.
+    Args:
+        g_r_matrix: 2-D NumPy array (or memory map) of G(r) data, one curve per row.
+        max_rows: Maximum number of rows of the downsampled matrix.
+        max_columns: Maximum number of columns of the downsampled matrix.
+        chunk_rows: Approximate number of rows read at once (rounded to whole blocks).
+    Returns:
+        Tuple of the downsampled NumPy array and the number of rows and columns averaged into each of its values.
+        The last block of rows or columns may average fewer values.
+    """
+    n_rows, n_columns = g_r_matrix.shape
+    row_factor = max(-(-n_rows // max_rows), 1)
+    column_factor = max(-(-n_columns // max_columns), 1)
+    column_starts = np.arange(0, n_columns, column_factor)
+    column_counts = np.diff(np.append(column_starts, n_columns))
+    chunk_rows = max(chunk_rows // row_factor, 1) * row_factor
+
+    downsampled_chunks = []
+    for first_row in range(0, n_rows, chunk_rows):
+        g_r_chunk = np.asarray(g_r_matrix[first_row : first_row + chunk_rows])
+        row_starts = np.arange(0, len(g_r_chunk), row_factor)
+        row_counts = np.diff(np.append(row_starts, len(g_r_chunk)))
+        block_sums = np.add.reduceat(
+            np.add.reduceat(g_r_chunk, row_starts, axis=0), column_starts, axis=1
+        )
+        downsampled_chunks.append(
+            block_sums / row_counts[:, None] / column_counts[None, :]
+        )
+
+    return np.concatenate(downsampled_chunks), row_factor, column_factor
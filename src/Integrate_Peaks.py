@@ -9,14 +9,33 @@ This script integrates, standardizes, and calculates differences between PDF pea
 """
 
 
-import itertools
+import os
+from typing import NamedTuple
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+from matplotlib.figure import Figure
 from pandas.plotting import table
 
 from src.Extract_Data import extract_pdf_data
+from src.Gr_Cube import load_gr_cube, read_rows
+from src.Peak_Store import open_peaks
+
+# np.trapz was renamed np.trapezoid in NumPy 2.0 and later removed.
+trapezoid = getattr(np, "trapezoid", None) or np.trapz
+
+
+class IntegralMatrix(NamedTuple):
+    """
+    Peak integrals of every scan of an experiment.
+    scans: NumPy structured array of scan metadata (see Gr_Cube.SCAN_METADATA_DTYPE), one entry per row of integrals.
+    reference_peaks: NumPy array of the reference peak positions (indices), one per column of integrals.
+    integrals: (scans x reference peaks) NumPy array of peak integrals; NaN where a scan has no peak near a reference peak.
+    """
+
+    scans: np.ndarray
+    reference_peaks: np.ndarray
+    integrals: np.ndarray
 
 
 def peak_integration(npz_file_and_directory, save_path):
@@ -24,16 +43,13 @@ def peak_integration(npz_file_and_directory, save_path):
     Integrate peaks from a given dwell temperature greater than or equal to 100 degrees Celcius data using the trapezoidal rule.
     Post-process by scaling and differentiating peak integrals to determine changes in atomic coordination numbers.
     Args:
-        npz_file_and_directory = File path and name of the .npz file that contains a dictionary within which keys are temperatures and values are NumPy arrays that contain indices of peak positions.
+        npz_file_and_directory = File path and name of the peak store or .npz file (see Peak_Store.open_peaks) that contains a dictionary within which keys are temperatures and values are NumPy arrays that contain indices of peak positions.
         save_path = File path used to save the generated table.
     Returns:
         Input save path to facilitate addition of PNG to the final report.
     """
-    # Extract keys and values from the .npz file and store in a new dictionary.
-    dwell_peaks_dict = {}
-    with np.load(npz_file_and_directory) as open_npz_file:
-        for item in open_npz_file:
-            dwell_peaks_dict[item] = open_npz_file[item]
+    # Open the saved peaks; each array is only read when its dwell temperature is used.
+    dwell_peaks_dict = open_peaks(npz_file_and_directory)
 
     integrated_dwell_temperatures = []
     dwell_peak_integrals_dict = {}
@@ -46,11 +62,10 @@ def peak_integration(npz_file_and_directory, save_path):
                 f"Synthetic_CSH_{int(dwell_temperature):n}degC_normalized.gr",
             )
 
-            trapezoidal_integrals = [
-                integrate_peak_areas(pdf_dwell_data_g_r, peak)
-                for peak in dwell_peaks_dict[dwell_temperature]
-            ]
-            dwell_peak_integrals_dict[dwell_temperature] = trapezoidal_integrals
+            trapezoidal_integrals = integrate_peak_areas_batch(
+                pdf_dwell_data_g_r, dwell_peaks_dict[dwell_temperature]
+            )
+            dwell_peak_integrals_dict[dwell_temperature] = list(trapezoidal_integrals)
 
     # Standardize peak integrals.
     dwell_peak_integrals_dict = scale_peak_integrals(dwell_peak_integrals_dict)
@@ -72,6 +87,29 @@ def peak_integration(npz_file_and_directory, save_path):
     return save_path
 
 
+def campaign_peak_integration(
+    cube_directory, ramp_peaks_path, dwell_peaks_path, save_directory
+):
+    """
+    Integrate the peaks of every ramp and dwell scan of an experiment and save the resulting integral matrix.
+    G(r) data are read from a memory-mapped G(r) matrix (see Gr_Cube.build_gr_cube) rather than from .gr files.
+    Args:
+        cube_directory = Directory of the G(r) matrix of the experiment.
+        ramp_peaks_path = Peak store or .npz file of ramp peaks (see Peak_Store.open_peaks).
+        dwell_peaks_path = Peak store or .npz file of dwell peaks.
+        save_directory = Directory in which the integral matrix is saved (see save_integral_matrix).
+    Returns:
+        IntegralMatrix.
+    """
+    integral_matrix = campaign_integral_matrix(
+        load_gr_cube(cube_directory),
+        {"ramp": open_peaks(ramp_peaks_path), "dwell": open_peaks(dwell_peaks_path)},
+    )
+    save_integral_matrix(integral_matrix, save_directory)
+
+    return integral_matrix
+
+
 def integrate_peak_areas(g_r_data, peak_position_index):
     """
     Determine the points which define a given peak and integrate it using the trapezoid method.
@@ -101,7 +139,78 @@ def integrate_peak_areas(g_r_data, peak_position_index):
     ]
 
     # Take the absolute value to integrate only positive intensities.
-    return np.trapz(abs(trapezoid_g_r_data))
+    return trapezoid(abs(trapezoid_g_r_data))
+
+
+def peak_minimum_bounds(g_r_data, peak_position_indices):
+    """
+    Determine the points which define every given peak, as integrate_peak_areas does, without walking from each peak.
+    All points at which a walk away from a peak would stop are found once, and each peak is assigned the nearest one on either side with searchsorted.
+    Peaks next to either end of the data are bounded by the first or last point instead of running off the array.
+    Args:
+        g_r_data = NumPy array of PDF G_r (y-axis) values.
+        peak_position_indices = NumPy array of indices of the positions of the peaks.
+    Returns:
+        NumPy arrays of lower- and upper-bound indices (the minimums on either side of each peak).
+    """
+    g_r_data = np.asarray(g_r_data)
+    peak_position_indices = np.asarray(peak_position_indices, dtype=np.int64)
+
+    # A walk towards smaller r stops at index j if g_r[j - 1] >= g_r[j]; towards greater r, if g_r[j + 1] >= g_r[j].
+    lower_stops = np.flatnonzero(
+        np.concatenate(([True], g_r_data[:-1] >= g_r_data[1:]))
+    )
+    upper_stops = np.flatnonzero(
+        np.concatenate((g_r_data[1:] >= g_r_data[:-1], [True]))
+    )
+
+    lower_bounds = lower_stops[
+        np.searchsorted(lower_stops, peak_position_indices, side="right") - 1
+    ]
+    upper_bounds = upper_stops[np.searchsorted(upper_stops, peak_position_indices)]
+
+    return lower_bounds, upper_bounds
+
+
+def integrate_peak_areas_batch(g_r_data, peak_position_indices):
+    """
+    Integrate every given peak of one PDF at once with the trapezoid method.
+    Peaks are bounded as in integrate_peak_areas (see peak_minimum_bounds) and integrated from a cumulative trapezoid sum of the curve,
+    so each area is a difference of two sums instead of a separate np.trapz call.
+    Args:
+        g_r_data = NumPy array of PDF G_r (y-axis) values.
+        peak_position_indices = NumPy array of indices of the positions of the peaks.
+    Returns:
+        NumPy array of definite integrals of the specified peaks.
+    """
+    g_r_data = np.asarray(g_r_data)
+    lower_bounds, upper_bounds = peak_minimum_bounds(g_r_data, peak_position_indices)
+
+    cumulative_trapezoids = cumulative_trapezoid_sums(g_r_data)
+
+    # As in integrate_peak_areas, the upper-bound minimum itself is not included.
+    last_points = np.maximum(upper_bounds - 1, lower_bounds)
+    return cumulative_trapezoids[last_points] - cumulative_trapezoids[lower_bounds]
+
+
+def cumulative_trapezoid_sums(g_r_data):
+    """
+    Cumulative sums of the trapezoids under |G(r)|; the integral from point i to point j is sums[j] - sums[i].
+    Sums are accumulated in double precision whatever the data type of G(r), using two work arrays instead of one per operation.
+    Args:
+        g_r_data = NumPy array (or memory-mapped slice) of PDF G_r values.
+    Returns:
+        NumPy array of len(g_r_data) cumulative sums, starting at 0.
+    """
+    # Take the absolute value to integrate only positive intensities.
+    abs_g_r_data = np.abs(g_r_data, dtype=np.float64)
+    cumulative_trapezoids = np.empty(len(abs_g_r_data))
+    cumulative_trapezoids[:1] = 0.0
+    np.add(abs_g_r_data[1:], abs_g_r_data[:-1], out=cumulative_trapezoids[1:])
+    cumulative_trapezoids[1:] /= 2
+    np.cumsum(cumulative_trapezoids, out=cumulative_trapezoids)
+
+    return cumulative_trapezoids
 
 
 def scale_peak_integrals(peak_integrals_dict):
@@ -195,26 +304,65 @@ def subtract_integrals(
     Returns:
         List of absolute values of differences between reference peak integrals and peak integrals of the current/specified dwell temperature.
     """
-    integral_differences_list = []
-    for ref_position, shifted_position in itertools.product(
+    reference_matches, shifted_matches = match_peaks(
         reference_peak_positions, peaks_dict[dwell_temperature]
-    ):
-        if shifted_position in range(ref_position - 15, ref_position + 16):
-            integral_differences_list.append(
-                round(
-                    abs(
-                        (peak_integrals_dict[dwell_temperature])[
-                            np.where(peaks_dict[dwell_temperature] == shifted_position)
-                        ]
-                        - reference_peak_integrals_dict[ref_position]
-                    )[0],
-                    1,
-                )
-            )
+    )
+    reference_integrals = np.array(
+        [
+            reference_peak_integrals_dict[position]
+            for position in reference_peak_positions
+        ]
+    )
+    shifted_integrals = np.asarray(peak_integrals_dict[dwell_temperature])
+    integral_differences_list = list(
+        np.round(
+            np.abs(
+                shifted_integrals[shifted_matches]
+                - reference_integrals[reference_matches]
+            ),
+            1,
+        )
+    )
 
     return integral_differences_list
 
 
+def match_peaks(reference_peak_positions, peak_positions, window=15):
+    """
+    Pair every reference peak with each peak that lies within a window around it.
+    Both lists of positions are sorted, so the peaks near a reference peak are found with two binary searches (searchsorted)
+    instead of comparing every pair.
+    Args:
+        reference_peak_positions = Sorted list or NumPy array of reference peak positions (indices).
+        peak_positions = Sorted NumPy array of peak positions (indices) to match.
+        window = Maximum shift (in indices) of a peak from its reference position.
+    Returns:
+        NumPy arrays of indices into reference_peak_positions and into peak_positions, one entry per matched pair.
+        Pairs are ordered by reference peak, then by peak (the order of itertools.product).
+    """
+    reference_peak_positions = np.asarray(reference_peak_positions)
+    peak_positions = np.asarray(peak_positions)
+
+    first_matches = np.searchsorted(peak_positions, reference_peak_positions - window)
+    last_matches = np.searchsorted(
+        peak_positions, reference_peak_positions + window, side="right"
+    )
+    match_counts = np.maximum(last_matches - first_matches, 0)
+
+    reference_matches = np.repeat(
+        np.arange(len(reference_peak_positions)), match_counts
+    )
+    # Number each pair within its reference peak and count on from the first match.
+    pair_starts = np.cumsum(match_counts) - match_counts
+    peak_matches = (
+        np.arange(match_counts.sum())
+        - np.repeat(pair_starts, match_counts)
+        + np.repeat(first_matches, match_counts)
+    )
+
+    return reference_matches, peak_matches
+
+
 def create_table(
     reference_peak_positions,
     peak_integrals_dict,
@@ -249,13 +397,201 @@ def create_table(
     df = pd.DataFrame.from_records(dwell_peak_integral_differences_matrix)
     df.index = df_row_names
     df.columns = df_column_names
-    ax = plt.subplot(111, frame_on=False)
+    fig = Figure()
+    ax = fig.add_subplot(111, frame_on=False)
     ax.axis("off")
     ax.set_title("Relative Changes to Atomic Coordination Numbers with Temperature")
     table(ax, df, loc="upper center")
-    plt.tight_layout()
-    plt.savefig(
+    fig.tight_layout()
+    fig.savefig(
         save_path,
         bbox_inches="tight",
     )
-    plt.close()
+
+
+def integrate_peak_areas_matrix(g_r_matrix, peak_indices, offsets):
+    """
+    Integrate the peaks of many PDFs at once, bounding each peak as integrate_peak_areas does.
+    The curves are joined end to end and treated as one curve whose walks always stop at the first and last point of each PDF.
+    Args:
+        g_r_matrix = 2-D NumPy array of PDF G_r values, one curve per row.
+        peak_indices = NumPy array of the peak positions (indices) of all curves concatenated.
+        offsets = NumPy array of offsets; the peaks of curve i are peak_indices[offsets[i]:offsets[i + 1]].
+    Returns:
+        NumPy array of definite integrals, in the order of peak_indices.
+    """
+    g_r_matrix = np.asarray(g_r_matrix)
+    n_curves, n_points = g_r_matrix.shape
+    g_r_data = g_r_matrix.ravel()
+    curve_starts = np.arange(n_curves) * n_points
+
+    lower_stop_mask = np.empty(len(g_r_data), dtype=bool)
+    lower_stop_mask[1:] = g_r_data[:-1] >= g_r_data[1:]
+    lower_stop_mask[curve_starts] = True
+    upper_stop_mask = np.empty(len(g_r_data), dtype=bool)
+    upper_stop_mask[:-1] = g_r_data[1:] >= g_r_data[:-1]
+    upper_stop_mask[curve_starts + n_points - 1] = True
+    lower_stops = np.flatnonzero(lower_stop_mask)
+    upper_stops = np.flatnonzero(upper_stop_mask)
+
+    flat_peak_indices = np.repeat(curve_starts, np.diff(offsets)) + peak_indices
+    lower_bounds = lower_stops[
+        np.searchsorted(lower_stops, flat_peak_indices, side="right") - 1
+    ]
+    upper_bounds = upper_stops[np.searchsorted(upper_stops, flat_peak_indices)]
+
+    # Trapezoids that join two curves are never inside a peak, since the bounds of a peak stay within its curve.
+    cumulative_trapezoids = cumulative_trapezoid_sums(g_r_data)
+    last_points = np.maximum(upper_bounds - 1, lower_bounds)
+
+    return cumulative_trapezoids[last_points] - cumulative_trapezoids[lower_bounds]
+
+
+def nearest_peak_columns(reference_peaks, peak_indices, offsets, window=15):
+    """
+    For every curve, find the peak nearest to each reference peak, within the window used by subtract_integrals.
+    Args:
+        reference_peaks = Sorted NumPy array of reference peak positions (indices).
+        peak_indices = NumPy array of the sorted peak positions of all curves concatenated.
+        offsets = NumPy array of offsets; the peaks of curve i are peak_indices[offsets[i]:offsets[i + 1]].
+        window = Maximum shift (in indices) of a peak from its reference position.
+    Returns:
+        (curves x reference peaks) NumPy array of positions in peak_indices; -1 where no peak lies within the window.
+    """
+    reference_peaks = np.asarray(reference_peaks, dtype=np.int64)
+    n_curves = len(offsets) - 1
+    if len(peak_indices) == 0 or len(reference_peaks) == 0:
+        return np.full((n_curves, len(reference_peaks)), -1)
+
+    # Shift each curve by a multiple of a span wider than any curve so that one sorted search covers all curves.
+    span = max(int(np.max(peak_indices)), int(reference_peaks[-1])) + 2 * window + 1
+    curve_shifts = np.arange(n_curves, dtype=np.int64) * span
+    shifted_peaks = np.repeat(curve_shifts, np.diff(offsets)) + peak_indices
+    shifted_references = curve_shifts[:, None] + reference_peaks[None, :]
+
+    right = np.searchsorted(shifted_peaks, shifted_references)
+    left = np.maximum(right - 1, 0)
+    right = np.minimum(right, len(shifted_peaks) - 1)
+    right_distance = np.abs(shifted_peaks[right] - shifted_references)
+    left_distance = np.abs(shifted_peaks[left] - shifted_references)
+    nearest = np.where(left_distance <= right_distance, left, right)
+
+    return np.where(np.minimum(left_distance, right_distance) <= window, nearest, -1)
+
+
+def campaign_integral_matrix(
+    cube, peak_stores, reference_key="100", window=15, chunk_rows=256
+):
+    """
+    Integrate the peaks of every ramp and dwell scan of an experiment in one pass over its G(r) matrix.
+    Reference peaks are the peaks under 5 Angstroms of a reference dwell scan, as in peak_integral_differences.
+    Each scan contributes the integral of its peak nearest to every reference peak (within the window used by subtract_integrals).
+    Args:
+        cube = GrCube (see Gr_Cube.load_gr_cube) of the experiment; its memory-mapped G(r) matrix is read in chunks.
+        peak_stores = Dictionary within which keys are "ramp" and "dwell" and values are saved peaks (see Peak_Store.open_peaks).
+        reference_key = Key of the reference dwell scan.
+        window = Maximum shift (in indices) of a peak from its reference position.
+        chunk_rows = Number of scans integrated at once.
+    Returns:
+        IntegralMatrix of the scans that have saved peaks, in chronological order.
+    """
+    scan_rows = np.array(
+        [
+            row
+            for row, scan in enumerate(cube.scans)
+            if scan["key"] in peak_stores[scan["kind"]]
+        ],
+        dtype=np.int64,
+    )
+    reference_peaks = np.asarray(peak_stores["dwell"][reference_key])
+    reference_peaks = reference_peaks[reference_peaks < 500].astype(np.int64)
+
+    integrals = np.full((len(scan_rows), len(reference_peaks)), np.nan)
+    for first_row in range(0, len(scan_rows), chunk_rows):
+        chunk_scans = cube.scans[scan_rows[first_row : first_row + chunk_rows]]
+        chunk_peaks = [
+            np.asarray(peak_stores[scan["kind"]][scan["key"]]) for scan in chunk_scans
+        ]
+        offsets = np.concatenate(
+            ([0], np.cumsum([len(peaks) for peaks in chunk_peaks]))
+        )
+        peak_indices = np.concatenate([np.zeros(0, dtype=np.int64), *chunk_peaks])
+
+        # Consecutive scans are integrated straight from the memory map, without copying them.
+        peak_integrals = integrate_peak_areas_matrix(
+            read_rows(cube.g_r, scan_rows[first_row : first_row + chunk_rows]),
+            peak_indices,
+            offsets,
+        )
+        nearest = nearest_peak_columns(reference_peaks, peak_indices, offsets, window)
+        # Scans without a peak near a reference peak (or without any peaks) keep NaN.
+        row_integrals = np.full(nearest.shape, np.nan)
+        found = nearest >= 0
+        row_integrals[found] = peak_integrals[nearest[found]]
+        integrals[first_row : first_row + len(chunk_scans)] = row_integrals
+
+    return IntegralMatrix(
+        scans=cube.scans[scan_rows],
+        reference_peaks=reference_peaks,
+        integrals=integrals,
+    )
+
+
+def scale_integral_matrix(integral_matrix, reference_row):
+    """
+    Scale every row of peak integrals relative to a reference row, as scale_peak_integrals does for dwell temperatures.
+    The scale factor is calculated with respect to the first reference peak (the Si-O peak, ~1.63 Angstroms).
+    Args:
+        integral_matrix = (scans x reference peaks) NumPy array of peak integrals.
+        reference_row = Row of the reference scan.
+    Returns:
+        NumPy array of scaled peak integrals.
+    """
+    Si_O_scale_factors = integral_matrix[reference_row, 0] / integral_matrix[:, 0]
+
+    return integral_matrix * Si_O_scale_factors[:, None]
+
+
+def integral_difference_matrix(scaled_integral_matrix, reference_row):
+    """
+    Determine peak integral differences relative to the reference integrals, as subtract_integrals does for dwell temperatures.
+    Args:
+        scaled_integral_matrix = (scans x reference peaks) NumPy array of scaled peak integrals.
+        reference_row = Row of the reference scan.
+    Returns:
+        NumPy array of absolute differences rounded to one decimal place (NaN where a peak is missing).
+    """
+    return np.round(
+        np.abs(scaled_integral_matrix - scaled_integral_matrix[reference_row]), 1
+    )
+
+
+def save_integral_matrix(integral_matrix, save_directory):
+    """
+    Save an IntegralMatrix as .npy files.
+    Args:
+        integral_matrix = IntegralMatrix (see campaign_integral_matrix).
+        save_directory = Directory in which scans.npy, reference_peaks.npy, and integrals.npy are saved.
+    Returns:
+        None.
+    """
+    os.makedirs(save_directory, exist_ok=True)
+    for name, array in integral_matrix._asdict().items():
+        np.save(os.path.join(save_directory, f"{name}.npy"), array)
+
+
+def load_integral_matrix(save_directory, mmap_mode=None):
+    """
+    Load an IntegralMatrix saved by save_integral_matrix.
+    Args:
+        save_directory = Directory containing scans.npy, reference_peaks.npy, and integrals.npy.
+        mmap_mode = Memory-map mode passed to np.load.
+    Returns:
+        IntegralMatrix.
+    """
+    return IntegralMatrix(
+        *(
+            np.load(os.path.join(save_directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in IntegralMatrix._fields
+        )
+    )
@@ -0,0 +1,296 @@
+"""
+Live_Monitor
+
+Author: Debra Keiser
+Date Modified: 17OCT2026
+
+Description:
+This script follows log.txt during a live experiment and analyzes each new PDF scan as soon as its .gr file appears.
+Peak dictionaries and the tracked peak matrix are updated one scan at a time instead of being rebuilt for the whole run.
+A scan whose .gr file is not written (or cannot be read) within max_wait_seconds is skipped with a warning, and the state of the
+monitor can be saved to a checkpoint so that a restarted monitor resumes where it stopped.
+"""
+
+
+import os
+import tempfile
+import time
+import warnings
+from collections import deque
+
+import numpy as np
+
+from src.Extract_Data import extract_pdf_data, locate_peaks
+from src.Gr_Cube import SCAN_METADATA_DTYPE, scan_metadata_from_entry
+from src.Peak_Store import save_peak_store
+from src.Peak_Tracking import PeakTracker
+from src.Read_Log_File import IncrementalLogParser
+
+
+class LiveMonitor:
+    """
+    Incremental analysis of a running experiment.
+    Each call to poll() parses only the lines appended to the log file since the previous call (see Read_Log_File.IncrementalLogParser).
+    Scans are analyzed in the order they are logged; a scan waits until its .gr file exists, has stopped changing, and can be read,
+    and is skipped if that takes longer than max_wait_seconds.
+    """
+
+    def __init__(
+        self,
+        log_file_path,
+        gr_file_directory,
+        threshold_distance=20,
+        settle_seconds=1.0,
+        max_wait_seconds=600.0,
+        checkpoint_path=None,
+    ):
+        """
+        Args:
+            log_file_path: Path to the log file written during the experiment.
+            gr_file_directory: Directory in which .gr files are written.
+            threshold_distance: the maximum displacement (in 10^2 Angstroms) for peaks from 2 different scans to be considered the same peak.
+            settle_seconds: Minimum age (in seconds) of a .gr file before it is read, so that files still being written are skipped.
+            max_wait_seconds: Time (in seconds) after which a logged scan whose .gr file is missing or unreadable is skipped,
+            so that it does not hold back the scans logged after it; None waits indefinitely.
+            checkpoint_path: Path to the .npz file in which the state of the monitor is saved after every poll that changes it,
+            and from which it is resumed; None keeps the state in memory only.
+        """
+        self.log_file_path = log_file_path
+        self.gr_file_directory = gr_file_directory
+        self.threshold_distance = threshold_distance
+        self.settle_seconds = settle_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.checkpoint_path = checkpoint_path
+
+        self.log_parser = IncrementalLogParser(log_file_path)
+        # Scan metadata (see Gr_Cube.SCAN_METADATA_DTYPE) of each logged scan not analyzed yet, with the time it was first seen.
+        self.pending_scans = deque()
+        self.r = None
+
+        self.pdf_ramp_peaks_dict = {}
+        self.pdf_dwell_peaks_dict = {}
+        self.tracked_scans = []
+        self.skipped_scans = []
+        self.peak_tracker = PeakTracker(threshold_distance)
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self.load_checkpoint()
+
+    def poll(self):
+        """
+        Read new log lines and analyze every logged scan whose .gr file is ready.
+        Returns:
+            List of (kind, key) of the scans analyzed during this call.
+        """
+        new_entries = []
+        if os.path.exists(self.log_file_path):
+            new_entries = self.log_parser.update()
+            for log_entry in new_entries:
+                scan_metadata = scan_metadata_from_entry(log_entry)
+                if scan_metadata is not None:
+                    self.pending_scans.append((scan_metadata, time.time()))
+
+        analyzed_scans = []
+        skipped_scans = 0
+        while self.pending_scans:
+            scan_metadata, first_seen = self.pending_scans[0]
+            key, kind, *_, gr_file = scan_metadata
+            peak_positions, problem = self.scan_peaks(gr_file)
+            if peak_positions is not None:
+                # The scan leaves the queue only once it has been analyzed.
+                self.add_scan(kind, key, peak_positions)
+                self.pending_scans.popleft()
+                analyzed_scans.append((kind, key))
+                continue
+
+            if (
+                self.max_wait_seconds is None
+                or time.time() - first_seen < self.max_wait_seconds
+            ):
+                break
+            warnings.warn(
+                f"Skipped {kind} scan {key} after waiting {self.max_wait_seconds} s: {problem}.",
+                stacklevel=2,
+            )
+            self.pending_scans.popleft()
+            self.skipped_scans.append((kind, key))
+            skipped_scans += 1
+
+        if self.checkpoint_path is not None and (
+            new_entries or analyzed_scans or skipped_scans
+        ):
+            self.save_checkpoint()
+
+        return analyzed_scans
+
+    def scan_peaks(self, gr_file):
+        """
+        Locate the peaks of a scan if its .gr file is ready and holds a complete PDF.
+        Args:
+            gr_file: Name of the .gr file.
+        Returns:
+            NumPy array of peak positions (indices), or None; description of why the file cannot be analyzed yet, or None.
+        """
+        if not self.gr_file_is_ready(gr_file):
+            return None, f"{gr_file} was not written"
+        try:
+            r, g_r = extract_pdf_data(self.gr_file_directory, gr_file)
+        except (OSError, ValueError) as error:
+            return None, f"{gr_file} could not be read ({error})"
+        # A .gr file cut short still parses, but does not cover the r-axis of the scans before it.
+        if self.r is not None and not np.array_equal(r, self.r):
+            return None, f"{gr_file} does not share the r-axis of the previous scans"
+        self.r = r
+
+        return locate_peaks(g_r), None
+
+    def watch(self, poll_interval=5.0, on_scan=None, stop_after=None):
+        """
+        Poll the log file repeatedly.
+        Args:
+            poll_interval: Seconds to wait between polls.
+            on_scan: Function called with (kind, key) after each scan is analyzed.
+            stop_after: Number of polls after which to stop; None watches until interrupted.
+        Returns:
+            None.
+        """
+        polls = 0
+        while stop_after is None or polls < stop_after:
+            for kind, key in self.poll():
+                if on_scan is not None:
+                    on_scan(kind, key)
+            polls += 1
+            time.sleep(poll_interval)
+
+    def gr_file_is_ready(self, gr_file):
+        """
+        Check whether a .gr file exists and has not been modified for settle_seconds.
+        Args:
+            gr_file: Name of the .gr file.
+        Returns:
+            True if the file can be read.
+        """
+        gr_file_path = os.path.join(self.gr_file_directory, gr_file)
+        if not os.path.exists(gr_file_path):
+            return False
+
+        return time.time() - os.path.getmtime(gr_file_path) >= self.settle_seconds
+
+    def add_scan(self, kind, key, peak_positions):
+        """
+        Store the peaks of one scan and add them to the tracked peaks (see Peak_Tracking.PeakTracker).
+        Args:
+            kind: "ramp" or "dwell".
+            key: Identifying key of the scan.
+            peak_positions: NumPy array of peak positions (indices).
+        Returns:
+            None.
+        """
+        if kind == "ramp":
+            self.pdf_ramp_peaks_dict[key] = peak_positions
+        else:
+            self.pdf_dwell_peaks_dict[key] = peak_positions
+
+        self.tracked_scans.append((kind, key))
+        self.peak_tracker.add_experiment(peak_positions)
+
+    @property
+    def tracked_matrix(self):
+        """
+        Tracked peak matrix (scans x peaks) of peak positions (indices) for every scan analyzed so far.
+        """
+        return self.peak_tracker.tracked_matrix()
+
+    def save_peaks(self, file_directory):
+        """
+        Save the peak dictionaries as the same peak stores written by Create_Report.preliminary_analysis.
+        Args:
+            file_directory: Directory in which the pdf_ramp_peaks and pdf_dwell_peaks stores are saved.
+        Returns:
+            None.
+        """
+        save_peak_store(
+            os.path.join(file_directory, "pdf_ramp_peaks"), self.pdf_ramp_peaks_dict
+        )
+        save_peak_store(
+            os.path.join(file_directory, "pdf_dwell_peaks"), self.pdf_dwell_peaks_dict
+        )
+
+    def save_checkpoint(self):
+        """
+        Save the log parser state, the peaks of every analyzed scan, and the scans still pending or skipped to checkpoint_path.
+        The checkpoint is written under a temporary name and then renamed, so an interrupted save leaves the old checkpoint intact.
+        """
+        peaks = [
+            np.asarray(
+                (
+                    self.pdf_ramp_peaks_dict
+                    if kind == "ramp"
+                    else self.pdf_dwell_peaks_dict
+                )[key],
+                dtype=np.int64,
+            )
+            for kind, key in self.tracked_scans
+        ]
+        monitor_arrays = {
+            "tracked_scans": np.array(self.tracked_scans, dtype=str).reshape(-1, 2),
+            "skipped_scans": np.array(self.skipped_scans, dtype=str).reshape(-1, 2),
+            "peak_offsets": np.concatenate(
+                (
+                    [0],
+                    np.cumsum(
+                        [len(scan_peaks) for scan_peaks in peaks], dtype=np.int64
+                    ),
+                )
+            ),
+            "peak_positions": np.concatenate([np.zeros(0, dtype=np.int64), *peaks]),
+            "pending_scans": np.array(
+                [scan_metadata for scan_metadata, _ in self.pending_scans],
+                dtype=SCAN_METADATA_DTYPE,
+            ),
+            "r": np.zeros(0) if self.r is None else self.r,
+        }
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.checkpoint_path)), suffix=".npz"
+        )
+        with os.fdopen(file_descriptor, "wb") as temporary_file:
+            np.savez(
+                temporary_file, **self.log_parser.checkpoint_arrays(), **monitor_arrays
+            )
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def load_checkpoint(self):
+        """
+        Resume from the state saved by save_checkpoint.
+        Peaks of the analyzed scans are tracked again from their saved positions, so no .gr file is read.
+        Pending scans wait another max_wait_seconds from the time the checkpoint is loaded.
+        """
+        with np.load(self.checkpoint_path) as checkpoint:
+            self.log_parser.restore_checkpoint_arrays(checkpoint)
+            offsets = checkpoint["peak_offsets"]
+            peak_positions = checkpoint["peak_positions"]
+            for scan, (kind, key) in enumerate(checkpoint["tracked_scans"].tolist()):
+                self.add_scan(
+                    kind, key, peak_positions[offsets[scan] : offsets[scan + 1]]
+                )
+            self.skipped_scans = [
+                tuple(scan) for scan in checkpoint["skipped_scans"].tolist()
+            ]
+            loaded = time.time()
+            self.pending_scans = deque(
+                (scan_metadata, loaded)
+                for scan_metadata in checkpoint["pending_scans"].tolist()
+            )
+            self.r = checkpoint["r"] if len(checkpoint["r"]) else None
+
+
+if __name__ == "__main__":
+    monitor = LiveMonitor(
+        "../data/log.txt",
+        "../data/gr_files",
+        checkpoint_path="../data/live_monitor_checkpoint.npz",
+    )
+    monitor.watch(
+        on_scan=lambda kind, key: print(
+            f"{kind} {key}: {monitor.tracked_matrix.shape[1]} tracked peaks"
+        )
+    )
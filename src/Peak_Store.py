@@ -0,0 +1,276 @@
+"""
+Peak_Store
+
+Author: Debra Keiser
+Date Modified: 17OCT2026
+
+Description:
+This script saves the peaks of many PDF scans as a few flat .npy files instead of one .npz member per scan.
+Peak indices of all scans are concatenated into one array and located by an offsets array (scan i owns peak_indices[offsets[i]:offsets[i + 1]]).
+Optional per-peak columns (e.g., refined position, height, width, area) are stored alongside in the same order.
+Every file can be memory-mapped, so opening a store reads no peaks until a scan is accessed.
+"""
+
+
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+
+import numpy as np
+
+from src.Extract_Data import refine_peaks
+from src.Gr_Cube import read_rows
+
+PEAK_COLUMNS = ("position", "height", "width", "area")
+
+
+def save_peak_store(store_directory, peaks_dict, peak_columns=None):
+    """
+    Save a dictionary of peak positions (and optional per-peak values) as a peak store.
+    Args:
+        store_directory: Directory in which the .npy files of the store are saved.
+        peaks_dict: Dictionary within which keys identify scans and values are NumPy arrays of peak positions (indices).
+        peak_columns: Dictionary within which keys are column names (e.g., "height") and values are dictionaries keyed like peaks_dict
+        whose values hold one number per peak.
+    Returns:
+        PeakStore memory-mapped from store_directory.
+    """
+    keys = list(peaks_dict)
+    peak_counts = [len(peaks_dict[key]) for key in keys]
+    offsets = np.concatenate(([0], np.cumsum(peak_counts, dtype=np.int64)))
+    peak_indices = np.concatenate(
+        [np.zeros(0, dtype=np.int32)]
+        + [np.asarray(peaks_dict[key], dtype=np.int32) for key in keys]
+    )
+
+    column_arrays = {}
+    for name, column_dict in (peak_columns or {}).items():
+        column_arrays[name] = np.concatenate(
+            [np.zeros(0)] + [np.asarray(column_dict[key], dtype=float) for key in keys]
+        )
+
+    return write_peak_store(store_directory, keys, peak_indices, offsets, column_arrays)
+
+
+def save_refined_peak_store(
+    store_directory, peaks_dict, g_r_matrix, rows, gaussian_fit=False, chunk_rows=256
+):
+    """
+    Save a dictionary of peak positions as a peak store with refined "position", "height", and "width" columns (see Extract_Data.refine_peaks).
+    Args:
+        store_directory: Directory in which the .npy files of the store are saved.
+        peaks_dict: Dictionary within which keys identify scans and values are NumPy arrays of peak positions (indices).
+        g_r_matrix: 2-D NumPy array (or memory map, e.g., Gr_Cube.GrCube.g_r) of G(r) data, one curve per row.
+        rows: Row of g_r_matrix holding the G(r) data of each key of peaks_dict, in the same order.
+        gaussian_fit: Whether to refine peaks with a Gaussian fit instead of parabolic interpolation only.
+        chunk_rows: Number of curves refined at once.
+    Returns:
+        PeakStore memory-mapped from store_directory.
+    """
+    keys = list(peaks_dict)
+    peak_counts = [len(peaks_dict[key]) for key in keys]
+    offsets = np.concatenate(([0], np.cumsum(peak_counts, dtype=np.int64)))
+    peak_indices = np.concatenate(
+        [np.zeros(0, dtype=np.int32)]
+        + [np.asarray(peaks_dict[key], dtype=np.int32) for key in keys]
+    )
+
+    refined_chunks = []
+    for first_key in range(0, len(keys), chunk_rows):
+        last_key = min(first_key + chunk_rows, len(keys))
+        refined_chunks.append(
+            refine_peaks(
+                read_rows(g_r_matrix, rows[first_key:last_key]),
+                peak_indices[offsets[first_key] : offsets[last_key]],
+                offsets[first_key : last_key + 1] - offsets[first_key],
+                gaussian_fit=gaussian_fit,
+            )
+        )
+    peak_columns = {
+        name: np.concatenate(
+            [np.zeros(0)] + [refined_peaks[name] for refined_peaks in refined_chunks]
+        )
+        for name in ("position", "height", "width")
+    }
+
+    return write_peak_store(store_directory, keys, peak_indices, offsets, peak_columns)
+
+
+def write_peak_store(store_directory, keys, peak_indices, offsets, peak_columns=None):
+    """
+    Save peaks that are already concatenated (e.g., the output of Extract_Data.locate_peaks_batch) as a peak store.
+    The store is written to a temporary directory that then replaces store_directory, so that partly written files are never visible
+    and column files of a previous store are not left behind (while an existing store is replaced, store_directory briefly does not exist).
+    Args:
+        store_directory: Directory in which the .npy files of the store are saved.
+        keys: Sequence of keys identifying each scan.
+        peak_indices: NumPy array of the peak positions (indices) of all scans concatenated.
+        offsets: NumPy array of len(keys) + 1 offsets into peak_indices.
+        peak_columns: Dictionary within which keys are column names and values are NumPy arrays with one number per peak.
+    Returns:
+        PeakStore memory-mapped from store_directory.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if len(offsets) != len(keys) + 1 or offsets[-1] != len(peak_indices):
+        raise ValueError("offsets do not match the keys and peak indices.")
+
+    for name, column in (peak_columns or {}).items():
+        if len(column) != len(peak_indices):
+            raise ValueError(f"Column {name} does not have one value per peak.")
+
+    store_directory = os.path.normpath(store_directory)
+    parent_directory, store_name = os.path.split(store_directory)
+    os.makedirs(parent_directory or ".", exist_ok=True)
+    temporary_directory = tempfile.mkdtemp(
+        prefix=f".{store_name}.", dir=parent_directory or "."
+    )
+    # mkdtemp creates a directory only its owner can read; give the store the permissions os.makedirs would.
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(temporary_directory, 0o777 & ~umask)
+    try:
+        np.save(
+            os.path.join(temporary_directory, "keys.npy"), np.array(keys, dtype=str)
+        )
+        np.save(os.path.join(temporary_directory, "offsets.npy"), offsets)
+        np.save(
+            os.path.join(temporary_directory, "peak_indices.npy"),
+            np.asarray(peak_indices, dtype=np.int32),
+        )
+        for name, column in (peak_columns or {}).items():
+            np.save(os.path.join(temporary_directory, f"{name}.npy"), column)
+        replace_directory(temporary_directory, store_directory)
+    finally:
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    return PeakStore(store_directory)
+
+
+def replace_directory(source_directory, destination_directory):
+    """
+    Move a directory into place, replacing any existing directory of the same name.
+    A directory cannot be renamed over a non-empty one, so an existing destination is first moved aside and deleted afterwards;
+    between the two renames, destination_directory does not exist.
+    Args:
+        source_directory: Directory to move.
+        destination_directory: Path at which the directory is placed.
+    Returns:
+        None.
+    """
+    if not os.path.isdir(destination_directory):
+        os.replace(source_directory, destination_directory)
+        return
+
+    previous_directory = source_directory + ".previous"
+    os.replace(destination_directory, previous_directory)
+    try:
+        os.replace(source_directory, destination_directory)
+    except OSError:
+        os.replace(previous_directory, destination_directory)
+        raise
+    shutil.rmtree(previous_directory, ignore_errors=True)
+
+
+class PeakStore(Mapping):
+    """
+    Read-only dictionary of peak positions saved by save_peak_store.
+    store[key] returns the peak positions (indices) of one scan as a view of the memory-mapped peak_indices.npy.
+    Keys keep the order in which they were saved.
+    """
+
+    def __init__(self, store_directory, mmap_mode="r"):
+        """
+        Args:
+            store_directory: Directory containing keys.npy, offsets.npy, peak_indices.npy, and optional column files.
+            mmap_mode: Memory-map mode passed to np.load (None reads the store into memory).
+        """
+        self.store_directory = store_directory
+        self.mmap_mode = mmap_mode
+        self.keys_array = np.load(os.path.join(store_directory, "keys.npy"))
+        self.offsets = np.load(os.path.join(store_directory, "offsets.npy"))
+        self.peak_indices = np.load(
+            os.path.join(store_directory, "peak_indices.npy"), mmap_mode=mmap_mode
+        )
+        self.key_rows = {key: row for row, key in enumerate(self.keys_array.tolist())}
+        self.columns = {}
+
+    def __getitem__(self, key):
+        row = self.key_rows[key]
+        return self.peak_indices[self.offsets[row] : self.offsets[row + 1]]
+
+    def __iter__(self):
+        return iter(self.key_rows)
+
+    def __len__(self):
+        return len(self.key_rows)
+
+    @property
+    def peak_counts(self):
+        """
+        NumPy array of the number of peaks of every scan, in key order.
+        """
+        return np.diff(self.offsets)
+
+    def peak_count(self, key):
+        """
+        Number of peaks of one scan, read from the offsets without touching its peaks.
+        Args:
+            key: Key of the scan.
+        Returns:
+            Number of peaks.
+        """
+        row = self.key_rows[key]
+        return int(self.offsets[row + 1] - self.offsets[row])
+
+    def has_column(self, name):
+        """
+        Check whether a per-peak column was saved with the store.
+        Args:
+            name: Column name (e.g., "area").
+        Returns:
+            True if the column exists.
+        """
+        return os.path.exists(os.path.join(self.store_directory, f"{name}.npy"))
+
+    def column(self, name, key=None):
+        """
+        Read a per-peak column.
+        Args:
+            name: Column name (e.g., "area").
+            key: Key of a scan; None returns the column of all scans concatenated.
+        Returns:
+            NumPy array (memory-mapped) of column values.
+        """
+        if name not in self.columns:
+            column = np.load(
+                os.path.join(self.store_directory, f"{name}.npy"),
+                mmap_mode=self.mmap_mode,
+            )
+            if len(column) != self.offsets[-1]:
+                raise ValueError(
+                    f"Column {name} has {len(column)} values, but the store has {self.offsets[-1]} peaks."
+                )
+            self.columns[name] = column
+        if key is None:
+            return self.columns[name]
+
+        row = self.key_rows[key]
+        return self.columns[name][self.offsets[row] : self.offsets[row + 1]]
+
+
+def open_peaks(peaks_path, mmap_mode="r"):
+    """
+    Open saved peaks, whether written as a peak store or as an .npz file of one array per scan.
+    Args:
+        peaks_path: Path to a peak store directory, or to an .npz file (the ".npz" extension may be omitted).
+        mmap_mode: Memory-map mode used for a peak store.
+    Returns:
+        PeakStore, or the loaded .npz file (both are read-only dictionaries of peak positions).
+    """
+    if os.path.isdir(peaks_path):
+        return PeakStore(peaks_path, mmap_mode=mmap_mode)
+    if not peaks_path.endswith(".npz"):
+        peaks_path += ".npz"
+
+    return np.load(peaks_path)
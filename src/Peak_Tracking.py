@@ -8,12 +8,15 @@ Description:
 This script produces a matrix where each peak are tracked across different experiments. The matrix is saved in "tracked_peak_matrix.txt"
 """
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+from matplotlib.figure import Figure
 from pandas.plotting import table
+from scipy.optimize import linear_sum_assignment
 from tabulate import tabulate
 
+from src.Gr_Cube import scan_metadata_from_log
+from src.Peak_Store import open_peaks
 from src.Read_User_Input import read_user_input
 
 
@@ -52,93 +55,390 @@ def extend_matrix_length(old, new_position):
     return new
 
 
-def track_peaks(threshold_distance: float):
+def track_next_experiment(
+    tracked_matrix, experiment_to_track: int, peak_positions, max_distance: float
+):
     """
-    Tracks peaks from experiments indicated in user_input.txt
+    Adds the peaks of one experiment to the Tracked Peak Matrix, matching them to peaks tracked in previous experiments.
+    Only rows before experiment_to_track are read, so the matrix may hold unused rows for experiments still to come.
 
     Args:
-        threshold_distance: the maximum displacement (in 10^2 Angstroms) for peaks from 2 different experiments to be considered the same peak.
+        tracked_matrix: Tracked Peak Matrix filled up to row experiment_to_track - 1.
+        experiment_to_track: experiment (row) that is being updated in the Tracked Peak Matrix.
+        peak_positions: peak positions (indices) of the experiment being tracked.
+        max_distance: the maximum displacement (in 10^2 Angstroms) for peaks from 2 different experiments to be considered the same peak.
 
     returns
-        "tracked_peak_matrix.txt", which is the file name containing tracking results.
+        Tracked Peak Matrix, with a column inserted for every new peak.
     """
-    # LOAD USER INPUT:
-    experiment_type, temperature_point = read_user_input()
-    max_distance = (
-        threshold_distance  # maximum peak distance to tolerate peak movements.
+    p_ori = 0  # starting position index in original experiment.
+    p_tracked = (
+        0  # starting position index in previous experiments in Tracked Peak Matrix.
     )
-    total_experiments = len(experiment_type)
-
-    # Initialize tracked peak matrix.
-    first_experiment = np.load("../data/pdf_" + experiment_type[0] + "_peaks.npz")
-    tracked_matrix = np.empty(
-        (total_experiments, len(first_experiment[temperature_point[0]]))
-    )  # make an empty matrix
-    tracked_matrix[0, :] = first_experiment[
-        temperature_point[0]
-    ]  # the peak positions in first experiment are just being copied.
-
-    for i in range(1, total_experiments):
-        file = np.load("../data/pdf_" + experiment_type[i] + "_peaks.npz")
-        p_ori = 0  # starting position index in original experiment.
-        p_tracked = (
-            0  # starting position index in previous experiments in Tracked Peak Matrix.
+
+    while p_tracked < len(tracked_matrix[experiment_to_track - 1, :]) and p_ori < len(
+        peak_positions
+    ):
+        diff = calc_diff(
+            experiment_to_track, p_tracked, peak_positions[p_ori], tracked_matrix
         )
+        if abs(diff) <= max_distance:
+            if p_tracked != len(tracked_matrix[experiment_to_track - 1, :]) - 1:
+                diff2 = calc_diff(
+                    experiment_to_track,
+                    p_tracked + 1,
+                    peak_positions[p_ori],
+                    tracked_matrix,
+                )
+            else:
+                # for the case when p_tracked is at the last point of data set.
+                diff2 = diff
 
-        while p_tracked < len(tracked_matrix[i - 1, :]) and p_ori < len(
-            file[temperature_point[i]][:]
-        ):
-            diff = calc_diff(
-                i, p_tracked, file[temperature_point[i]][p_ori], tracked_matrix
-            )
-            if abs(diff) <= max_distance:
-                if p_tracked != len(tracked_matrix[i - 1, :]) - 1:
-                    diff2 = calc_diff(
-                        i,
-                        p_tracked + 1,
-                        file[temperature_point[i]][p_ori],
-                        tracked_matrix,
+            if diff2 < diff:
+                # Scenario 1: CURRENT EXPERIMENT DO NOT CONTAIN AN EXISTING PEAK FROM PREVIOUS experimentS
+                tracked_matrix[experiment_to_track, p_tracked] = "NaN"
+                p_tracked += 1
+            else:
+                # Scenario 2: PEAKS BEING COMPARED ARE THE SAME PEAK
+                tracked_matrix[experiment_to_track, p_tracked] = peak_positions[p_ori]
+                p_ori += 1
+                p_tracked += 1
+        elif diff < -max_distance:
+            # Scenario 1
+            tracked_matrix[experiment_to_track, p_tracked] = "NaN"
+            p_tracked += 1
+        elif diff > max_distance:
+            # Scenario 3: NEW PEAK EXIST IN CURRENT EXPERIMENT
+            tracked_matrix = extend_matrix_length(tracked_matrix, p_tracked)
+            tracked_matrix[experiment_to_track, p_tracked] = peak_positions[p_ori]
+            p_ori += 1
+            p_tracked += 1
+
+    # Codes below are to make adjustments to the tail of the matrix
+    if tracked_matrix[experiment_to_track, p_tracked - 1] != peak_positions[p_ori - 1]:
+        # Reassuring final data point from original data set is included
+        tracked_matrix = extend_matrix_length(tracked_matrix, p_tracked)
+        tracked_matrix[experiment_to_track, -1] = peak_positions[-1]
+    else:
+        while p_tracked < len(tracked_matrix[experiment_to_track - 1, :]):
+            # Reassuring there are no empty (zeros) data points in the tracked data set.
+            tracked_matrix[experiment_to_track, p_tracked] = "NaN"
+            p_tracked += 1
+
+    return tracked_matrix
+
+
+class PeakTracker:
+    """
+    Tracks peaks experiment by experiment with the same rules as track_next_experiment, without growing a matrix.
+    Each tracked peak (track) keeps its last-seen position, so no walk back through NaN rows is needed,
+    and every matched peak is appended to a sparse list of (experiment, track, position) records.
+    The order of the tracks (the columns of the Tracked Peak Matrix) is rebuilt once per experiment,
+    and the dense matrix is only built when tracked_matrix() is called.
+    """
+
+    def __init__(self, max_distance: float):
+        """
+        Args:
+            max_distance: the maximum displacement (in 10^2 Angstroms) for peaks from 2 different experiments to be considered the same peak.
+        """
+        self.max_distance = max_distance
+        self.experiments = 0
+        self.track_order = []  # track ids in column order.
+        self.last_positions = []  # last-seen position of each track id.
+        self.record_experiments = []
+        self.record_tracks = []
+        self.record_positions = []
+
+    def __len__(self):
+        return self.experiments
+
+    def add_experiment(self, peak_positions):
+        """
+        Match the peaks of the next experiment to the tracked peaks.
+
+        Args:
+            peak_positions: peak positions (indices) of the experiment being tracked, in increasing order.
+
+        returns
+            None.
+        """
+        experiment = self.experiments
+        self.experiments += 1
+        if experiment == 0:
+            for position in peak_positions:
+                self.track_order.append(self.new_track(experiment, position))
+            return
+
+        previous_order = self.track_order
+        track_order = []
+        p_ori = 0  # position index in the current experiment.
+        p_tracked = 0  # column index among the tracks of previous experiments.
+        last_was_peak = False
+
+        while p_tracked < len(previous_order) and p_ori < len(peak_positions):
+            track = previous_order[p_tracked]
+            diff = self.last_positions[track] - peak_positions[p_ori]
+            if abs(diff) <= self.max_distance:
+                if p_tracked != len(previous_order) - 1:
+                    diff2 = (
+                        self.last_positions[previous_order[p_tracked + 1]]
+                        - peak_positions[p_ori]
                     )
                 else:
-                    # for the case when p_tracked is at the last point of data set.
                     diff2 = diff
+                matched = not diff2 < diff
+            else:
+                matched = False
 
-                if diff2 < diff:
-                    # Scenario 1: CURRENT EXPERIMENT DO NOT CONTAIN AN EXISTING PEAK FROM PREVIOUS experimentS
-                    tracked_matrix[i, p_tracked] = "NaN"
-                    p_tracked += 1
-                else:
-                    # Scenario 2: PEAKS BEING COMPARED ARE THE SAME PEAK
-                    tracked_matrix[i, p_tracked] = file[temperature_point[i]][p_ori]
-                    p_ori += 1
-                    p_tracked += 1
-            elif diff < -max_distance:
-                # Scenario 1
-                tracked_matrix[i, p_tracked] = "NaN"
+            if matched:
+                # Scenario 2: PEAKS BEING COMPARED ARE THE SAME PEAK
+                self.add_record(experiment, track, peak_positions[p_ori])
+                track_order.append(track)
+                p_ori += 1
                 p_tracked += 1
-            elif diff > max_distance:
+                last_was_peak = True
+            elif diff > self.max_distance:
                 # Scenario 3: NEW PEAK EXIST IN CURRENT EXPERIMENT
-                tracked_matrix = extend_matrix_length(tracked_matrix, p_tracked)
-                tracked_matrix[i, p_tracked] = file[temperature_point[i]][p_ori]
+                track_order.append(self.new_track(experiment, peak_positions[p_ori]))
                 p_ori += 1
+                last_was_peak = True
+            else:
+                # Scenario 1: CURRENT EXPERIMENT DO NOT CONTAIN AN EXISTING PEAK FROM PREVIOUS EXPERIMENTS
+                track_order.append(track)
                 p_tracked += 1
+                last_was_peak = False
 
-        # Codes below are to make adjustments to the tail of the matrix
-        if tracked_matrix[i, p_tracked - 1] != file[temperature_point[i]][p_ori - 1]:
-            # Reassuring final data point from original data set is included
-            tracked_matrix = extend_matrix_length(tracked_matrix, p_tracked)
-            tracked_matrix[i, -1] = file[temperature_point[i]][-1]
+        # Tracks that were not reached stay NaN in this experiment.
+        track_order.extend(previous_order[p_tracked:])
+        if not last_was_peak and len(peak_positions) > 0:
+            # As in track_next_experiment, the final peak is added as a new track when the last comparison found no match.
+            track_order.append(self.new_track(experiment, peak_positions[-1]))
+        self.track_order = track_order
+
+    def new_track(self, experiment, position):
+        """
+        Start a new track at a peak position and return its id.
+        """
+        self.last_positions.append(position)
+        track = len(self.last_positions) - 1
+        self.add_record(experiment, track, position)
+        return track
+
+    def add_record(self, experiment, track, position):
+        """
+        Record that a track was seen at a position in an experiment.
+        """
+        self.last_positions[track] = position
+        self.record_experiments.append(experiment)
+        self.record_tracks.append(track)
+        self.record_positions.append(position)
+
+    def column_order(self):
+        """
+        Track ids in the order of the columns of the Tracked Peak Matrix.
+        """
+        return self.track_order
+
+    def tracked_matrix(self):
+        """
+        Build the Tracked Peak Matrix (experiments x tracked peaks), with NaN where a peak was not found.
+
+        returns
+            Tracked Peak Matrix, identical to the one built by track_next_experiment.
+        """
+        track_order = self.column_order()
+        track_columns = np.empty(len(self.last_positions), dtype=np.int64)
+        track_columns[track_order] = np.arange(len(track_order))
+
+        tracked_matrix = np.full((self.experiments, len(track_order)), np.nan)
+        tracked_matrix[
+            np.array(self.record_experiments, dtype=np.int64),
+            track_columns[np.array(self.record_tracks, dtype=np.int64)],
+        ] = self.record_positions
+        return tracked_matrix
+
+
+class AssignmentPeakTracker(PeakTracker):
+    """
+    Tracks peaks by optimal assignment instead of the greedy comparisons of track_next_experiment.
+    Peaks of each experiment are matched to tracks by minimizing the total displacement (scipy.optimize.linear_sum_assignment),
+    considering only pairs closer than max_distance. Since peak positions are sorted, the candidate pairs form a band that splits
+    into small independent blocks, and each block is solved on its own.
+    A track that is missing from up to max_gap consecutive experiments can still be matched afterwards.
+    Columns of the Tracked Peak Matrix are ordered by the mean position of each track.
+    """
+
+    def __init__(self, max_distance: float, max_gap: int = 0):
+        """
+        Args:
+            max_distance: the maximum displacement (in 10^2 Angstroms) for peaks from 2 different experiments to be considered the same peak.
+            max_gap: the number of consecutive experiments from which a peak may be missing and still be tracked.
+        """
+        super().__init__(max_distance)
+        self.max_gap = max_gap
+        self.last_experiments = []  # last experiment in which each track id was seen.
+
+    def add_experiment(self, peak_positions):
+        """
+        Match the peaks of the next experiment to the tracked peaks.
+
+        Args:
+            peak_positions: peak positions (indices) of the experiment being tracked, in increasing order.
+
+        returns
+            None.
+        """
+        experiment = self.experiments
+        self.experiments += 1
+        peak_positions = np.asarray(peak_positions)
+
+        # Tracks seen within the last max_gap + 1 experiments, sorted by last-seen position.
+        last_experiments = np.array(self.last_experiments, dtype=np.int64)
+        tracks = np.flatnonzero(last_experiments >= experiment - 1 - self.max_gap)
+        last_positions = np.array(self.last_positions, dtype=float)[tracks]
+        track_sort = np.argsort(last_positions, kind="stable")
+        tracks, last_positions = tracks[track_sort], last_positions[track_sort]
+
+        # Peaks within max_distance of each track.
+        first_candidates = np.searchsorted(
+            peak_positions, last_positions - self.max_distance
+        )
+        last_candidates = np.searchsorted(
+            peak_positions, last_positions + self.max_distance, side="right"
+        )
+
+        matched_peaks = np.zeros(len(peak_positions), dtype=bool)
+        block_start = 0
+        for track_index in range(1, len(tracks) + 1):
+            # Candidate windows move right with the tracks, so a block ends where the next window starts past the previous one.
+            if (
+                track_index < len(tracks)
+                and first_candidates[track_index] < last_candidates[track_index - 1]
+            ):
+                continue
+            self.assign_block(
+                experiment,
+                tracks[block_start:track_index],
+                last_positions[block_start:track_index],
+                peak_positions,
+                first_candidates[block_start],
+                last_candidates[track_index - 1],
+                matched_peaks,
+            )
+            block_start = track_index
+
+        for peak_index in np.flatnonzero(~matched_peaks):
+            self.new_track(experiment, peak_positions[peak_index])
+
+    def assign_block(
+        self,
+        experiment,
+        tracks,
+        last_positions,
+        peak_positions,
+        first_peak,
+        last_peak,
+        matched_peaks,
+    ):
+        """
+        Match one block of tracks to the peaks that lie within max_distance of them.
+        """
+        if last_peak <= first_peak:
+            return
+        if len(tracks) == 1 and last_peak - first_peak == 1:
+            self.match_peak(
+                experiment, tracks[0], peak_positions, first_peak, matched_peaks
+            )
+            return
+
+        distances = np.abs(
+            last_positions[:, None] - peak_positions[None, first_peak:last_peak]
+        )
+        # A pair beyond the gate costs max_distance, the same as leaving its track and its peak unmatched,
+        # so a pair within the gate is only matched when that lowers the total displacement.
+        gated = distances > self.max_distance
+        distances[gated] = self.max_distance
+        track_rows, peak_columns = linear_sum_assignment(distances)
+        for track_row, peak_column in zip(track_rows, peak_columns):
+            if not gated[track_row, peak_column]:
+                self.match_peak(
+                    experiment,
+                    tracks[track_row],
+                    peak_positions,
+                    first_peak + peak_column,
+                    matched_peaks,
+                )
+
+    def match_peak(self, experiment, track, peak_positions, peak_index, matched_peaks):
+        """
+        Record that a track continues at a peak of the current experiment.
+        """
+        self.add_record(experiment, track, peak_positions[peak_index])
+        matched_peaks[peak_index] = True
+
+    def add_record(self, experiment, track, position):
+        """
+        Record that a track was seen at a position in an experiment.
+        """
+        if track == len(self.last_experiments):
+            self.last_experiments.append(experiment)
         else:
-            while p_tracked < len(tracked_matrix[i - 1, :]):
-                # Reassuring there are no empty (zeros) data points in the tracked data set.
-                tracked_matrix[i, p_tracked] = "NaN"
-                p_tracked += 1
+            self.last_experiments[track] = experiment
+        super().add_record(experiment, track, position)
+
+    def column_order(self):
+        """
+        Track ids in the order of the columns of the Tracked Peak Matrix (by mean position).
+        """
+        tracks = np.array(self.record_tracks, dtype=np.int64)
+        position_sums = np.bincount(tracks, weights=self.record_positions)
+        mean_positions = position_sums / np.bincount(tracks)
+
+        return np.argsort(mean_positions, kind="stable")
+
+
+def track_peaks(
+    threshold_distance: float,
+    mode: str = "greedy",
+    max_gap: int = 0,
+    schedule: str = "user_input",
+):
+    """
+    Tracks peaks from experiments indicated in user_input.txt, or from every scan recorded in log.txt
+
+    Args:
+        threshold_distance: the maximum displacement (in 10^2 Angstroms) for peaks from 2 different experiments to be considered the same peak.
+        mode: "greedy" (PeakTracker) or "assignment" (AssignmentPeakTracker).
+        max_gap: the number of consecutive experiments a peak may be missing from ("assignment" mode only).
+        schedule: "user_input" tracks the experiments listed in user_input.txt; "log" tracks every ramp and dwell scan in chronological order.
+
+    returns
+        "tracked_peak_matrix.txt" (or "tracked_peak_trajectories.txt" for the "log" schedule), which is the file name containing tracking results.
+    """
+    # LOAD USER INPUT:
+    experiment_type, temperature_point = tracking_schedule(schedule)
+    max_distance = (
+        threshold_distance  # maximum peak distance to tolerate peak movements.
+    )
+
+    tracked_matrix = track_schedule(
+        experiment_type, temperature_point, max_distance, mode, max_gap
+    )
 
     # SAVING OUTPUT:
     non_nan_indices = ~np.isnan(tracked_matrix)  # Identify non-NaN elements
     tracked_matrix[non_nan_indices] = (
         tracked_matrix[non_nan_indices] / 100
     )  # changing the positions from index to distance in Angstroms
+    if schedule == "log":
+        np.save("../data/tracked_peak_trajectories.npy", tracked_matrix)
+        output_file = "tracked_peak_trajectories.txt"
+        image_file = "all_tracked_peak_matrix.png"
+    else:
+        output_file = "tracked_peak_matrix.txt"
+        image_file = "selected_tracked_peak_matrix.png"
+
     tracked_matrix_list = tracked_matrix.tolist()
     for i in range(len(tracked_matrix_list)):
         tracked_matrix_list[i].insert(
@@ -150,33 +450,103 @@ def track_peaks(threshold_distance: float):
     tracked_table = tabulate(tracked_matrix_list, headers, tablefmt="grid")
 
     # output_file_path = os.path.join('../data/', 'tracked_peak_matrix.txt')
-    with open("../data/tracked_peak_matrix.txt", "w") as file:
+    with open("../data/" + output_file, "w") as file:
         file.write(tracked_table)
 
+    # The PNG table shows the first 10 experiments and 8 peaks, labelled by the experiments selected.
     df = pd.DataFrame.from_records(tracked_matrix_list)
     df.columns = headers
     df.index = [
-        "30\u00B0C",
-        "100\u00B0C",
-        "200\u00B0C",
-        "300\u00B0C",
-        "400\u00B0C",
-        "500\u00B0C",
-        "600\u00B0C",
-        "700\u00B0C",
-        "800\u00B0C",
-        "900\u00B0C",
+        scan_label(experiment_type[i], temperature_point[i])
+        for i in range(len(experiment_type))
     ]
-    ax = plt.subplot(111, frame_on=False)
+    fig = Figure()
+    ax = fig.add_subplot(111, frame_on=False)
     ax.axis("off")
     ax.set_title("Tracked Peak Positions for Selected PDF Peaks")
     table(ax, df.iloc[0:10, 1:9], loc="upper center")
-    plt.tight_layout()
-    plt.savefig(
-        "../data/images/selected_tracked_peak_matrix.png",
+    fig.tight_layout()
+    fig.savefig(
+        "../data/images/" + image_file,
         bbox_inches="tight",
         orientation="landscape",
     )
-    plt.close()
 
-    return "tracked_peak_matrix.txt"
+    return output_file
+
+
+def tracking_schedule(schedule: str = "user_input"):
+    """
+    Lists the experiments to track, in order.
+
+    Args:
+        schedule: "user_input" reads user_input.txt; "log" lists every ramp and dwell scan in log.txt (in chronological order)
+        for which peaks were saved.
+
+    returns
+        NumPy arrays of experiment types ("ramp" or "dwell") and temperature points (keys of the saved peaks).
+    """
+    if schedule == "user_input":
+        return read_user_input()
+    if schedule != "log":
+        raise ValueError(f"schedule must be 'user_input' or 'log', not {schedule!r}.")
+
+    scans = scan_metadata_from_log("../data", "log.txt")
+    saved_peaks = {
+        kind: open_peaks("../data/pdf_" + kind + "_peaks") for kind in ("ramp", "dwell")
+    }
+    saved_scans = np.array(
+        [scan["key"] in saved_peaks[scan["kind"]] for scan in scans], dtype=bool
+    )
+
+    return scans["kind"][saved_scans], scans["key"][saved_scans]
+
+
+def track_schedule(
+    experiment_type,
+    temperature_point,
+    max_distance: float,
+    mode: str = "greedy",
+    max_gap: int = 0,
+):
+    """
+    Tracks peaks experiment by experiment and builds the Tracked Peak Matrix once at the end.
+    The saved peaks of each experiment type are opened once, however many experiments are tracked.
+
+    Args:
+        experiment_type: experiment types ("ramp" or "dwell"), one per experiment.
+        temperature_point: keys of the saved peaks, one per experiment.
+        max_distance: the maximum displacement (in 10^2 Angstroms) for peaks from 2 different experiments to be considered the same peak.
+        mode: "greedy" (PeakTracker) or "assignment" (AssignmentPeakTracker).
+        max_gap: the number of consecutive experiments a peak may be missing from ("assignment" mode only).
+
+    returns
+        Tracked Peak Matrix (experiments x tracked peaks) of peak positions (indices).
+    """
+    if mode == "greedy":
+        tracker = PeakTracker(max_distance)
+    elif mode == "assignment":
+        tracker = AssignmentPeakTracker(max_distance, max_gap)
+    else:
+        raise ValueError(f"mode must be 'greedy' or 'assignment', not {mode!r}.")
+
+    saved_peaks = {}
+    for i in range(len(experiment_type)):
+        if experiment_type[i] not in saved_peaks:
+            saved_peaks[experiment_type[i]] = open_peaks(
+                "../data/pdf_" + experiment_type[i] + "_peaks"
+            )
+        tracker.add_experiment(saved_peaks[experiment_type[i]][temperature_point[i]])
+
+    return tracker.tracked_matrix()
+
+
+def scan_label(experiment_type, temperature_point):
+    """
+    Label of an experiment for tables (e.g., "300\u00B0C" for a dwell, "300\u00B0C ramp 09" for a ramp scan).
+    """
+    if experiment_type == "ramp":
+        setpoint, interval = temperature_point.split("_")
+        return f"{setpoint}\u00B0C ramp {interval}"
+
+    return f"{int(temperature_point):n}\u00B0C"
@@ -0,0 +1,273 @@
+"""
+Pipeline
+
+Author: Debra Keiser
+Date Modified: 17OCT2026
+
+Description:
+This script runs the steps of Create_Report.py as a graph of stages (see Stage_Graph.py) and only reruns the stages whose inputs changed.
+Intermediate results are saved to data/pipeline and cached in data/.pipeline_cache, so that, e.g., editing data/user_input.txt
+reruns peak tracking and the report without rebuilding the G(r) cube, peak stores, or peak integrals.
+Stage keys include the source code of the stage functions below and of the scripts in src/ that they call (see Stage_Graph.stage_code),
+so editing, e.g., Extract_Data.locate_peaks reruns the peaks stage and every stage downstream of it.
+"""
+
+
+import argparse
+import os
+
+import numpy as np
+from Create_Report import (
+    create_report,
+    render_gr_heatmap,
+    render_pdf_plots,
+    render_peak_histogram,
+    render_peak_integrals,
+    render_tracked_peaks,
+    save_peak_stores,
+)
+from Determine_Analytes import get_analyte_data_linear
+from Gr_Cube import build_gr_cube, load_gr_cube, scan_metadata_from_log
+from Integrate_Peaks import campaign_peak_integration
+from Read_Log_File import extract_time_temp_data
+from Stage_Graph import Stage, StageGraph
+
+PIPELINE_DIRECTORY = "../data/pipeline"
+CACHE_DIRECTORY = "../data/.pipeline_cache"
+LOG_DATA_FILE = PIPELINE_DIRECTORY + "/log_time_temperature.npz"
+ANALYTE_DATA_FILE = PIPELINE_DIRECTORY + "/analyte_time_temperature.npz"
+
+
+def load_log_data():
+    """
+    Read the times and temperatures saved by the log stage.
+    Returns:
+        Lists of recorded times, recorded temperatures, and rounded temperatures (see Read_Log_File.extract_time_temp_data).
+    """
+    with np.load(LOG_DATA_FILE) as log_data:
+        return (
+            log_data["recorded_times"].tolist(),
+            log_data["recorded_temperatures"].tolist(),
+            log_data["rounded_temperatures"].tolist(),
+        )
+
+
+def parse_log():
+    """
+    Stage "log": read times and temperatures from log.txt.
+    """
+    (
+        recorded_times_from_experiment,
+        recorded_temperatures_from_experiment,
+        rounded_temperatures,
+    ) = extract_time_temp_data("../data", "log.txt")
+    np.savez(
+        LOG_DATA_FILE,
+        recorded_times=recorded_times_from_experiment,
+        recorded_temperatures=recorded_temperatures_from_experiment,
+        rounded_temperatures=rounded_temperatures,
+    )
+
+
+def select_analytes():
+    """
+    Stage "analytes": select the analyte times and temperatures (see Determine_Analytes.get_analyte_data_linear).
+    """
+    analyte_times, analyte_temperatures = get_analyte_data_linear(*load_log_data())
+    np.savez(
+        ANALYTE_DATA_FILE,
+        analyte_times=analyte_times,
+        analyte_temperatures=analyte_temperatures,
+    )
+
+
+def build_cube(dtype="float64"):
+    """
+    Stage "cube": stack the G(r) data of every scan (see Gr_Cube.build_gr_cube).
+    Args:
+        dtype: Name of the data type in which G(r) data are stored ("float64" or "float32").
+    """
+    build_gr_cube(
+        "../data/gr_files",
+        scan_metadata_from_log("../data", "log.txt"),
+        "../data/gr_cube",
+        dtype=np.dtype(dtype),
+    )
+
+
+def extract_peaks():
+    """
+    Stage "peaks": save the ramp and dwell peak stores (see Create_Report.save_peak_stores).
+    """
+    _, _, rounded_temperatures = load_log_data()
+    save_peak_stores(rounded_temperatures, load_gr_cube("../data/gr_cube"))
+
+
+def integrate_peaks():
+    """
+    Stage "integration": integrate the peaks of every scan and plot the integral differences of the dwell scans.
+    """
+    campaign_peak_integration(
+        "../data/gr_cube",
+        "../data/pdf_ramp_peaks",
+        "../data/pdf_dwell_peaks",
+        "../data/peak_integrals",
+    )
+    render_peak_integrals()
+
+
+def build_report():
+    """
+    Stage "report": compile the images of every stage into the report.
+    """
+    create_report("../data/final_output_report.pdf", build_images=False)
+
+
+STAGES = (
+    Stage(
+        "log",
+        parse_log,
+        inputs=("../data/log.txt",),
+        outputs=(LOG_DATA_FILE,),
+    ),
+    Stage(
+        "analytes",
+        select_analytes,
+        dependencies=("log",),
+        outputs=(ANALYTE_DATA_FILE,),
+    ),
+    Stage(
+        "cube",
+        build_cube,
+        inputs=("../data/log.txt", "../data/gr_files"),
+        outputs=("../data/gr_cube",),
+        parameters=("float64",),
+    ),
+    Stage(
+        "peaks",
+        extract_peaks,
+        dependencies=("log", "cube"),
+        inputs=("../data/gr_files",),
+        outputs=("../data/pdf_ramp_peaks", "../data/pdf_dwell_peaks"),
+    ),
+    Stage(
+        "tracking",
+        render_tracked_peaks,
+        dependencies=("peaks",),
+        inputs=("../data/user_input.txt",),
+        outputs=(
+            "../data/tracked_peak_matrix.txt",
+            "../data/images/selected_tracked_peak_matrix.png",
+        ),
+    ),
+    Stage(
+        "integration",
+        integrate_peaks,
+        dependencies=("cube", "peaks"),
+        inputs=("../data/gr_files",),
+        outputs=(
+            "../data/peak_integrals",
+            "../data/images/peak_integral_differences.png",
+        ),
+    ),
+    Stage(
+        "pdf_plots",
+        render_pdf_plots,
+        inputs=("../data/gr_files", "../data/bond_ranges.txt"),
+        outputs=(
+            "../data/images/total_peaks_and_PDFs.png",
+            "../data/images/zoomed_peaks_and_PDFs.png",
+        ),
+    ),
+    Stage(
+        "peak_histogram",
+        render_peak_histogram,
+        dependencies=("peaks",),
+        outputs=("../data/images/total_peaks_histogram.png",),
+    ),
+    Stage(
+        "gr_heatmap",
+        render_gr_heatmap,
+        dependencies=("cube", "peaks"),
+        inputs=("../data/log.txt",),
+        outputs=(
+            "../data/tracked_peak_trajectories.txt",
+            "../data/tracked_peak_trajectories.npy",
+            "../data/images/all_tracked_peak_matrix.png",
+            "../data/images/gr_heatmap.png",
+        ),
+    ),
+    Stage(
+        "report",
+        build_report,
+        dependencies=(
+            "analytes",
+            "pdf_plots",
+            "peak_histogram",
+            "tracking",
+            "integration",
+            "gr_heatmap",
+        ),
+        outputs=("../data/final_output_report.pdf",),
+    ),
+)
+
+
+def pipeline_graph(dtype="float64"):
+    """
+    Build the stage graph of the PDF analysis.
+    Args:
+        dtype: Name of the data type in which the cube stage stores G(r) data; peaks are located in the same precision.
+        Because it is a parameter of the cube stage, changing it reruns the cube and every stage downstream of it.
+    Returns:
+        StageGraph of STAGES cached in CACHE_DIRECTORY.
+    """
+    stages = [
+        stage._replace(parameters=(dtype,)) if stage.name == "cube" else stage
+        for stage in STAGES
+    ]
+
+    return StageGraph(stages, CACHE_DIRECTORY)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run stages of the PDF analysis, reusing cached results of stages whose inputs did not change."
+    )
+    parser.add_argument(
+        "targets",
+        nargs="*",
+        default=["report"],
+        help="Stages to build (default: report).",
+    )
+    parser.add_argument(
+        "--force",
+        action="append",
+        default=[],
+        metavar="STAGE",
+        help="Rerun a stage even if its cached results are current (may be repeated).",
+    )
+    parser.add_argument(
+        "--dtype",
+        choices=("float64", "float32"),
+        default="float64",
+        help="Precision in which G(r) data are stored (default: float64; float32 halves their memory).",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the stages and their dependencies."
+    )
+    args = parser.parse_args(argv)
+
+    graph = pipeline_graph(args.dtype)
+    if args.list:
+        for stage in STAGES:
+            print(f"{stage.name}: {', '.join(stage.dependencies) or '-'}")
+        return
+
+    os.makedirs(PIPELINE_DIRECTORY, exist_ok=True)
+    for name, status in graph.run(args.targets, force=args.force):
+        print(f"{name}: {status}")
+
+
+if __name__ == "__main__":
+    main()
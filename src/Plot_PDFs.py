@@ -8,9 +8,12 @@ Description:
 This file contains all functions related to plotting the PDF data
 """
 
-import matplotlib.pyplot as plt
-from Bond_Labels import extract_peak_labels
+import numpy as np
+from Bond_Labels import BondLabeller, load_bond_ranges
 from Extract_Data import extract_pdf_data, rescale_g_r
+from Gr_Cube import decimate_min_max, downsample_gr_cube, load_gr_cube, read_rows
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 
 
 def plot_peaks(r_list, g_r_list, labels, filename):
@@ -26,60 +29,247 @@ def plot_peaks(r_list, g_r_list, labels, filename):
     Returns:
     - None: The function saves the plot as a PNG file and does not return any value.
     """
-    plt.figure(figsize=(12, 8))  # Modify the figure size as needed
+    # Figures are built without pyplot so that no global plotting state is shared (e.g., between report sections rendered in parallel).
+    fig = Figure(figsize=(12, 8))  # Modify the figure size as needed
+    ax = fig.add_subplot()
     for i in range(len(r_list)):
-        plt.plot(r_list[i], g_r_list[i], label=labels[i])
+        ax.plot(r_list[i], g_r_list[i], label=labels[i])
 
-    plt.title("PDF Data at Increasing Temperatures", fontsize=16)
-    plt.xlabel("r (\u00C5)", fontsize=14)
-    plt.ylabel("G(r)", fontsize=14)
-    plt.legend()
-    plt.grid(True)
+    ax.set_title("PDF Data at Increasing Temperatures", fontsize=16)
+    ax.set_xlabel("r (\u00C5)", fontsize=14)
+    ax.set_ylabel("G(r)", fontsize=14)
+    ax.legend()
+    ax.grid(True)
     # Save the plot as a PNG file
-    plt.savefig(filename, format="png")
-    plt.close()  # Close the plot to release memory
+    fig.savefig(filename, format="png")
 
 
-def plot_zoomed_peaks(r_list, g_r_list, legend_labels, filename):
+def plot_zoomed_peaks(
+    r_list,
+    g_r_list,
+    legend_labels,
+    filename,
+    label_all_curves=False,
+    bond_labeller=None,
+):
     """
     Plots the peaks of PDF data within the first five Angstroms. Will label bond types by calling Bond_Labels.
+    Peaks of every dataset are labelled in one pass (see Bond_Labels.BondLabeller), on the r values of the first dataset.
 
     Args:
     - r_list (list): List of arrays containing r values for each temperature.
     - g_r_list (list): List of arrays containing G(r) values for each temperature corresponding to r values.
     - legend_labels (list): List of labels for each dataset in the plot.
     - filename (str): Name of the file to save the generated plot as a PNG.
+    - label_all_curves (bool): Whether to label the peaks of every dataset (in the color of its line) instead of the first dataset only.
+    - bond_labeller (BondLabeller): Labeller whose cached labels are reused across plots (default: a new labeller for r_list[0]).
 
     Returns:
     - None: The function saves the plot as a PNG file and does not return any value.
     """
-    plt.figure(figsize=(12, 8))  # Modify the figure size as needed
+    fig = Figure(figsize=(12, 8))  # Modify the figure size as needed
+    ax = fig.add_subplot()
 
+    lines = []
     for i in range(len(r_list)):
-        plt.plot(r_list[i], g_r_list[i], label=legend_labels[i])
+        lines.extend(ax.plot(r_list[i], g_r_list[i], label=legend_labels[i]))
 
-        # Extract labels for peaks within the first five Angstroms for each dataset
-        labels = extract_peak_labels(r_list[0], g_r_list[0])
-        # Plot bond lengths within the first five Angstroms
+    # Extract labels for peaks within the first five Angstroms for each dataset
+    if bond_labeller is None:
+        bond_labeller = BondLabeller(r_list[0])
+    labels_list = bond_labeller.label_curves(
+        g_r_list if label_all_curves else g_r_list[:1]
+    )
 
     # Plot bond lengths within the first five Angstroms
-    for bond_length in labels.keys():
-        plt.text(
-            bond_length[1],
-            labels[bond_length],
-            f"{bond_length[0]}",
-            ha="center",
-            va="bottom",
+    for labels, line in zip(labels_list, lines):
+        for bond_length in labels.keys():
+            ax.text(
+                bond_length[1],
+                labels[bond_length],
+                f"{bond_length[0]}",
+                ha="center",
+                va="bottom",
+                **({"color": line.get_color()} if label_all_curves else {}),
+            )
+
+    ax.set_title("PDF Data (0 to 5 Angstroms) at Increasing Temperatures", fontsize=16)
+    ax.set_xlabel("r (\u00C5)", fontsize=14)
+    ax.set_ylabel("G(r)", fontsize=14)
+    ax.grid(True)
+    ax.set_xlim(0, 5)
+    ax.legend()
+    fig.savefig(filename, format="png")
+
+
+def plot_pdf_collection(
+    r,
+    g_r_matrix,
+    temperatures,
+    filename,
+    rows=None,
+    title="PDF Data at Increasing Temperatures",
+    waterfall_offset=0.0,
+    chunk_rows=256,
+):
+    """
+    Plots many PDFs as r(A) vs G(r) with a single LineCollection, colored by temperature.
+    Each curve is first reduced to the minimum and maximum G(r) within every pixel column of the axes (see Gr_Cube.decimate_min_max),
+    so the time to render and the size of the PNG depend on the width of the plot rather than on the number of points.
+
+    Args:
+    - r (array): r values shared by every curve.
+    - g_r_matrix (array): 2-D array (or memory map) of G(r) values, one curve per row.
+    - temperatures (array): Temperature of each plotted curve, used for its color.
+    - filename (str): Name of the file to save the generated plot as a PNG.
+    - rows (array): Rows of g_r_matrix to plot (None plots every row).
+    - title (str): Title of the plot.
+    - waterfall_offset (float): Vertical shift between consecutive curves (0 overlays the curves).
+    - chunk_rows (int): Number of curves read and decimated at once.
+
+    Returns:
+    - filename (str): Name of the saved PNG file.
+    """
+    if rows is None:
+        rows = np.arange(len(g_r_matrix))
+    if len(rows) == 0:
+        raise ValueError("No curves were selected to plot.")
+
+    fig = Figure(figsize=(12, 8))
+    ax = fig.add_subplot()
+    n_bins = int(np.ceil(ax.get_position().width * fig.get_figwidth() * fig.dpi))
+
+    segments = []
+    for first_row in range(0, len(rows), chunk_rows):
+        point_indices, g_r_values = decimate_min_max(
+            read_rows(g_r_matrix, rows[first_row : first_row + chunk_rows]), n_bins
+        )
+        offsets = waterfall_offset * np.arange(first_row, first_row + len(g_r_values))
+        segments.append(
+            np.stack((r[point_indices], g_r_values + offsets[:, None]), axis=2)
         )
+    lines = LineCollection(
+        np.concatenate(segments), array=temperatures, cmap="coolwarm", linewidths=0.8
+    )
+    ax.add_collection(lines)
+    ax.autoscale_view()
+
+    ax.set_title(title, fontsize=16)
+    ax.set_xlabel("r (\u00C5)", fontsize=14)
+    ax.set_ylabel("G(r)", fontsize=14)
+    ax.grid(True)
+    fig.colorbar(lines, ax=ax, label="Temperature (\u00B0C)")
+    fig.savefig(filename, format="png")
+
+    return filename
+
+
+def plot_gr_cube(cube_directory, filename, kind="ramp", waterfall_offset=0.0):
+    """
+    Plots every PDF of one kind of scan from a G(r) matrix saved by Gr_Cube.build_gr_cube (see plot_pdf_collection).
+    The memory-mapped matrix is read a chunk of curves at a time.
+
+    Args:
+    - cube_directory (str): Directory of the G(r) matrix.
+    - filename (str): Name of the file to save the generated plot as a PNG.
+    - kind (str): "ramp" or "dwell".
+    - waterfall_offset (float): Vertical shift between consecutive curves (0 overlays the curves).
+
+    Returns:
+    - filename (str): Name of the saved PNG file.
+    """
+    if kind not in ("ramp", "dwell"):
+        raise ValueError(f'kind must be "ramp" or "dwell", not {kind!r}.')
+    gr_cube = load_gr_cube(cube_directory)
+    rows = np.flatnonzero(gr_cube.scans["kind"] == kind)
+    if len(rows) == 0:
+        raise ValueError(f"{cube_directory} holds no {kind} scans.")
+
+    return plot_pdf_collection(
+        gr_cube.r,
+        gr_cube.g_r,
+        gr_cube.scans["temperature"][rows],
+        filename,
+        rows=rows,
+        title=f"PDF Data of Every {kind.capitalize()} Scan",
+        waterfall_offset=waterfall_offset,
+    )
+
+
+def plot_gr_heatmap(
+    cube_directory,
+    filename,
+    trajectories=None,
+    trajectory_rows=None,
+    max_rows=1000,
+    max_columns=1500,
+):
+    """
+    Plots the G(r) data of every scan as one image of r(A) vs scan, with tracked peak positions drawn on top.
+    The memory-mapped G(r) matrix is averaged down to at most max_rows x max_columns values (see Gr_Cube.downsample_gr_cube)
+    before it is shown, so the image costs the same to draw however many scans were recorded.
+
+    Args:
+    - cube_directory (str): Directory of the G(r) matrix saved by Gr_Cube.build_gr_cube.
+    - filename (str): Name of the file to save the generated plot as a PNG.
+    - trajectories (array): Tracked peak matrix (scans x tracked peaks) of peak positions in Angstroms (see Peak_Tracking.track_peaks), or None.
+    - trajectory_rows (array): Row of the G(r) matrix of each scan of trajectories.
+    - max_rows (int): Maximum number of rows of the displayed image.
+    - max_columns (int): Maximum number of columns of the displayed image.
+
+    Returns:
+    - filename (str): Name of the saved PNG file.
+    """
+    gr_cube = load_gr_cube(cube_directory)
+    heatmap, _, _ = downsample_gr_cube(gr_cube.g_r, max_rows, max_columns)
+    n_scans = len(gr_cube.scans)
+
+    fig = Figure(figsize=(12, 8))
+    ax = fig.add_subplot()
+    # Clip the color scale to the 99th percentile of |G(r)| so that the first peaks do not wash out the rest.
+    color_limit = np.percentile(np.abs(heatmap), 99)
+    image = ax.imshow(
+        heatmap,
+        aspect="auto",
+        origin="lower",
+        extent=(gr_cube.r[0], gr_cube.r[-1], -0.5, n_scans - 0.5),
+        cmap="RdBu_r",
+        vmin=-color_limit,
+        vmax=color_limit,
+        interpolation="nearest",
+    )
+    fig.colorbar(image, ax=ax, label="G(r)")
+
+    if trajectories is not None:
+        # Missing positions (NaN) break each track into separate runs.
+        tracks = LineCollection(
+            np.stack(
+                (
+                    trajectories.T,
+                    np.broadcast_to(trajectory_rows, trajectories.T.shape),
+                ),
+                axis=2,
+            ),
+            colors="k",
+            linewidths=0.6,
+        )
+        ax.add_collection(tracks, autolim=False)
+
+    # Label scans by their recorded temperatures.
+    tick_rows = np.linspace(0, n_scans - 1, min(n_scans, 10)).round().astype(int)
+    ax.set_yticks(
+        tick_rows,
+        [
+            f"{temperature:.0f}"
+            for temperature in gr_cube.scans["temperature"][tick_rows]
+        ],
+    )
+    ax.set_title("G(r) of Every Scan with Tracked Peak Positions", fontsize=16)
+    ax.set_xlabel("r (\u00C5)", fontsize=14)
+    ax.set_ylabel("Temperature (\u00B0C), in order of recording", fontsize=14)
+    fig.savefig(filename, format="png")
 
-    plt.title("PDF Data (0 to 5 Angstroms) at Increasing Temperatures", fontsize=16)
-    plt.xlabel("r (\u00C5)", fontsize=14)
-    plt.ylabel("G(r)", fontsize=14)
-    plt.grid(True)
-    plt.xlim(0, 5)
-    plt.legend()
-    plt.savefig(filename, format="png")
-    plt.close()  # Close the plot to release memory
+    return filename
 
 
 def Plot_multiple_PDFs():
@@ -116,13 +306,14 @@ def Plot_multiple_PDFs():
         total_plot_filename,
     )
 
-    # Call plot_zoomed_peaks with the four datasets for the zoomed-in plot.
+    # Call plot_zoomed_peaks with the four datasets for the zoomed-in plot, labelling bonds listed in bond_ranges.txt.
     zoomed_plot_filename = "../data/images/zoomed_peaks_and_PDFs.png"
     plot_zoomed_peaks(
         [r1, r2, r3, r4],
         [g_r1, g_r2, g_r3, g_r4],
         ["30\u00B0C", "300\u00B0C", "600\u00B0C", "1000\u00B0C"],
         zoomed_plot_filename,
+        bond_labeller=BondLabeller(r1, load_bond_ranges("../data", "bond_ranges.txt")),
     )
 
     return (
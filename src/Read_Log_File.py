@@ -11,7 +11,36 @@ This script reads the log.txt file and extracts relevant details of experiment p
 
 import os
 import re
+import tempfile
 from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+# Scan name, scan index, time, temperature, and i00 of a PDF measurement, captured in one pass.
+LOG_ENTRY_PATTERN = re.compile(
+    r"(?P<scan_name>Synthetic_CSH_pdf\S*) (?P<index>\d+) at [^\n]*?"
+    r"\b(?P<hours>\d\d):(?P<minutes>\d\d):(?P<seconds>\d\d)\b[^\n]*?"
+    r" T = (?P<temperature>\S+) C, i00= (?P<i00>[^\s,]+)"
+)
+
+# Ramp scans are named after their start and end temperatures, dwell scans after their temperature.
+SCAN_NAME_PATTERN = re.compile(r"Synthetic_CSH_pdf_(?:ramp_(\d+)_(\d+)|(\d+)degC)")
+
+# Number of bytes at the start of a log file used to recognize it when resuming.
+LOG_HEAD_SIZE = 256
+
+
+class LogEntry(NamedTuple):
+    """
+    A PDF measurement recorded in a log file.
+    """
+
+    scan_name: str
+    index: int
+    seconds: int
+    temperature: float
+    i00: float
 
 
 def extract_time_temp_data(file_directory, file_to_read):
@@ -108,3 +137,249 @@ def round_to_tens_place(unrounded_value):
     """
 
     return round(unrounded_value, -1)
+
+
+def extract_log_records(file_directory, file_to_read):
+    """
+    Read a log file and extract every PDF measurement into one NumPy structured array.
+    This is a columnar alternative to extract_time_temp_data; records can be sorted, masked, and indexed by field.
+    Args:
+        file_directory = Directory in which the file_to_read is stored.
+        file_to_read: File to be parsed/read.
+    Returns:
+        NumPy structured array with fields scan_name, kind ("ramp" or "dwell"), setpoint_from, setpoint_to, repeat, seconds,
+        temperature, rounded_temperature, and i00, one record per measurement in the order recorded.
+    """
+    with open(os.path.join(file_directory, file_to_read)) as open_file:
+        log_fields = LOG_ENTRY_PATTERN.findall(open_file.read())
+
+    return log_records_from_fields(log_fields)
+
+
+def log_records_from_fields(log_fields):
+    """
+    Convert the text captured by LOG_ENTRY_PATTERN into a NumPy structured array.
+    Times, temperatures, and rounding are converted column by column; scan names are only interpreted once per distinct name.
+    Args:
+        log_fields: List of tuples of captured text (scan name, index, hours, minutes, seconds, temperature, i00).
+    Returns:
+        NumPy structured array of log records (see extract_log_records).
+    """
+    log_fields = np.array(log_fields, dtype=str).reshape(-1, 7)
+    scan_names = log_fields[:, 0]
+    unique_scan_names, scan_name_indices = np.unique(scan_names, return_inverse=True)
+
+    # Kind and setpoints of each distinct scan name; -1 marks an unrecognized name.
+    kinds = np.full(len(unique_scan_names), "", dtype="U5")
+    setpoints = np.full((len(unique_scan_names), 2), -1, dtype=np.int32)
+    for i, scan_name in enumerate(unique_scan_names):
+        scan_name_match = SCAN_NAME_PATTERN.fullmatch(scan_name)
+        if scan_name_match is None:
+            continue
+        ramp_from, ramp_to, dwell = scan_name_match.groups()
+        if dwell is None:
+            kinds[i] = "ramp"
+            setpoints[i] = int(ramp_from), int(ramp_to)
+        else:
+            kinds[i] = "dwell"
+            setpoints[i] = int(dwell), int(dwell)
+
+    log_records = np.empty(
+        len(log_fields),
+        dtype=[
+            ("scan_name", f"U{max(scan_names.dtype.itemsize // 4, 1)}"),
+            ("kind", "U5"),
+            ("setpoint_from", np.int32),
+            ("setpoint_to", np.int32),
+            ("repeat", np.int32),
+            ("seconds", np.int64),
+            ("temperature", np.float64),
+            ("rounded_temperature", np.float64),
+            ("i00", np.float64),
+        ],
+    )
+    log_records["scan_name"] = scan_names
+    log_records["kind"] = kinds[scan_name_indices]
+    log_records["setpoint_from"] = setpoints[scan_name_indices, 0]
+    log_records["setpoint_to"] = setpoints[scan_name_indices, 1]
+    log_records["repeat"] = log_fields[:, 1].astype(np.int32)
+    log_records["seconds"] = log_fields[:, 2:5].astype(np.int64) @ [3600, 60, 1]
+    log_records["temperature"] = log_fields[:, 5].astype(np.float64)
+    log_records["rounded_temperature"] = np.round(log_records["temperature"], -1)
+    log_records["i00"] = log_fields[:, 6].astype(np.float64)
+
+    return log_records
+
+
+def parse_log_entries(log_text):
+    """
+    Extract every PDF measurement from a block of log text with a single precompiled regular expression.
+    Args:
+        log_text: One or more complete lines of a log file.
+    Returns:
+        List of LogEntry, in the order they are recorded.
+    """
+    return [
+        LogEntry(
+            log_entry["scan_name"],
+            int(log_entry["index"]),
+            int(log_entry["hours"]) * 3600
+            + int(log_entry["minutes"]) * 60
+            + int(log_entry["seconds"]),
+            float(log_entry["temperature"]),
+            float(log_entry["i00"]),
+        )
+        for log_entry in LOG_ENTRY_PATTERN.finditer(log_text)
+    ]
+
+
+class IncrementalLogParser:
+    """
+    Resumable parser of a log file that is still being written.
+    Each call to update() parses only the complete lines appended since the previous call.
+    The byte offset and the entries parsed so far can be saved to, and resumed from, a checkpoint file.
+    """
+
+    def __init__(self, log_file_path, checkpoint_path=None):
+        """
+        Args:
+            log_file_path: Path to the log file.
+            checkpoint_path: Path to the .npz checkpoint file; None keeps the state in memory only.
+        """
+        self.log_file_path = log_file_path
+        self.checkpoint_path = checkpoint_path
+        self.reset()
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self.load_checkpoint()
+
+    def reset(self):
+        """
+        Forget all parsed entries and start again from the beginning of the log file.
+        """
+        self.offset = 0
+        self.log_head = b""
+        # Parsed entries are stored column by column (one list per LogEntry field).
+        self.columns = {field: [] for field in LogEntry._fields}
+
+    def update(self):
+        """
+        Parse the complete lines appended to the log file since the last update.
+        A log file that is shorter than the saved offset or starts differently is parsed again from the start.
+        Returns:
+            List of the new LogEntry.
+        """
+        with open(self.log_file_path, "rb") as open_file:
+            log_head = open_file.read(LOG_HEAD_SIZE)
+            file_size = open_file.seek(0, os.SEEK_END)
+            if file_size < self.offset or not log_head.startswith(self.log_head):
+                self.reset()
+            open_file.seek(self.offset)
+            new_bytes = open_file.read()
+
+        # Leave an unterminated last line for the next update.
+        complete_bytes = new_bytes[: new_bytes.rfind(b"\n") + 1]
+        self.offset += len(complete_bytes)
+        self.log_head = log_head[: min(self.offset, LOG_HEAD_SIZE)]
+
+        new_entries = parse_log_entries(
+            complete_bytes.decode("utf-8", errors="replace")
+        )
+        for field, values in zip(LogEntry._fields, zip(*new_entries)):
+            self.columns[field].extend(values)
+
+        return new_entries
+
+    def __len__(self):
+        return len(self.columns["seconds"])
+
+    def time_temp_data(self):
+        """
+        Return parsed data in the same format as extract_time_temp_data.
+        Returns:
+            List of times, list of temperatures, list of rounded temperatures at which PDF data was recorded.
+        """
+        recorded_times_from_experiment = list(self.columns["seconds"])
+        recorded_temperatures_from_experiment = list(self.columns["temperature"])
+        rounded_temperatures = list(
+            map(round_to_tens_place, recorded_temperatures_from_experiment)
+        )
+
+        return (
+            recorded_times_from_experiment,
+            recorded_temperatures_from_experiment,
+            rounded_temperatures,
+        )
+
+    def save_checkpoint(self):
+        """
+        Save the byte offset, the start of the log file, and all parsed entries.
+        The checkpoint is written under a temporary name and then renamed, so an interrupted save leaves the old checkpoint intact.
+        """
+        if self.checkpoint_path is None:
+            raise ValueError(
+                "This parser has no checkpoint_path; pass one to IncrementalLogParser to save checkpoints."
+            )
+        checkpoint_directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=checkpoint_directory, suffix=".npz"
+        )
+        with os.fdopen(file_descriptor, "wb") as temporary_file:
+            np.savez(temporary_file, **self.checkpoint_arrays())
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def load_checkpoint(self):
+        """
+        Resume from the state saved by save_checkpoint.
+        """
+        with np.load(self.checkpoint_path) as checkpoint:
+            self.restore_checkpoint_arrays(checkpoint)
+
+    def checkpoint_arrays(self):
+        """
+        State of the parser as NumPy arrays, so that it can be saved with other state in one .npz file.
+        Returns:
+            Dictionary within which keys are array names and values are NumPy arrays.
+        """
+        return {
+            "offset": np.int64(self.offset),
+            "log_head": np.frombuffer(self.log_head, dtype=np.uint8),
+            "scan_name": np.array(self.columns["scan_name"], dtype=str),
+            "index": np.array(self.columns["index"], dtype=np.int64),
+            "seconds": np.array(self.columns["seconds"], dtype=np.int64),
+            "temperature": np.array(self.columns["temperature"], dtype=np.float64),
+            "i00": np.array(self.columns["i00"], dtype=np.float64),
+        }
+
+    def restore_checkpoint_arrays(self, checkpoint):
+        """
+        Resume from the arrays returned by checkpoint_arrays.
+        Args:
+            checkpoint: Mapping of array names to NumPy arrays (e.g., a loaded .npz file).
+        """
+        self.offset = int(checkpoint["offset"])
+        self.log_head = checkpoint["log_head"].tobytes()
+        self.columns = {field: checkpoint[field].tolist() for field in LogEntry._fields}
+
+
+def extract_time_temp_data_incremental(file_directory, file_to_read, checkpoint_file):
+    """
+    Equivalent of extract_time_temp_data that only parses lines appended since the previous call.
+    Text parsing is incremental, but every call still loads all entries saved in the checkpoint (and rewrites the checkpoint when new
+    lines were read), so a call costs time proportional to the length of the log, only with a much smaller constant than parsing it.
+    Args:
+        file_directory = Directory in which the file_to_read and checkpoint_file are stored.
+        file_to_read: File to be parsed/read.
+        checkpoint_file: .npz file in which the parsing state is saved between calls.
+    Returns:
+        List of times, list of temperatures, list of rounded temperatures at which PDF data was recorded.
+    """
+    log_parser = IncrementalLogParser(
+        os.path.join(file_directory, file_to_read),
+        os.path.join(file_directory, checkpoint_file),
+    )
+    saved_offset = log_parser.offset
+    # The checkpoint is only rewritten when new lines were read, or when the log file had to be parsed again from the start.
+    if log_parser.update() or log_parser.offset != saved_offset:
+        log_parser.save_checkpoint()
+
+    return log_parser.time_temp_data()
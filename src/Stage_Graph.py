@@ -0,0 +1,374 @@
+"""
+Stage_Graph
+
+Author: Debra Keiser
+Date Modified: 17OCT2026
+
+Description:
+This script runs an analysis as a graph of named stages whose outputs are cached by content.
+Each stage lists the stages it depends on, the files it reads, and the files it writes. A stage key is a hash of the stage code (including the code it calls) and parameters,
+the contents of its input files, and the keys of its dependencies, so a stage only reruns when something upstream changed.
+Outputs of every key are kept in a cache directory and restored instead of recomputed when a key is seen again.
+"""
+
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+from typing import Callable, NamedTuple
+
+MANIFEST_NAME = "current.json"
+
+
+class Stage(NamedTuple):
+    """
+    One step of an analysis.
+    name: Name of the stage.
+    run: Function that writes the outputs of the stage, called with the parameters of the stage as arguments.
+    dependencies: Names of the stages whose outputs this stage reads.
+    inputs: Paths to files or directories read by this stage that no stage writes.
+    outputs: Paths to files or directories written by this stage.
+    parameters: Arguments passed to run; their repr is part of the stage key, so changing them reruns the stage.
+    """
+
+    name: str
+    run: Callable[..., None]
+    dependencies: tuple = ()
+    inputs: tuple = ()
+    outputs: tuple = ()
+    parameters: tuple = ()
+
+
+def hash_path(path):
+    """
+    Hash the content of a file, or of every file in a directory (hidden files and directories are skipped).
+    Args:
+        path: Path to a file or directory.
+    Returns:
+        Hexadecimal SHA-256 digest; missing paths hash to a fixed value.
+    """
+    content_hash = hashlib.sha256()
+    if os.path.isdir(path):
+        for directory, subdirectories, filenames in os.walk(path):
+            subdirectories[:] = sorted(
+                name for name in subdirectories if not name.startswith(".")
+            )
+            for filename in sorted(filenames):
+                if filename.startswith("."):
+                    continue
+                file_path = os.path.join(directory, filename)
+                content_hash.update(os.path.relpath(file_path, path).encode())
+                content_hash.update(hash_path(file_path).encode())
+    elif os.path.isfile(path):
+        with open(path, "rb") as open_file:
+            for block in iter(lambda: open_file.read(1 << 20), b""):
+                content_hash.update(block)
+    else:
+        content_hash.update(b"missing")
+
+    return content_hash.hexdigest()
+
+
+def stage_code(stage):
+    """
+    Source code of a stage function and of the code it calls, so that editing a stage or any function it uses changes its key.
+    Functions defined in the module of the stage function contribute their own source; every other module of the same directory
+    that they use contributes its whole source file, together with the modules of that directory it imports (see source_dependencies).
+    Functions without source (e.g., builtins) contribute their name.
+    """
+    try:
+        code = [inspect.getsource(stage.run)]
+    except (OSError, TypeError):
+        return getattr(stage.run, "__qualname__", repr(stage.run))
+
+    stage_sources, module_files = source_dependencies(stage.run)
+    code.extend(stage_sources)
+    for module_file in sorted(module_files):
+        with open(module_file) as open_file:
+            code.append(open_file.read())
+
+    return "\n".join(code)
+
+
+def source_dependencies(function):
+    """
+    Find the code a function uses among the modules in the directory of the module that defines it.
+    Args:
+        function: Function defined in a module with a source file.
+    Returns:
+        List of the sources of the functions and classes (and reprs of the constants) of the defining module that function uses,
+        directly or through other functions of that module; set of paths to the source files of the other modules of the directory
+        used by those functions, directly or through the imports of these modules.
+    """
+    stage_module = inspect.getmodule(function)
+    module_directory = os.path.dirname(os.path.abspath(stage_module.__file__))
+    stage_sources = []
+    module_files = set()
+    visited_names = set()
+
+    def defining_module(value):
+        module = value if inspect.ismodule(value) else inspect.getmodule(value)
+        module_file = getattr(module, "__file__", None)
+        if module_file is None:
+            return None
+        if os.path.dirname(os.path.abspath(module_file)) != module_directory:
+            return None
+        return module
+
+    def visit_module(module):
+        module_file = os.path.abspath(module.__file__)
+        if module_file in module_files:
+            return
+        module_files.add(module_file)
+        for value in vars(module).values():
+            imported_module = defining_module(value)
+            if imported_module is not None:
+                visit_module(imported_module)
+
+    def visit_code(code):
+        for name in sorted(referenced_names(code) - visited_names):
+            visited_names.add(name)
+            if name not in vars(stage_module):
+                continue
+            value = vars(stage_module)[name]
+            if isinstance(value, (str, int, float, tuple)):
+                stage_sources.append(f"{name} = {value!r}")
+                continue
+            module = defining_module(value)
+            if module is None:
+                continue
+            if module is not stage_module:
+                visit_module(module)
+            elif inspect.isfunction(value):
+                stage_sources.append(inspect.getsource(value))
+                visit_code(value.__code__)
+            elif inspect.isclass(value):
+                stage_sources.append(inspect.getsource(value))
+                for attribute in vars(value).values():
+                    if inspect.isfunction(attribute):
+                        visit_code(attribute.__code__)
+
+    visit_code(function.__code__)
+
+    return stage_sources, module_files
+
+
+def referenced_names(code):
+    """
+    Global (and attribute) names referenced by a code object and the code objects nested in it (e.g., lambdas and inner functions).
+    """
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if inspect.iscode(constant):
+            names |= referenced_names(constant)
+
+    return names
+
+
+class StageGraph:
+    """
+    Dependency graph of stages with content-addressed cached outputs.
+    """
+
+    def __init__(self, stages, cache_directory, snapshots_per_stage=3):
+        """
+        Args:
+            stages: Iterable of Stage.
+            cache_directory: Directory in which manifests and cached outputs are kept.
+            snapshots_per_stage: Number of cached output sets kept for every stage (the most recently used are kept).
+        """
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Stage {stage.name} is defined twice.")
+            self.stages[stage.name] = stage
+        for stage in self.stages.values():
+            for dependency in stage.dependencies:
+                if dependency not in self.stages:
+                    raise ValueError(
+                        f"Stage {stage.name} depends on unknown stage {dependency}."
+                    )
+        self.cache_directory = cache_directory
+        self.snapshots_per_stage = snapshots_per_stage
+
+    def execution_order(self, targets):
+        """
+        List the stages needed to build the targets, each after its dependencies.
+        Args:
+            targets: Names of the stages to build.
+        Returns:
+            List of stage names.
+        """
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name not in self.stages:
+                raise KeyError(f"Unknown stage {name}.")
+            if name in visiting:
+                raise ValueError(f"Stage {name} depends on itself.")
+            visiting.add(name)
+            for dependency in self.stages[name].dependencies:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+
+        return order
+
+    def stage_keys(self, targets):
+        """
+        Compute the key of every stage needed to build the targets.
+        Args:
+            targets: Names of the stages to build.
+        Returns:
+            Dictionary within which keys are stage names and values are hexadecimal keys.
+        """
+        keys = {}
+        for name in self.execution_order(targets):
+            stage = self.stages[name]
+            stage_hash = hashlib.sha256()
+            stage_hash.update(name.encode())
+            stage_hash.update(stage_code(stage).encode())
+            stage_hash.update(repr(stage.parameters).encode())
+            for dependency in stage.dependencies:
+                stage_hash.update(keys[dependency].encode())
+            for input_path in stage.inputs:
+                stage_hash.update(hash_path(input_path).encode())
+            keys[name] = stage_hash.hexdigest()
+
+        return keys
+
+    def run(self, targets, force=()):
+        """
+        Build the targets, running only the stages whose keys have no cached outputs.
+        Args:
+            targets: Names of the stages to build.
+            force: Names of stages to rerun even if their outputs are cached.
+        Returns:
+            List of (stage name, status) in execution order; status is "current" (outputs already in place),
+            "restored" (outputs copied from the cache), or "ran".
+        """
+        statuses = []
+        keys = self.stage_keys(targets)
+        for name in self.execution_order(targets):
+            stage = self.stages[name]
+            if name in force:
+                status = "ran"
+            elif self.outputs_are_current(stage, keys[name]):
+                status = "current"
+            elif self.restore_outputs(stage, keys[name]):
+                status = "restored"
+            else:
+                status = "ran"
+
+            if status == "ran":
+                stage.run(*stage.parameters)
+                self.save_outputs(stage, keys[name])
+            if status != "current":
+                self.write_manifest(stage, keys[name])
+            statuses.append((name, status))
+
+        return statuses
+
+    def stage_directory(self, stage, key=None):
+        """
+        Cache directory of a stage, or of one of its keys.
+        """
+        stage_directory = os.path.join(self.cache_directory, stage.name)
+        if key is None:
+            return stage_directory
+
+        return os.path.join(stage_directory, key)
+
+    def outputs_are_current(self, stage, key):
+        """
+        Check whether the outputs in place were written (or restored) for a key and have not changed since.
+        """
+        manifest_path = os.path.join(self.stage_directory(stage), MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return False
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+
+        return manifest["key"] == key and all(
+            manifest["outputs"].get(output) == hash_path(output)
+            for output in stage.outputs
+        )
+
+    def save_outputs(self, stage, key):
+        """
+        Copy the outputs of a stage into the cache under its key.
+        """
+        snapshot_directory = self.stage_directory(stage, key)
+        shutil.rmtree(snapshot_directory, ignore_errors=True)
+        os.makedirs(snapshot_directory)
+        for i, output in enumerate(stage.outputs):
+            if os.path.isdir(output):
+                shutil.copytree(output, os.path.join(snapshot_directory, str(i)))
+            elif os.path.isfile(output):
+                shutil.copy2(output, os.path.join(snapshot_directory, str(i)))
+        self.prune_snapshots(stage)
+
+    def restore_outputs(self, stage, key):
+        """
+        Copy the cached outputs of a key back into place.
+        Returns:
+            True if every output was restored.
+        """
+        snapshot_directory = self.stage_directory(stage, key)
+        snapshots = [
+            os.path.join(snapshot_directory, str(i)) for i in range(len(stage.outputs))
+        ]
+        if not stage.outputs or not all(map(os.path.exists, snapshots)):
+            return False
+
+        for snapshot, output in zip(snapshots, stage.outputs):
+            if os.path.isdir(output):
+                shutil.rmtree(output)
+            if os.path.isdir(snapshot):
+                shutil.copytree(snapshot, output)
+            else:
+                os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+                shutil.copy2(snapshot, output)
+        # Mark the snapshot as recently used.
+        os.utime(snapshot_directory)
+
+        return True
+
+    def write_manifest(self, stage, key):
+        """
+        Record the key and output hashes of the outputs now in place.
+        """
+        manifest = {
+            "key": key,
+            "outputs": {output: hash_path(output) for output in stage.outputs},
+        }
+        os.makedirs(self.stage_directory(stage), exist_ok=True)
+        with open(
+            os.path.join(self.stage_directory(stage), MANIFEST_NAME), "w"
+        ) as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+    def prune_snapshots(self, stage):
+        """
+        Delete all but the most recently used cached output sets of a stage.
+        """
+        stage_directory = self.stage_directory(stage)
+        snapshot_directories = sorted(
+            (
+                os.path.join(stage_directory, name)
+                for name in os.listdir(stage_directory)
+                if os.path.isdir(os.path.join(stage_directory, name))
+            ),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        for snapshot_directory in snapshot_directories[self.snapshots_per_stage :]:
+            shutil.rmtree(snapshot_directory, ignore_errors=True)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from src.Bond_Labels import (
+    BondLabeller,
+    BondRangeIndex,
+    extract_peak_labels,
+    load_bond_ranges,
+)
+from src.Extract_Data import extract_pdf_data
+
+
+def test_extract_peak_labels():
+    """Check that peaks of the 30 degC PDF are labelled with the bonds whose length ranges contain them."""
+    r, g_r = extract_pdf_data("data/gr_files", "Synthetic_CSH_030degC_normalized.gr")
+    labels = extract_peak_labels(r, g_r)
+
+    assert [bond for bond, _ in labels] == ["Si-O", "Ca-O", "O-O", "Si-Si"]
+    for (_, bond_length), g_r_value in labels.items():
+        assert g_r_value == g_r[np.flatnonzero(r == bond_length)[0]]
+
+
+def test_bond_labeller():
+    """Check that labels of many curves are found in one pass and cached per curve."""
+    r = np.round(np.arange(0, 60.01, 0.01), 2)
+    g_r_matrix = np.zeros((2, len(r)))
+    g_r_matrix[0, [160, 240, 400]] = 1.0  # Si-O, Ca-O, unlabelled
+    g_r_matrix[1, [170, 310]] = 2.0  # Si-O (upper edge), Si-Si
+    labeller = BondLabeller(r)
+    labels_list = labeller.label_curves(g_r_matrix)
+
+    assert list(labels_list[0]) == [("Si-O", 1.6), ("Ca-O", 2.4)]
+    assert list(labels_list[1]) == [("Si-O", 1.7), ("Si-Si", 3.1)]
+    assert labeller.label_curves([g_r_matrix[1]])[0] is labels_list[1]
+    assert len(labeller.cache) == 2
+    length_indices, bond_indices = labeller.bond_range_index.lookup(
+        [1.49, 1.5, 2.55, 3.2]
+    )
+    assert np.array_equal(length_indices, [1, 3])
+    assert np.array_equal(bond_indices, [0, 3])
+
+
+def test_load_bond_ranges(tmp_path):
+    """Check that the bond range library holds the default ranges and that malformed files are rejected."""
+    assert load_bond_ranges("data", "bond_ranges.txt") == {
+        "Si-O": (1.5, 1.7),
+        "Ca-O": (2.3, 2.5),
+        "O-O": (2.6, 2.7),
+        "Si-Si": (3.0, 3.2),
+    }
+    (tmp_path / "bond_ranges.txt").write_text("# bond,lower,upper\nSi-O,1.7,1.5\n")
+    with pytest.raises(ValueError):
+        load_bond_ranges(tmp_path, "bond_ranges.txt")
+
+
+def test_bond_range_index_overlapping_ranges():
+    """Check that lookups in overlapping ranges find every range containing each length, as a brute-force comparison does."""
+    rng = np.random.default_rng(0)
+    lowers = rng.uniform(1, 10, size=100).round(2)
+    bond_ranges = {
+        f"bond {i}": (lower, lower + width)
+        for i, (lower, width) in enumerate(zip(lowers, rng.uniform(0, 2, size=100)))
+    }
+    bond_lengths = np.concatenate((rng.uniform(0, 12, size=5000), lowers, [np.nan]))
+    length_indices, bond_indices = BondRangeIndex(bond_ranges).lookup(bond_lengths)
+
+    bounds = np.array(list(bond_ranges.values()))
+    contained = (bounds[:, 0] <= bond_lengths[:, None]) & (
+        bond_lengths[:, None] <= bounds[:, 1]
+    )
+    assert np.array_equal(length_indices, np.nonzero(contained)[0])
+    assert np.array_equal(bond_indices, np.nonzero(contained)[1])
+
+
+def test_bond_labeller_overlapping_ranges():
+    """Check that a peak within overlapping ranges receives every matching label."""
+    r = np.round(np.arange(0, 60.01, 0.01), 2)
+    g_r = np.zeros(len(r))
+    g_r[[160, 240]] = 1.0
+    labeller = BondLabeller(
+        r, {"Ca-O": (2.3, 2.5), "Si-O": (1.5, 1.7), "X-O": (1.6, 2.4)}
+    )
+
+    assert list(labeller.label_curves([g_r])[0]) == [
+        ("Ca-O", 2.4),
+        ("Si-O", 1.6),
+        ("X-O", 1.6),
+        ("X-O", 2.4),
+    ]
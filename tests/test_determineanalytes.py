@@ -1,6 +1,7 @@
 from src.Determine_Analytes import (
     divide_by_100,
     get_analyte_data,
+    get_analyte_data_linear,
     list_item_differences,
     times_of_target_occurrence,
 )
@@ -43,3 +44,31 @@ def test_list_item_differences():
     differences_list = list_item_differences([5, 32, 108])
 
     assert differences_list == [0, 27, 103]
+
+
+def test_get_analyte_data_linear():
+    """Check that the linear-time implementation returns the same analytes as get_analyte_data."""
+    (
+        recorded_times_from_experiment,
+        recorded_temperatures_from_experiment,
+        rounded_temperatures,
+    ) = extract_time_temp_data("data/", "log.txt")
+
+    assert get_analyte_data_linear(
+        recorded_times_from_experiment,
+        recorded_temperatures_from_experiment,
+        rounded_temperatures,
+    ) == get_analyte_data(
+        recorded_times_from_experiment,
+        recorded_temperatures_from_experiment,
+        rounded_temperatures,
+    )
+
+    # 200 only occurs between two occurrences of 100, so get_analyte_data never visits it.
+    mock_data = (
+        [0, 50, 120, 500, 620],
+        [101, 204, 99, 301, 298],
+        [100, 200, 100, 300, 300],
+    )
+    assert get_analyte_data_linear(*mock_data) == get_analyte_data(*mock_data)
+    assert get_analyte_data_linear(*mock_data) == ([0, 50, 500], [101, 204, 301])
@@ -3,7 +3,17 @@ import re
 
 import numpy as np
 
-from src.Extract_Data import rescale_g_r
+from src.Extract_Data import (
+    extract_pdf_data,
+    get_gr_files,
+    locate_peaks,
+    locate_peaks_batch,
+    plan_gr_jobs,
+    read_gr_file,
+    refine_peaks,
+    rescale_g_r,
+)
+from src.Read_Log_File import extract_time_temp_data
 
 
 def test_extract_pdf_data():
@@ -47,3 +57,125 @@ def test_rescale_g_r():
     rescaled_g_r = rescale_g_r(g_r)
 
     assert rescaled_g_r[164] == 0.278468
+    assert rescale_g_r(g_r, in_place=True) is g_r
+    assert np.array_equal(g_r, rescaled_g_r)
+
+
+def test_extract_pdf_data_dtype():
+    """Check that float32 G(r) data match float64 data to single precision and that all files share one read-only r-axis."""
+    r, g_r = extract_pdf_data(
+        "data/gr_files", "Synthetic_CSH_CSH_pdf_ramp_100_04_normalized.gr"
+    )
+    r32, g_r32 = extract_pdf_data(
+        "data/gr_files",
+        "Synthetic_CSH_CSH_pdf_ramp_100_04_normalized.gr",
+        dtype=np.float32,
+    )
+    other_r, _ = extract_pdf_data(
+        "data/gr_files", "Synthetic_CSH_030degC_normalized.gr"
+    )
+
+    assert g_r.dtype == np.float64 and g_r32.dtype == np.float32
+    assert np.allclose(g_r32, g_r, rtol=1e-6, atol=1e-7)
+    assert r.dtype == np.float64 and r32 is r and other_r is r
+    assert not r.flags.writeable
+
+
+def test_read_gr_file():
+    """Check that the bulk reader returns the same values as parsing the file line-by-line."""
+    gr_file_path = os.path.join("data/gr_files", "Synthetic_CSH_300degC_normalized.gr")
+    with open(gr_file_path) as open_gr_file:
+        individual_lines = open_gr_file.readlines()
+    for line in individual_lines:
+        if re.search(r"#### start data", line) is not None:
+            start_data = individual_lines.index(line)
+    data = np.array(
+        [line.split() for line in individual_lines[start_data + 3 :]], dtype=float
+    ).T
+
+    r, g_r = read_gr_file(gr_file_path)
+
+    assert np.array_equal(r, data[0])
+    assert np.array_equal(g_r, data[1])
+
+
+def test_get_gr_files_parallel():
+    """Check that parallel processing returns the same peaks in the same key order as serial processing."""
+    _, _, rounded_temperatures = extract_time_temp_data("data/", "log.txt")
+
+    serial_ramp, serial_dwell = get_gr_files(
+        rounded_temperatures, file_directory="data/gr_files"
+    )
+    parallel_ramp, parallel_dwell = get_gr_files(
+        rounded_temperatures, workers=2, file_directory="data/gr_files"
+    )
+
+    assert list(parallel_ramp) == list(serial_ramp)
+    assert list(parallel_dwell) == list(serial_dwell)
+    for key in serial_ramp:
+        assert np.array_equal(parallel_ramp[key], serial_ramp[key])
+    for key in serial_dwell:
+        assert np.array_equal(parallel_dwell[key], serial_dwell[key])
+
+
+def test_plan_gr_jobs():
+    """Check that the planned .gr files are listed in order without reading any data."""
+    _, _, rounded_temperatures = extract_time_temp_data("data/", "log.txt")
+    gr_jobs = plan_gr_jobs(rounded_temperatures, "missing_directory")
+
+    assert len(gr_jobs) == 107
+    assert gr_jobs[0].key == "30" and gr_jobs[0].kind == "dwell"
+    assert gr_jobs[0].filepath == os.path.join(
+        "missing_directory", "Synthetic_CSH_030degC_normalized.gr"
+    )
+    assert [gr_job.key for gr_job in gr_jobs[7:9]] == ["100_06", "100"]
+    assert gr_jobs[-1].key == "1000_09" and gr_jobs[-1].kind == "ramp"
+
+
+def test_locate_peaks_batch():
+    """Check that batched peak finding returns the same peaks as locate_peaks, including flat-topped peaks."""
+    gr_files = sorted(
+        gr_file for gr_file in os.listdir("data/gr_files") if gr_file.endswith(".gr")
+    )[:10]
+    g_r_matrix = np.array(
+        [
+            read_gr_file(os.path.join("data/gr_files", gr_file))[1]
+            for gr_file in gr_files
+        ]
+    )
+    g_r_matrix[0, 500:504] = g_r_matrix[0, 500:504].max() + 1.0
+    g_r_matrix[1, 2998:3010] = 5.0
+
+    peak_indices, offsets = locate_peaks_batch(g_r_matrix, chunk_rows=3)
+
+    assert len(offsets) == len(g_r_matrix) + 1
+    assert 501 in peak_indices[offsets[0] : offsets[1]]
+    for i, g_r in enumerate(g_r_matrix):
+        assert np.array_equal(
+            peak_indices[offsets[i] : offsets[i + 1]], locate_peaks(g_r)
+        )
+
+
+def test_refine_peaks():
+    """Check that refined positions, heights, and widths recover those of sampled Gaussian peaks."""
+    x = np.arange(400.0)
+    positions = np.array([100.3, 200.7, 300.1])
+    sigmas = np.array([4.0, 6.0, 3.0])
+    heights = np.array([1.0, 2.0, 0.5])
+    g_r_matrix = np.sum(
+        heights[:, None]
+        * np.exp(-((x - positions[:, None]) ** 2) / (2 * sigmas[:, None] ** 2)),
+        axis=0,
+    )[None]
+    peak_indices, offsets = np.array([100, 201, 300]), np.array([0, 3])
+    widths = 2 * np.sqrt(2 * np.log(2)) * sigmas
+
+    parabolic_peaks = refine_peaks(g_r_matrix, peak_indices, offsets)
+    assert np.allclose(parabolic_peaks["position"], positions, atol=0.01)
+    assert np.allclose(parabolic_peaks["height"], heights, atol=0.001)
+    assert np.allclose(parabolic_peaks["width"], widths, rtol=0.02)
+
+    fitted_peaks = refine_peaks(g_r_matrix, peak_indices, offsets, gaussian_fit=True)
+    assert np.allclose(fitted_peaks["position"], positions)
+    assert np.allclose(fitted_peaks["height"], heights)
+    assert np.allclose(fitted_peaks["width"], widths)
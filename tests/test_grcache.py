@@ -0,0 +1,35 @@
+import os
+import shutil
+
+import numpy as np
+
+from src.Extract_Data import read_gr_file
+from src.Gr_Cache import cache_file_path, load_gr_data
+
+
+def fail_to_parse(gr_file_path):
+    raise AssertionError(f"{gr_file_path} should have been read from the cache.")
+
+
+def test_load_gr_data(tmp_path):
+    """Check that unchanged files are read from the cache and changed files are parsed again."""
+    gr_file_path = str(tmp_path / "Synthetic_CSH_200degC_normalized.gr")
+    shutil.copy("data/gr_files/Synthetic_CSH_200degC_normalized.gr", gr_file_path)
+
+    r, g_r = load_gr_data(gr_file_path, read_gr_file)
+    assert os.path.exists(cache_file_path(gr_file_path))
+
+    # Same path, modification time, and size.
+    cached_r, cached_g_r = load_gr_data(gr_file_path, fail_to_parse)
+    assert np.array_equal(cached_r, r) and np.array_equal(cached_g_r, g_r)
+
+    # New modification time, same content.
+    os.utime(gr_file_path, ns=(0, 0))
+    cached_r, cached_g_r = load_gr_data(gr_file_path, fail_to_parse)
+    assert np.array_equal(cached_g_r, g_r)
+
+    # New content.
+    with open(gr_file_path, "a") as open_gr_file:
+        open_gr_file.write("60.01 0.5\n")
+    new_r, _ = load_gr_data(gr_file_path, read_gr_file)
+    assert len(new_r) == len(r) + 1
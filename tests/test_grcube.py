@@ -0,0 +1,82 @@
+import numpy as np
+
+from src.Extract_Data import extract_pdf_data
+from src.Gr_Cube import (
+    build_gr_cube,
+    decimate_min_max,
+    downsample_gr_cube,
+    load_gr_cube,
+    read_rows,
+    scan_index,
+    scan_metadata_from_log,
+)
+
+
+def test_scan_metadata_from_log():
+    """Check that every PDF scan in log.txt is described and mapped to its .gr file."""
+    scans = scan_metadata_from_log("data/", "log.txt")
+
+    assert len(scans) == 117
+    assert scans[0]["key"] == "30" and scans[0]["kind"] == "dwell"
+    assert scans[0]["gr_file"] == "Synthetic_CSH_030degC_normalized.gr"
+    assert scans[-1]["key"] == "1000_10" and scans[-1]["temperature"] == 1000.41
+    assert np.all(np.diff(scans["seconds"]) > 0)
+
+
+def test_build_gr_cube(tmp_path):
+    """Check that the stacked G(r) matrix shares one r-axis and matches each .gr file."""
+    scans = scan_metadata_from_log("data/", "log.txt")[:12]
+    build_gr_cube("data/gr_files", scans, tmp_path, dtype=np.float32)
+
+    cube = load_gr_cube(tmp_path)
+    r, g_r = extract_pdf_data("data/gr_files", "Synthetic_CSH_100degC_normalized.gr")
+
+    assert cube.g_r.shape == (12, 6001)
+    assert cube.g_r.dtype == np.float32
+    assert np.array_equal(cube.r, r)
+    assert np.allclose(cube.g_r[scan_index(cube.scans, "dwell", "100")], g_r)
+
+
+def test_decimate_min_max():
+    """Check that decimation keeps the extremes of every bin in order, and leaves short curves whole."""
+    rng = np.random.default_rng(0)
+    g_r_rows = rng.normal(size=(3, 1001))
+    point_indices, decimated_rows = decimate_min_max(g_r_rows, 100)
+
+    assert point_indices.shape == decimated_rows.shape == (3, 2 * 91)
+    assert np.all(np.diff(point_indices, axis=1) >= 0)
+    assert np.array_equal(decimated_rows.max(axis=1), g_r_rows.max(axis=1))
+    assert np.array_equal(decimated_rows.min(axis=1), g_r_rows.min(axis=1))
+    assert np.array_equal(
+        np.sort(decimated_rows[:, :2]), np.sort(g_r_rows[:, :11])[:, [0, -1]]
+    )
+    assert np.array_equal(decimate_min_max(g_r_rows, 600)[1], g_r_rows)
+
+
+def test_downsample_gr_cube():
+    """Check that chunked block averages match averages over the whole matrix, including partial blocks."""
+    g_r_matrix = np.arange(70 * 13, dtype=float).reshape(70, 13)
+    downsampled, row_factor, column_factor = downsample_gr_cube(
+        g_r_matrix, max_rows=20, max_columns=5, chunk_rows=10
+    )
+
+    assert (row_factor, column_factor) == (4, 3)
+    assert downsampled.shape == (18, 5)
+    assert downsampled[0, 0] == g_r_matrix[:4, :3].mean()
+    assert downsampled[-1, -1] == g_r_matrix[68:, 12:].mean()
+    assert np.allclose(downsampled[5, 2], g_r_matrix[20:24, 6:9].mean())
+
+
+def test_read_rows(tmp_path):
+    """Check that consecutive rows of a cube are read as a view of its memory map and other rows as a copy."""
+    build_gr_cube(
+        "data/gr_files", scan_metadata_from_log("data/", "log.txt")[:6], tmp_path
+    )
+    cube = load_gr_cube(tmp_path)
+
+    consecutive_rows = read_rows(cube.g_r, [2, 3, 4])
+    scattered_rows = read_rows(cube.g_r, [4, 0])
+    assert np.shares_memory(consecutive_rows, cube.g_r)
+    assert not np.shares_memory(scattered_rows, cube.g_r)
+    assert np.array_equal(consecutive_rows, cube.g_r[[2, 3, 4]])
+    assert np.array_equal(scattered_rows, cube.g_r[[4, 0]])
@@ -1,10 +1,20 @@
 import numpy as np
 
-from src.Extract_Data import extract_pdf_data
+from src.Extract_Data import extract_pdf_data, locate_peaks
+from src.Gr_Cube import build_gr_cube, scan_metadata_from_log
 from src.Integrate_Peaks import (
+    campaign_integral_matrix,
+    integral_difference_matrix,
+    integrate_peak_areas,
+    integrate_peak_areas_batch,
+    match_peaks,
     peak_integral_differences,
+    peak_minimum_bounds,
+    scale_integral_matrix,
     scale_peak_integrals,
+    subtract_integrals,
 )
+from src.Peak_Store import open_peaks
 
 
 def test_integrate_peak_areas():
@@ -59,3 +69,106 @@ def test_peak_integral_differences():
 
     assert mock_reference_peak_positions_list == [150, 300]
     assert len(mock_peak_integrals_differences_dict) == 2
+
+
+def test_integrate_peak_areas_batch():
+    """Check that batched integration matches integrate_peak_areas and stays within the array at the edges."""
+    _, pdf_dwell_data_g_r = extract_pdf_data(
+        "data/gr_files",
+        "Synthetic_CSH_100degC_normalized.gr",
+    )
+    peaks = locate_peaks(pdf_dwell_data_g_r)
+
+    lower_bounds, upper_bounds = peak_minimum_bounds(pdf_dwell_data_g_r, [163])
+    assert pdf_dwell_data_g_r[lower_bounds[0]] == -0.269175
+    assert pdf_dwell_data_g_r[upper_bounds[0]] == -0.332356
+
+    assert np.allclose(
+        integrate_peak_areas_batch(pdf_dwell_data_g_r, peaks),
+        [integrate_peak_areas(pdf_dwell_data_g_r, peak) for peak in peaks],
+    )
+
+    edge_g_r = np.array([5.0, 4.0, 3.0, 4.0, 5.0])
+    assert np.allclose(integrate_peak_areas_batch(edge_g_r, [0, 2, 4]), [4.5, 0, 3.5])
+
+
+def test_campaign_integral_matrix(tmp_path):
+    """Check that the integral matrix covers ramp and dwell scans and reproduces the dwell integral differences."""
+    cube = build_gr_cube(
+        "data/gr_files", scan_metadata_from_log("data/", "log.txt"), tmp_path
+    )
+    peak_stores = {
+        "ramp": open_peaks("data/pdf_ramp_peaks.npz"),
+        "dwell": open_peaks("data/pdf_dwell_peaks.npz"),
+    }
+    integral_matrix = campaign_integral_matrix(cube, peak_stores, chunk_rows=16)
+
+    assert integral_matrix.integrals.shape == (107, 4)
+    assert list(integral_matrix.reference_peaks) == [163, 238, 368, 449]
+    assert set(integral_matrix.scans["kind"]) == {"ramp", "dwell"}
+
+    dwell_rows = np.flatnonzero(integral_matrix.scans["kind"] == "dwell")
+    reference_row = dwell_rows[1]
+    assert integral_matrix.scans[reference_row]["key"] == "100"
+    differences = integral_difference_matrix(
+        scale_integral_matrix(integral_matrix.integrals, reference_row), reference_row
+    )
+    assert list(differences[dwell_rows[2]]) == [0.0, 0.4, 1.8, 1.6]
+    assert list(differences[dwell_rows[-1]]) == [0.0, 2.0, 3.4, 10.4]
+
+
+def test_campaign_integral_matrix_float32(tmp_path):
+    """Check that integrals of a float32 cube match those of a float64 cube to single precision."""
+    scans = scan_metadata_from_log("data/", "log.txt")
+    peak_stores = {
+        "ramp": open_peaks("data/pdf_ramp_peaks.npz"),
+        "dwell": open_peaks("data/pdf_dwell_peaks.npz"),
+    }
+    integrals = [
+        campaign_integral_matrix(
+            build_gr_cube(
+                "data/gr_files", scans, tmp_path / dtype.__name__, dtype=dtype
+            ),
+            peak_stores,
+        ).integrals
+        for dtype in (np.float64, np.float32)
+    ]
+
+    assert integrals[1].dtype == np.float64
+    assert np.array_equal(np.isnan(integrals[0]), np.isnan(integrals[1]))
+    assert np.allclose(integrals[1], integrals[0], rtol=1e-6, equal_nan=True)
+
+
+def test_campaign_integral_matrix_without_peaks(tmp_path):
+    """Check that scans saved without peaks get NaN integrals, even when a chunk holds only such scans."""
+    scans = scan_metadata_from_log("data/", "log.txt")[:12]
+    cube = build_gr_cube("data/gr_files", scans, tmp_path)
+    dwell_peaks = open_peaks("data/pdf_dwell_peaks.npz")
+    peak_stores = {
+        "ramp": {},
+        "dwell": {"30": np.array([], dtype=np.int64), "100": dwell_peaks["100"]},
+    }
+    integral_matrix = campaign_integral_matrix(cube, peak_stores, chunk_rows=1)
+
+    assert list(integral_matrix.scans["key"]) == ["30", "100"]
+    assert np.all(np.isnan(integral_matrix.integrals[0]))
+    assert not np.any(np.isnan(integral_matrix.integrals[1]))
+
+
+def test_match_peaks():
+    """Check that peaks within 15 indices of each reference peak are paired in reference-then-peak order."""
+    reference_matches, peak_matches = match_peaks(
+        [150, 300], np.array([135, 140, 160, 165, 166, 305, 325])
+    )
+
+    assert list(reference_matches) == [0, 0, 0, 0, 1]
+    assert list(peak_matches) == [0, 1, 2, 3, 5]
+
+    integral_differences_list = subtract_integrals(
+        200,
+        [150, 300],
+        {150: 5.0, 300: 6.0},
+        {200: np.array([140, 160, 305, 325])},
+        {200: np.array([7.25, 8.0, 9.0, 10.0])},
+    )
+    assert integral_differences_list == [2.2, 3.0, 3.0]
@@ -0,0 +1,175 @@
+import os
+import shutil
+import time
+
+import numpy as np
+import pytest
+
+from src.Extract_Data import extract_pdf_data, locate_peaks
+from src.Gr_Cube import scan_metadata_from_log
+from src.Live_Monitor import LiveMonitor
+from src.Peak_Tracking import track_next_experiment
+
+
+class ExperimentStandIn:
+    """Replays data/log.txt and data/gr_files into a temporary directory, as if written during beamtime."""
+
+    def __init__(self, directory):
+        with open("data/log.txt") as open_file:
+            self.log_lines = open_file.readlines()
+        self.written_lines = 0
+        self.log_file_path = os.path.join(directory, "log.txt")
+        self.gr_file_directory = os.path.join(directory, "gr_files")
+        os.makedirs(self.gr_file_directory)
+        open(self.log_file_path, "w").close()
+
+    def append_lines(self, count, partial_line=False):
+        with open(self.log_file_path, "a") as open_file:
+            for line in self.log_lines[self.written_lines : self.written_lines + count]:
+                open_file.write(line)
+            self.written_lines += count
+            if partial_line:
+                open_file.write(self.log_lines[self.written_lines][:20])
+                self.log_lines[self.written_lines] = self.log_lines[self.written_lines][
+                    20:
+                ]
+
+    def write_gr_file(self, gr_file):
+        shutil.copy(os.path.join("data/gr_files", gr_file), self.gr_file_directory)
+
+
+def test_live_monitor(tmp_path):
+    """Check that scans are analyzed once both their log line and .gr file have been written."""
+    experiment = ExperimentStandIn(tmp_path)
+    monitor = LiveMonitor(
+        experiment.log_file_path, experiment.gr_file_directory, settle_seconds=0
+    )
+    scans = scan_metadata_from_log("data/", "log.txt")[:6]
+
+    # Log lines for the first four scans (the second log line is not a PDF scan), but only three .gr files.
+    experiment.append_lines(5, partial_line=True)
+    for gr_file in scans["gr_file"][:3]:
+        experiment.write_gr_file(gr_file)
+    assert monitor.poll() == [("dwell", "30"), ("ramp", "100_00"), ("ramp", "100_01")]
+
+    # A scan whose log line is incomplete, or that was logged after a scan still missing its .gr file, waits.
+    experiment.write_gr_file(scans["gr_file"][4])
+    assert monitor.poll() == []
+    experiment.write_gr_file(scans["gr_file"][3])
+    assert monitor.poll() == [("ramp", "100_02")]
+    experiment.append_lines(2)
+    experiment.write_gr_file(scans["gr_file"][5])
+    assert monitor.poll() == [("ramp", "100_03"), ("ramp", "100_04")]
+    assert list(monitor.pdf_ramp_peaks_dict) == [
+        "100_00",
+        "100_01",
+        "100_02",
+        "100_03",
+        "100_04",
+    ]
+
+    # The incrementally tracked matrix matches tracking all six scans at once.
+    peaks = [
+        locate_peaks(extract_pdf_data("data/gr_files", gr_file)[1])
+        for gr_file in scans["gr_file"]
+    ]
+    tracked_matrix = np.empty((6, len(peaks[0])))
+    tracked_matrix[0] = peaks[0]
+    for i in range(1, 6):
+        tracked_matrix = track_next_experiment(tracked_matrix, i, peaks[i], 20)
+
+    assert np.array_equal(monitor.tracked_matrix, tracked_matrix, equal_nan=True)
+
+
+def test_unrecognized_pdf_scan(tmp_path):
+    """Check that logged scans named like PDF scans but matching no ramp or dwell name are skipped instead of stopping the analysis."""
+    with open("data/log.txt") as open_file:
+        log_lines = open_file.readlines()[:4]
+    log_lines[2] = log_lines[2].replace("pdf_ramp_30_100", "pdf_dark_030degC")
+    (tmp_path / "log.txt").write_text("".join(log_lines))
+
+    scans = scan_metadata_from_log(tmp_path, "log.txt")
+    assert list(scans["key"]) == ["30", "100_01"]
+
+    os.makedirs(tmp_path / "gr_files")
+    for gr_file in scans["gr_file"]:
+        shutil.copy(os.path.join("data/gr_files", gr_file), tmp_path / "gr_files")
+    monitor = LiveMonitor(tmp_path / "log.txt", tmp_path / "gr_files", settle_seconds=0)
+    assert monitor.poll() == [("dwell", "30"), ("ramp", "100_01")]
+
+
+def test_live_monitor_unready_scans(tmp_path):
+    """Check that an unreadable .gr file holds back later scans until it is rewritten, and that a missing one is skipped after max_wait_seconds."""
+    experiment = ExperimentStandIn(tmp_path)
+    monitor = LiveMonitor(
+        experiment.log_file_path,
+        experiment.gr_file_directory,
+        settle_seconds=0,
+        max_wait_seconds=0.5,
+    )
+    scans = scan_metadata_from_log("data/", "log.txt")[:5]
+    experiment.append_lines(6)
+    experiment.write_gr_file(scans["gr_file"][0])
+    with open(os.path.join("data/gr_files", scans["gr_file"][1])) as open_file:
+        gr_text = open_file.read()
+    experiment.write_gr_file(scans["gr_file"][2])
+    # A .gr file that cannot be parsed, then one that is cut short.
+    expected_scans = [[("dwell", "30")], []]
+    for truncated_text in (gr_text[:2000], gr_text[: len(gr_text) // 2]):
+        with open(
+            os.path.join(experiment.gr_file_directory, scans["gr_file"][1]), "w"
+        ) as open_file:
+            open_file.write(truncated_text)
+        assert monitor.poll() == expected_scans.pop(0)
+        assert len(monitor.pending_scans) == 4
+
+    experiment.write_gr_file(scans["gr_file"][1])
+    assert monitor.poll() == [("ramp", "100_00"), ("ramp", "100_01")]
+
+    # The .gr file of the fourth scan is never written.
+    experiment.write_gr_file(scans["gr_file"][4])
+    assert monitor.poll() == []
+    time.sleep(0.6)
+    with pytest.warns(UserWarning, match="100_02"):
+        assert monitor.poll() == [("ramp", "100_03")]
+    assert monitor.skipped_scans == [("ramp", "100_02")]
+
+
+def test_live_monitor_checkpoint(tmp_path):
+    """Check that a restarted monitor resumes from its checkpoint without analyzing any scan twice."""
+    experiment = ExperimentStandIn(tmp_path)
+    checkpoint_path = os.path.join(tmp_path, "monitor.npz")
+    scans = scan_metadata_from_log("data/", "log.txt")[:6]
+    monitor = LiveMonitor(
+        experiment.log_file_path,
+        experiment.gr_file_directory,
+        settle_seconds=0,
+        checkpoint_path=checkpoint_path,
+    )
+    experiment.append_lines(5)
+    for gr_file in scans["gr_file"][:3]:
+        experiment.write_gr_file(gr_file)
+    assert len(monitor.poll()) == 3
+
+    restarted_monitor = LiveMonitor(
+        experiment.log_file_path,
+        experiment.gr_file_directory,
+        settle_seconds=0,
+        checkpoint_path=checkpoint_path,
+    )
+    assert restarted_monitor.tracked_scans == monitor.tracked_scans
+    assert len(restarted_monitor.pending_scans) == 1
+    experiment.append_lines(2)
+    for gr_file in scans["gr_file"][3:]:
+        experiment.write_gr_file(gr_file)
+    assert restarted_monitor.poll() == [
+        ("ramp", "100_02"),
+        ("ramp", "100_03"),
+        ("ramp", "100_04"),
+    ]
+
+    monitor.poll()
+    assert restarted_monitor.tracked_scans == monitor.tracked_scans
+    assert np.array_equal(
+        restarted_monitor.tracked_matrix, monitor.tracked_matrix, equal_nan=True
+    )
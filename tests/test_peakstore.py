@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.Extract_Data import extract_pdf_data
+from src.Peak_Store import (
+    PeakStore,
+    open_peaks,
+    save_peak_store,
+    save_refined_peak_store,
+)
+
+
+def test_save_peak_store(tmp_path):
+    """Check that a peak store returns the same peaks, in the same key order, as the .npz file it replaces."""
+    npz_peaks = open_peaks("data/pdf_ramp_peaks.npz")
+    store = save_peak_store(tmp_path / "pdf_ramp_peaks", npz_peaks)
+
+    assert isinstance(open_peaks(str(tmp_path / "pdf_ramp_peaks")), PeakStore)
+    assert list(store) == list(npz_peaks)
+    for key in npz_peaks:
+        assert np.array_equal(store[key], npz_peaks[key])
+        assert store.peak_count(key) == len(npz_peaks[key])
+    assert store.peak_indices.dtype == np.int32
+    assert isinstance(store.peak_indices, np.memmap)
+
+
+def test_peak_store_columns(tmp_path):
+    """Check that per-peak columns are stored in the order of the peaks."""
+    peaks = {"30": np.array([163, 310]), "100": np.array([]), "200": np.array([170])}
+    areas = {"30": np.array([1.5, 2.5]), "100": np.array([]), "200": np.array([3.5])}
+    store = save_peak_store(tmp_path, peaks, peak_columns={"area": areas})
+
+    assert list(store.peak_counts) == [2, 0, 1]
+    assert np.array_equal(store.column("area", "200"), [3.5])
+    assert np.array_equal(store.column("area"), [1.5, 2.5, 3.5])
+    assert store.has_column("area") and not store.has_column("width")
+    with pytest.raises(KeyError):
+        store["400"]
+
+
+def test_peak_store_rewrite(tmp_path):
+    """Check that rewriting a store removes columns it no longer has, and that columns of the wrong length are rejected."""
+    peaks = {"30": np.array([163, 310]), "100": np.array([170])}
+    save_peak_store(
+        tmp_path / "store", peaks, peak_columns={"area": {"30": [1, 2], "100": [3]}}
+    )
+    store = save_peak_store(tmp_path / "store", {"30": np.array([163])})
+
+    assert list(store) == ["30"]
+    assert not store.has_column("area")
+    assert sorted(os.listdir(tmp_path)) == ["store"]
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(tmp_path / "store").st_mode & 0o777 == 0o777 & ~umask
+
+    np.save(tmp_path / "store" / "area.npy", np.zeros(3))
+    with pytest.raises(ValueError):
+        store.column("area")
+
+
+def test_save_refined_peak_store(tmp_path):
+    """Check that refined positions lie within half a sample of the peak indices."""
+    dwell_peaks = open_peaks("data/pdf_dwell_peaks.npz")
+    g_r_matrix = np.array(
+        [
+            extract_pdf_data(
+                "data/gr_files", f"Synthetic_CSH_{int(key):03d}degC_normalized.gr"
+            )[1]
+            for key in dwell_peaks
+        ]
+    )
+    store = save_refined_peak_store(
+        tmp_path, dwell_peaks, g_r_matrix, range(len(g_r_matrix)), chunk_rows=3
+    )
+
+    assert list(store) == list(dwell_peaks)
+    assert np.all(np.abs(store.column("position") - store.peak_indices) <= 0.5)
+    assert np.all(store.column("height", "30") > 0)
+    assert np.all(store.column("width") > 0)
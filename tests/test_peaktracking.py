@@ -1,6 +1,16 @@
 import numpy as np
 
-from src.Peak_Tracking import calc_diff, extend_matrix_length
+from src.Peak_Store import open_peaks
+from src.Peak_Tracking import (
+    AssignmentPeakTracker,
+    PeakTracker,
+    calc_diff,
+    extend_matrix_length,
+    scan_label,
+    track_next_experiment,
+    track_schedule,
+    tracking_schedule,
+)
 
 
 def test_calc_diff():
@@ -213,3 +223,94 @@ def test_extend_matrix_length():
     new_tracked_matrix = extend_matrix_length(dummy_tracked_matrix, 3)
     new_shape = new_tracked_matrix.shape
     assert new_shape[1] == old_shape[1] + 1
+
+
+def test_peak_tracker():
+    """Check that the array-backed tracker builds the same matrix as track_next_experiment"""
+    ramp_peaks = open_peaks("data/pdf_ramp_peaks.npz")
+    peaks = [ramp_peaks[key] for key in list(ramp_peaks)[:40]]
+
+    tracked_matrix = np.full((len(peaks), len(peaks[0])), np.nan)
+    tracked_matrix[0] = peaks[0]
+    peak_tracker = PeakTracker(20)
+    peak_tracker.add_experiment(peaks[0])
+    for i in range(1, len(peaks)):
+        tracked_matrix = track_next_experiment(tracked_matrix, i, peaks[i], 20)
+        peak_tracker.add_experiment(peaks[i])
+
+    assert len(peak_tracker) == 40
+    assert np.array_equal(peak_tracker.tracked_matrix(), tracked_matrix, equal_nan=True)
+
+    peak_tracker = PeakTracker(20)
+    for peak_positions in ([100, 200, 300], [150, 205], [206, 400]):
+        peak_tracker.add_experiment(np.array(peak_positions))
+    expected_matrix = np.array(
+        [
+            [100, np.nan, 200, 300, np.nan],
+            [np.nan, 150, 205, np.nan, np.nan],
+            [np.nan, np.nan, 206, np.nan, 400],
+        ]
+    )
+    assert np.array_equal(
+        peak_tracker.tracked_matrix(), expected_matrix, equal_nan=True
+    )
+
+
+def test_assignment_peak_tracker():
+    """Check that peaks are matched to their nearest tracked peak and that missing peaks can be bridged"""
+    peak_tracker = AssignmentPeakTracker(20)
+    for peak_positions in ([100, 120], [119, 140]):
+        peak_tracker.add_experiment(np.array(peak_positions))
+    assert np.array_equal(
+        peak_tracker.tracked_matrix(),
+        np.array([[100, 120, np.nan], [np.nan, 119, 140]]),
+        equal_nan=True,
+    )
+
+    for max_gap, tracked_peaks in ((0, 3), (1, 2)):
+        peak_tracker = AssignmentPeakTracker(20, max_gap=max_gap)
+        for peak_positions in ([100, 200], [205], [105, 210]):
+            peak_tracker.add_experiment(np.array(peak_positions))
+        assert peak_tracker.tracked_matrix().shape == (3, tracked_peaks)
+
+    ramp_peaks = open_peaks("data/pdf_ramp_peaks.npz")
+    peak_tracker = AssignmentPeakTracker(20, max_gap=1)
+    for key in ramp_peaks:
+        peak_tracker.add_experiment(ramp_peaks[key])
+    tracked_matrix = peak_tracker.tracked_matrix()
+    assert np.count_nonzero(~np.isnan(tracked_matrix)) == sum(
+        len(ramp_peaks[key]) for key in ramp_peaks
+    )
+    for tracked_positions in tracked_matrix.T:
+        found_positions = tracked_positions[~np.isnan(tracked_positions)]
+        assert np.all(np.abs(np.diff(found_positions)) <= 20)
+
+
+def test_track_schedule(monkeypatch):
+    """Check that every saved ramp and dwell scan is tracked in chronological order"""
+    monkeypatch.chdir("src")
+    experiment_type, temperature_point = tracking_schedule("log")
+
+    assert len(experiment_type) == 107
+    assert list(zip(experiment_type[:3], temperature_point[:3])) == [
+        ("dwell", "30"),
+        ("ramp", "100_00"),
+        ("ramp", "100_01"),
+    ]
+    assert [scan_label(*scan) for scan in [("dwell", "30"), ("ramp", "100_01")]] == [
+        "30\u00B0C",
+        "100\u00B0C ramp 01",
+    ]
+
+    peak_tracker = PeakTracker(20)
+    for i in range(len(experiment_type)):
+        peak_tracker.add_experiment(
+            open_peaks("../data/pdf_" + experiment_type[i] + "_peaks")[
+                temperature_point[i]
+            ]
+        )
+    assert np.array_equal(
+        track_schedule(experiment_type, temperature_point, 20),
+        peak_tracker.tracked_matrix(),
+        equal_nan=True,
+    )
@@ -2,9 +2,16 @@ import os
 import re
 from datetime import datetime, timedelta
 
+import pytest
+
 from src.Read_Log_File import (
+    IncrementalLogParser,
+    LogEntry,
+    extract_log_records,
     extract_temperature,
     extract_time,
+    extract_time_temp_data,
+    extract_time_temp_data_incremental,
     round_to_tens_place,
     time_HMS_to_seconds,
 )
@@ -55,3 +62,77 @@ def test_round_to_tens_place():
 
     assert round_to_tens_place(134) == 130
     assert round_to_tens_place(78) == 80
+
+
+def test_incremental_log_parser(tmp_path):
+    """Check that a resumed parser only reads appended lines and matches extract_time_temp_data."""
+    with open(os.path.join("data/", "log.txt")) as open_file:
+        individual_lines = open_file.readlines()
+    log_file_path = tmp_path / "log.txt"
+    checkpoint_path = tmp_path / "log_checkpoint.npz"
+
+    # Write the first half of the log and an unterminated line.
+    log_file_path.write_text("".join(individual_lines[:70]) + individual_lines[70][:30])
+    log_parser = IncrementalLogParser(log_file_path, checkpoint_path)
+    first_entries = log_parser.update()
+    log_parser.save_checkpoint()
+
+    log_file_path.write_text("".join(individual_lines))
+    resumed_log_parser = IncrementalLogParser(log_file_path, checkpoint_path)
+    assert resumed_log_parser.offset == log_parser.offset
+    new_entries = resumed_log_parser.update()
+
+    assert len(first_entries) + len(new_entries) == 117
+    assert first_entries[0] == LogEntry(
+        "Synthetic_CSH_pdf_030degC", 1, 37660, 30.12, 3.82965e07
+    )
+    assert resumed_log_parser.time_temp_data() == extract_time_temp_data(
+        "data/", "log.txt"
+    )
+
+
+def test_log_parser_checkpoint_saving(tmp_path):
+    """Check that checkpoints need a path, and that the checkpoint is only rewritten when the log file grew."""
+    with pytest.raises(ValueError):
+        IncrementalLogParser(os.path.join("data/", "log.txt")).save_checkpoint()
+
+    with open(os.path.join("data/", "log.txt")) as open_file:
+        individual_lines = open_file.readlines()
+    (tmp_path / "log.txt").write_text("".join(individual_lines[:70]))
+    checkpoint_path = tmp_path / "log_checkpoint.npz"
+    first_data = extract_time_temp_data_incremental(
+        tmp_path, "log.txt", "log_checkpoint.npz"
+    )
+    os.utime(checkpoint_path, ns=(0, 0))
+
+    assert (
+        extract_time_temp_data_incremental(tmp_path, "log.txt", "log_checkpoint.npz")
+        == first_data
+    )
+    assert os.stat(checkpoint_path).st_mtime_ns == 0
+
+    (tmp_path / "log.txt").write_text("".join(individual_lines))
+    assert extract_time_temp_data_incremental(
+        tmp_path, "log.txt", "log_checkpoint.npz"
+    ) == extract_time_temp_data("data/", "log.txt")
+    assert os.stat(checkpoint_path).st_mtime_ns != 0
+
+
+def test_extract_log_records():
+    """Check that the structured array holds the same data as extract_time_temp_data, one record per PDF."""
+    log_records = extract_log_records("data/", "log.txt")
+    (
+        recorded_times_from_experiment,
+        recorded_temperatures_from_experiment,
+        rounded_temperatures,
+    ) = extract_time_temp_data("data/", "log.txt")
+
+    assert log_records["seconds"].tolist() == recorded_times_from_experiment
+    assert log_records["temperature"].tolist() == recorded_temperatures_from_experiment
+    assert log_records["rounded_temperature"].tolist() == rounded_temperatures
+    assert (log_records["kind"] == "dwell").sum() == 10
+    assert log_records[1]["kind"] == "ramp"
+    assert (
+        log_records[1]["setpoint_from"] == 30 and log_records[1]["setpoint_to"] == 100
+    )
+    assert log_records[-1]["repeat"] == 11 and log_records[-1]["i00"] == 3.95046e07
@@ -0,0 +1,172 @@
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.Stage_Graph import Stage, StageGraph
+
+
+def make_graph(tmp_path, runs):
+    """Build a graph of two chains: raw -> double -> total and config -> total."""
+    raw_file = tmp_path / "raw.txt"
+    config_file = tmp_path / "config.txt"
+    double_file = tmp_path / "double.txt"
+    total_file = tmp_path / "total.txt"
+
+    def double():
+        runs.append("double")
+        double_file.write_text(str(2 * int(raw_file.read_text())))
+
+    def total():
+        runs.append("total")
+        total_file.write_text(
+            str(int(double_file.read_text()) + int(config_file.read_text()))
+        )
+
+    stages = [
+        Stage("double", double, inputs=(str(raw_file),), outputs=(str(double_file),)),
+        Stage(
+            "total",
+            total,
+            dependencies=("double",),
+            inputs=(str(config_file),),
+            outputs=(str(total_file),),
+        ),
+    ]
+
+    return (
+        StageGraph(stages, str(tmp_path / "cache")),
+        raw_file,
+        config_file,
+        total_file,
+    )
+
+
+def test_stage_graph(tmp_path):
+    """Check that only stages downstream of a changed input rerun, and that earlier outputs are restored from the cache."""
+    runs = []
+    graph, raw_file, config_file, total_file = make_graph(tmp_path, runs)
+    raw_file.write_text("1")
+    config_file.write_text("10")
+
+    assert graph.run(["total"]) == [("double", "ran"), ("total", "ran")]
+    assert total_file.read_text() == "12"
+    assert graph.run(["total"]) == [("double", "current"), ("total", "current")]
+
+    config_file.write_text("20")
+    assert graph.run(["total"]) == [("double", "current"), ("total", "ran")]
+    assert total_file.read_text() == "22"
+
+    config_file.write_text("10")
+    assert graph.run(["total"]) == [("double", "current"), ("total", "restored")]
+    assert total_file.read_text() == "12"
+    assert runs == ["double", "total", "total"]
+
+    # Outputs edited by hand are not current anymore.
+    total_file.write_text("0")
+    assert graph.run(["total"])[-1] == ("total", "restored")
+    assert graph.run(["double"], force=["double"]) == [("double", "ran")]
+
+
+def test_stage_graph_errors(tmp_path):
+    """Check that unknown and circular dependencies are rejected."""
+    with pytest.raises(ValueError):
+        StageGraph([Stage("a", print, dependencies=("b",))], str(tmp_path))
+    graph = StageGraph(
+        [
+            Stage("a", print, dependencies=("b",)),
+            Stage("b", print, dependencies=("a",)),
+        ],
+        str(tmp_path),
+    )
+    with pytest.raises(ValueError):
+        graph.execution_order(["a"])
+    with pytest.raises(KeyError):
+        graph.execution_order(["c"])
+
+
+def test_stage_graph_parameters(tmp_path):
+    """Check that stage parameters are passed to the stage and that changing them reruns the stage instead of restoring its outputs."""
+    output_file = tmp_path / "output.txt"
+
+    def write(text):
+        output_file.write_text(text)
+
+    def graph(text):
+        return StageGraph(
+            [Stage("write", write, outputs=(str(output_file),), parameters=(text,))],
+            str(tmp_path / "cache"),
+        )
+
+    assert graph("a").run(["write"]) == [("write", "ran")]
+    assert graph("b").run(["write"]) == [("write", "ran")]
+    assert output_file.read_text() == "b"
+    assert graph("a").run(["write"]) == [("write", "restored")]
+    assert output_file.read_text() == "a"
+
+
+def test_stage_keys_follow_called_code(tmp_path, monkeypatch):
+    """Check that editing a module a stage calls changes the stage key, while editing an unused function of the stage module does not."""
+    (tmp_path / "stage_helper.py").write_text("def value():\n    return 1\n")
+    (tmp_path / "stage_module.py").write_text(
+        "from stage_helper import value\n\n\n"
+        "def stage():\n    return value()\n\n\n"
+        "def unused():\n    return 0\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def stage_key():
+        for name in ("stage_helper", "stage_module"):
+            sys.modules.pop(name, None)
+        importlib.invalidate_caches()
+        stage_module = importlib.import_module("stage_module")
+        graph = StageGraph([Stage("stage", stage_module.stage)], str(tmp_path))
+        return graph.stage_keys(["stage"])["stage"]
+
+    key = stage_key()
+    with open(tmp_path / "stage_module.py", "a") as open_file:
+        open_file.write("\n\ndef also_unused():\n    return 2\n")
+    assert stage_key() == key
+
+    (tmp_path / "stage_helper.py").write_text("def value():\n    return 2\n")
+    assert stage_key() != key
+
+
+def test_stage_keys_are_reproducible(tmp_path):
+    """Check that stage keys do not depend on string hash randomization, so cached outputs stay current across processes."""
+    functions = [f"step_{i}" for i in range(20)]
+    (tmp_path / "stage_module.py").write_text(
+        "".join(
+            f"def {name}():\n    return {i}\n\n\n" for i, name in enumerate(functions)
+        )
+        + "def stage():\n    return "
+        + " + ".join(f"{name}()" for name in functions)
+        + "\n"
+    )
+    script = (
+        "import stage_module\n"
+        "from src.Stage_Graph import Stage, StageGraph\n"
+        f"graph = StageGraph([Stage('stage', stage_module.stage)], {str(tmp_path)!r})\n"
+        "print(graph.stage_keys(['stage'])['stage'])\n"
+    )
+
+    keys = set()
+    for hash_seed in ("0", "1", "2"):
+        environment = dict(
+            os.environ,
+            PYTHONHASHSEED=hash_seed,
+            PYTHONPATH=os.pathsep.join((str(tmp_path), os.getcwd())),
+        )
+        keys.add(
+            subprocess.run(
+                [sys.executable, "-c", script],
+                env=environment,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+        )
+
+    assert len(keys) == 1